@@ -0,0 +1,23 @@
+"""
+ASGI config for AAD_Project2 project.
+
+Serves the same URLs as wsgi.py; the async views (the JSON checkout API)
+only free the worker while they wait when run here, e.g.:
+
+    uvicorn AAD_Project2.asgi:application --workers 4
+"""
+
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault(
+    'DJANGO_SETTINGS_MODULE',
+    'AAD_Project2.settings')
+
+application = get_asgi_application()
+
+from django.conf import settings
+
+if getattr(settings, 'CATALOGUE_WARM_ON_STARTUP', False):
+    from System import catalogue
+    catalogue.warm()
@@ -46,6 +46,8 @@ INSTALLED_APPS = [
 # Middleware framework
 # https://docs.djangoproject.com/en/2.1/topics/http/middleware/
 MIDDLEWARE = [
+    # First, so session and auth queries are counted too (System/instrumentation.py).
+    'System.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,7 +63,8 @@ ROOT_URLCONF = 'AAD_Project2.urls'
 # https://docs.djangoproject.com/en/2.1/topics/templates/
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates with render time recorded in the request metrics.
+        'BACKEND': 'System.instrumentation.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -76,6 +79,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'AAD_Project2.wsgi.application'
+ASGI_APPLICATION = 'AAD_Project2.asgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 DATABASES = {
@@ -122,3 +126,120 @@ AUTH_USER_MODEL = 'System.CustomUser'
 # https://docs.djangoproject.com/en/2.1/howto/static-files/
 STATIC_URL = '/static/'
 STATIC_ROOT = posixpath.join(*(BASE_DIR.split(os.path.sep) + ['static']))
+
+# Inventory reservation: retries after a deadlock/serialization failure,
+# with exponential backoff between INVENTORY_RETRY_BASE_DELAY and
+# INVENTORY_RETRY_MAX_DELAY seconds.
+INVENTORY_MAX_RETRIES = 3
+INVENTORY_RETRY_BASE_DELAY = 0.02
+INVENTORY_RETRY_MAX_DELAY = 0.5
+# "pessimistic" locks inventory rows before decrementing them; "optimistic"
+# relies on a conditional UPDATE and its affected-row count instead.
+INVENTORY_CONCURRENCY_MODE = 'pessimistic'
+# Let hot products keep their stock in several InventoryShard rows
+# (see "manage.py shard_inventory"). Sales do not write the product's
+# Inventory row; schedule "manage.py shard_inventory --refresh" (e.g. every
+# minute) to keep its quantity and low-stock flag current.
+INVENTORY_SHARDED_STOCK = False
+
+# LRU caches used by the System app (see System/cache.py). Use
+# 'System.cache.FileBackend' with a 'location' option to share a cache
+# between the worker processes of one node.
+SYSTEM_CACHES = {
+    'invoices': {
+        'BACKEND': 'System.cache.LocMemBackend',
+        'OPTIONS': {'max_entries': 1000},
+    },
+    'catalogue': {
+        'BACKEND': 'System.cache.LocMemBackend',
+        'OPTIONS': {'max_entries': 20000, 'timeout': 300},
+    },
+    # Version tokens of changed products, shared by every worker on the node
+    # so a price change made in one drops the others' catalogue entries.
+    'catalogue_versions': {
+        'BACKEND': 'System.cache.FileBackend',
+        'OPTIONS': {'max_entries': 20000},
+    },
+    # SKU -> product_id, so a till can price scanned codes from the cache
+    # while the database is unreachable (System/till_queue.py).
+    'catalogue_skus': {
+        'BACKEND': 'System.cache.LocMemBackend',
+        'OPTIONS': {'max_entries': 20000, 'timeout': 300},
+    },
+    'search': {
+        'BACKEND': 'System.cache.LocMemBackend',
+        'OPTIONS': {'max_entries': 2000, 'timeout': 120},
+    },
+    'dashboard': {
+        'BACKEND': 'System.cache.LocMemBackend',
+        'OPTIONS': {'max_entries': 16},
+    },
+    # Payables aging reports, one per day asked for; dropped when a debt
+    # changes in this process, expired for changes made in others.
+    'aging': {
+        'BACKEND': 'System.cache.LocMemBackend',
+        'OPTIONS': {'max_entries': 32, 'timeout': 900},
+    },
+    # Timesheets of closed months only (the current one is always computed).
+    'timesheets': {
+        'BACKEND': 'System.cache.LocMemBackend',
+        'OPTIONS': {'max_entries': 36, 'timeout': 86400},
+    },
+    # Logged-in users, shared by the workers of a node so a till keeps its
+    # session through a database outage; dropped when the user changes.
+    'users': {
+        'BACKEND': 'System.cache.FileBackend',
+        'OPTIONS': {'max_entries': 1000, 'timeout': 43200},
+    },
+}
+
+# Rows per page of the inventory list (keyset pagination).
+INVENTORY_PAGE_SIZE = 50
+
+# Rows fetched per round-trip by the streaming exports.
+EXPORT_CHUNK_SIZE = 2000
+
+# Dashboards: cached aggregates older than DASHBOARD_CACHE_TTL seconds are
+# served while a background thread recomputes them.
+DASHBOARD_CACHE_TTL = 30
+DASHBOARD_LOW_STOCK_ROWS = 10
+DASHBOARD_TOP_SELLERS = 5
+DASHBOARD_TOP_DEBTORS = 5
+
+# Load the product catalogue into the 'catalogue' cache when a worker starts
+# (see wsgi.py and "manage.py warm_catalogue").
+CATALOGUE_WARM_ON_STARTUP = False
+
+# Async checkout API (System/pool.py): threads that run the checkout's
+# database work, and how many calls may run or wait before new ones get 503.
+CHECKOUT_POOL_SIZE = 8
+CHECKOUT_MAX_PENDING = 64
+
+# Checkout idempotency keys are kept this long before
+# "manage.py purge_idempotency_keys" removes them.
+IDEMPOTENCY_KEY_TTL_HOURS = 48
+
+# Sales taken while the database is unreachable are journaled here and
+# replayed by "manage.py sync_till_queue" (see System/till_queue.py).
+TILL_QUEUE_ENABLED = True
+TILL_QUEUE_PATH = os.path.join(BASE_DIR, 'till_queue.sqlite3')
+# A logged-in till must reach the queue without the database: sessions live in
+# signed cookies and users are read through the 'users' cache (System/auth.py).
+SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+AUTHENTICATION_BACKENDS = ['System.auth.CachedModelBackend']
+
+# Attendance: clocking in later than ATTENDANCE_WORKDAY_START plus the grace
+# minutes is recorded as late (see System/attendance.py).
+ATTENDANCE_WORKDAY_START = "08:00"
+ATTENDANCE_LATE_GRACE_MINUTES = 10
+
+# Rows per page of the attendance approval queue (keyset pagination).
+ATTENDANCE_QUEUE_PAGE_SIZE = 50
+
+# Request metrics (System/instrumentation.py), served in the Prometheus text
+# format at /system/metrics/ to these client addresses only. Requests at least
+# this slow, or running at least this many queries, are logged as warnings
+# (None turns either check off).
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+METRICS_SLOW_REQUEST_SECONDS = 1.0
+METRICS_SLOW_REQUEST_QUERIES = 50
@@ -27,3 +27,9 @@ os.environ.setdefault(
 # file. This includes Django's development server, if the WSGI_APPLICATION
 # setting points here.
 application = get_wsgi_application()
+
+from django.conf import settings
+
+if getattr(settings, 'CATALOGUE_WARM_ON_STARTUP', False):
+    from System import catalogue
+    catalogue.warm()
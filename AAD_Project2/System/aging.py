@@ -0,0 +1,117 @@
+# System/aging.py
+"""
+Payables aging: unpaid ``Debt`` per creditor, bucketed by how many days past
+its due date it is on a given day.
+
+The whole report is one grouped query with a conditional ``SUM`` per bucket.
+Bucket edges are turned into ``due_date`` boundaries, so the query reads only
+the unpaid range of ``debt_paid_due_idx`` (which carries ``creditor`` and
+``amount``), however many years of paid debt sit beside it. Totals per
+creditor type are added up from the same rows. Reports are kept per day in
+``SYSTEM_CACHES["aging"]`` and dropped when a debt changes.
+"""
+
+import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+from django.utils import timezone
+
+from .cache import get_cache
+from .models import Creditor, Debt
+
+CACHE_NAME = "aging"
+
+# (key, label, most days overdue); debt not yet due counts as "0-30".
+BUCKETS = (
+    ("days_0_30", "۰ تا ۳۰ روز", 30),
+    ("days_31_60", "۳۱ تا ۶۰ روز", 60),
+    ("days_61_90", "۶۱ تا ۹۰ روز", 90),
+    ("days_90_plus", "بیش از ۹۰ روز", None),
+)
+BUCKET_KEYS = tuple(key for key, _, _ in BUCKETS)
+CSV_HEADER = ("creditor_id", "creditor", "creditor_type") + BUCKET_KEYS + ("total",)
+
+_money = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _bucket_sums(as_of):
+    sums, newer = {}, None
+    for key, _, days in BUCKETS:
+        # Debt in this bucket fell due before the previous bucket's edge and
+        # on or after this one's.
+        condition = {}
+        if days is not None:
+            condition["due_date__gte"] = as_of - datetime.timedelta(days=days)
+        if newer is not None:
+            condition["due_date__lt"] = newer
+        sums[key] = Sum(Case(When(then=F("amount"), **condition), default=Value(Decimal(0)), output_field=_money))
+        newer = condition.get("due_date__gte")
+    return sums
+
+
+def compute(as_of):
+    """The aging report on ``as_of`` (see ``report``), straight from the database."""
+    rows = list(
+        Debt.objects.unpaid()
+        .values("creditor_id", "creditor__name", "creditor__creditor_type")
+        .annotate(**_bucket_sums(as_of))
+        .order_by("creditor__name", "creditor_id")
+    )
+    type_labels = dict(Creditor.creditor_type_choices)
+    creditors, by_type = [], {}
+    totals = dict.fromkeys(BUCKET_KEYS + ("total",), Decimal(0))
+    for row in rows:
+        amounts = {key: row[key] or Decimal(0) for key in BUCKET_KEYS}
+        amounts["total"] = sum(amounts.values())
+        creditor_type = row["creditor__creditor_type"]
+        creditors.append({
+            "creditor_id": row["creditor_id"],
+            "creditor": row["creditor__name"],
+            "creditor_type": creditor_type,
+            **amounts,
+        })
+        group = by_type.setdefault(creditor_type, {
+            "creditor_type": creditor_type,
+            "label": type_labels.get(creditor_type, creditor_type),
+            **dict.fromkeys(amounts, Decimal(0)),
+        })
+        for key, amount in amounts.items():
+            group[key] += amount
+            totals[key] += amount
+    return {
+        "as_of": as_of,
+        "buckets": [{"key": key, "label": label} for key, label, _ in BUCKETS],
+        "creditors": creditors,
+        "by_type": sorted(by_type.values(), key=lambda group: group["creditor_type"]),
+        "totals": totals,
+    }
+
+
+def report(as_of=None):
+    """
+    Unpaid debt on ``as_of`` (today by default) as ``{"as_of", "buckets",
+    "creditors", "by_type", "totals"}``; each creditor and type row has an
+    amount per bucket key and a ``total``. Whether a debt is unpaid is
+    judged by its current ``is_paid``.
+    """
+    as_of = as_of or timezone.localdate()
+    cache = get_cache(CACHE_NAME)
+    key = f"aging:{as_of.isoformat()}"
+    data = cache.get(key)
+    if data is None:
+        data = compute(as_of)
+        cache.set(key, data)
+    return data
+
+
+def csv_rows(data):
+    """The creditor rows of a ``report`` in ``CSV_HEADER`` order."""
+    for row in data["creditors"]:
+        yield [row[column] for column in CSV_HEADER]
+
+
+def invalidate():
+    """Forget every cached report once the current transaction commits."""
+    transaction.on_commit(lambda: get_cache(CACHE_NAME).clear())
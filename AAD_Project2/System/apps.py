@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class SystemConfig(AppConfig):
     name = 'System'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401  (connects the receivers)
+        from .instrumentation import install_query_wrapper
+        connection_created.connect(install_query_wrapper, dispatch_uid="System.instrumentation")
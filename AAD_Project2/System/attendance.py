@@ -0,0 +1,244 @@
+# System/attendance.py
+"""
+Clocking in and out, and the monthly timesheet.
+
+``clock`` upserts a day's attendance for many employees in one transaction:
+the rows that already exist for the day are locked and changed with one
+``bulk_update``, the missing ones are added with one ``bulk_create``. This
+runs the same on every backend (SQL Server has no ``ON CONFLICT``); if
+another clock inserts the same (employee, day) first,
+``attendance_employee_date_uniq`` rejects the insert and the batch is
+applied again over the rows now present. A clock-out never blanks the
+check-in recorded earlier that day, and a row a manager has already
+reviewed goes back to the approval queue when its times or status change.
+
+``timesheet`` adds a month up in the database: one grouped query over the
+``attendance_date_idx`` range gives each employee's worked minutes, days
+present, late and absent, and how many days a manager has approved. A month
+that is over only changes through a late correction or approval, so its
+timesheet is kept in ``SYSTEM_CACHES["timesheets"]`` until one of its days is
+written; the current month is always computed afresh.
+
+``pending`` pages through the rows a manager has not reviewed yet, and
+``review`` approves or rejects a chosen set or a whole date range with a
+single ``UPDATE``, writing the audit trail (``AttendanceReview``) in bulk.
+Each review keeps the employee, day and times it judged, so the trail
+outlives the attendance row and the employee.
+"""
+
+import datetime
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+
+from .cache import get_cache
+from .models import Attendance, AttendanceReview, Employee
+from .pagination import keyset_page
+
+CACHE_NAME = "timesheets"
+
+# Keyset ordering of the approval queue; matches ``attendance_pending_idx``.
+PENDING_ORDERING = ("date", "attendance_id")
+
+# Fields an entry may set, besides ``employee_id``.
+CLOCK_FIELDS = ("check_in", "check_out", "status", "notes")
+
+# Changing any of these on a reviewed row undoes the review.
+REVIEWED_FIELDS = ("check_in", "check_out", "status")
+
+
+class ClockError(ValueError):
+    def __init__(self, message, employee_ids=()):
+        super().__init__(message)
+        self.employee_ids = list(employee_ids)
+
+
+def workday_start():
+    return datetime.time.fromisoformat(getattr(settings, "ATTENDANCE_WORKDAY_START", "08:00"))
+
+
+def late_after():
+    """Clocking in after this time counts as late."""
+    start = datetime.datetime.combine(datetime.date.min, workday_start())
+    grace = datetime.timedelta(minutes=getattr(settings, "ATTENDANCE_LATE_GRACE_MINUTES", 10))
+    return (start + grace).time()
+
+
+def _status(entry):
+    if entry.get("status"):
+        return entry["status"]
+    if entry.get("check_in"):
+        return "LATE" if entry["check_in"] > late_after() else "PRESENT"
+    return None
+
+
+def clock(entries, day=None):
+    """
+    Upsert ``day``'s (today's by default) attendance from ``entries``, dicts
+    with an ``employee_id`` and any of ``CLOCK_FIELDS``. Fields an entry does
+    not carry keep their stored value. Returns the number of entries written;
+    raises ``ClockError`` for unknown employees or repeated ones.
+    """
+    day = day or timezone.localdate()
+    employee_ids = [entry["employee_id"] for entry in entries]
+    if len(set(employee_ids)) != len(employee_ids):
+        raise ClockError("هر کارمند فقط یک بار در هر ارسال مجاز است.")
+    known = set(Employee.objects.filter(pk__in=employee_ids).values_list("pk", flat=True))
+    unknown = [pk for pk in employee_ids if pk not in known]
+    if unknown:
+        raise ClockError("کارمندی با این شناسه یافت نشد.", unknown)
+    changes = {}
+    for entry in entries:
+        fields = {name: entry[name] for name in CLOCK_FIELDS if entry.get(name) is not None}
+        if not fields:
+            raise ClockError("برای هر کارمند ساعت ورود، خروج یا وضعیت لازم است.", [entry["employee_id"]])
+        status = _status(entry)
+        if status:
+            fields["status"] = status
+        changes[entry["employee_id"]] = fields
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                _apply(day, changes)
+                invalidate(day)
+            break
+        except IntegrityError:
+            # Someone clocked one of these employees in between our lock and
+            # our insert; the second pass finds and locks their row.
+            if attempt:
+                raise
+    return len(entries)
+
+
+def _apply(day, changes):
+    existing = {
+        row.employee_id: row
+        for row in Attendance.objects.select_for_update().filter(date=day, employee_id__in=list(changes))
+    }
+    updated, created, update_fields = [], [], set()
+    for employee_id, fields in changes.items():
+        row = existing.get(employee_id)
+        if row is None:
+            created.append(Attendance(employee_id=employee_id, date=day, **{"status": "PRESENT", **fields}))
+            continue
+        if row.reviewed_at and any(getattr(row, name) != fields[name] for name in REVIEWED_FIELDS if name in fields):
+            row.approved_by_manager, row.reviewed_at = False, None
+            update_fields.update(("approved_by_manager", "reviewed_at"))
+        for name, value in fields.items():
+            setattr(row, name, value)
+        update_fields.update(fields)
+        updated.append(row)
+    if updated:
+        # Every row is locked and was read in full, so writing the union of
+        # the fields leaves the ones an entry did not carry as they were.
+        Attendance.objects.bulk_update(updated, sorted(update_fields), batch_size=500)
+    if created:
+        Attendance.objects.bulk_create(created, batch_size=500)
+
+
+def month_range(year, month):
+    first = datetime.date(year, month, 1)
+    return first, (first + datetime.timedelta(days=32)).replace(day=1)
+
+
+def is_closed(year, month, today=None):
+    return month_range(year, month)[1] <= (today or timezone.localdate())
+
+
+def compute(year, month):
+    """The timesheet for ``year``/``month`` (see ``timesheet``), straight from the database."""
+    first, after = month_range(year, month)
+    worked = ExpressionWrapper(F("check_out") - F("check_in"), output_field=DurationField())
+    rows = (
+        Attendance.objects.filter(date__gte=first, date__lt=after)
+        .values("employee_id", "employee__first_name", "employee__last_name")
+        .annotate(
+            worked=Sum(worked, filter=Q(check_in__isnull=False, check_out__gt=F("check_in"))),
+            days=Count("pk"),
+            present=Count("pk", filter=Q(status__in=["PRESENT", "LATE"])),
+            late=Count("pk", filter=Q(status="LATE")),
+            absent=Count("pk", filter=Q(status="ABSENT")),
+            approved=Count("pk", filter=Q(approved_by_manager=True)),
+        )
+        .order_by("employee__last_name", "employee__first_name", "employee_id")
+    )
+    result = []
+    for row in rows:
+        result.append({
+            "employee_id": row["employee_id"],
+            "name": f"{row['employee__first_name']} {row['employee__last_name']}",
+            "worked_minutes": int(row["worked"].total_seconds() // 60) if row["worked"] else 0,
+            "days": row["days"],
+            "present": row["present"],
+            "late": row["late"],
+            "absent": row["absent"],
+            "approved": row["approved"],
+            "pending_approval": row["days"] - row["approved"],
+        })
+    return result
+
+
+def timesheet(year, month):
+    """
+    Per employee with attendance in the month: ``worked_minutes`` (check-in to
+    check-out), ``days`` recorded, ``present``, ``late``, ``absent``,
+    ``approved`` and ``pending_approval`` day counts. Closed months are cached.
+    """
+    if not is_closed(year, month):
+        return compute(year, month)
+    return get_cache(CACHE_NAME).get_or_set(f"{year:04d}-{month:02d}", lambda: compute(year, month))
+
+
+def invalidate(*days):
+    """Drop the cached timesheets of the months of ``days`` once the current transaction commits."""
+    keys = {f"{day.year:04d}-{day.month:02d}" for day in days}
+
+    def drop():
+        cache = get_cache(CACHE_NAME)
+        for key in keys:
+            cache.delete(key)
+    transaction.on_commit(drop)
+
+
+def pending(cursor=None, page_size=50):
+    """``(rows, next_cursor)``: a page of attendance awaiting review, oldest day first, with its employee."""
+    queryset = Attendance.objects.filter(reviewed_at__isnull=True).select_related("employee")
+    return keyset_page(queryset, PENDING_ORDERING, cursor, page_size)
+
+
+def review(reviewer, approved, attendance_ids=None, date_from=None, date_to=None):
+    """
+    Approve (or, with ``approved=False``, reject) the pending rows among
+    ``attendance_ids``, or every pending row dated ``date_from``..``date_to``.
+    Rows already reviewed are left alone, so submitting twice is harmless.
+    Returns the number of rows reviewed.
+    """
+    queryset = Attendance.objects.all()
+    if attendance_ids is not None:
+        queryset = queryset.filter(pk__in=attendance_ids)
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+    now = timezone.now()
+    with transaction.atomic():
+        reviewed = queryset.filter(reviewed_at__isnull=True).update(approved_by_manager=approved, reviewed_at=now)
+        if not reviewed:
+            return 0
+        # The rows just stamped; nobody else can stamp the same instant
+        # while this transaction holds their locks.
+        rows = list(queryset.filter(reviewed_at=now).values(
+            "pk", "employee_id", "employee__first_name", "employee__last_name", "date", "check_in", "check_out",
+            "status"))
+        AttendanceReview.objects.bulk_create(
+            [AttendanceReview(attendance_id=row["pk"], employee_id=row["employee_id"],
+                              employee_name=f"{row['employee__first_name']} {row['employee__last_name']}",
+                              date=row["date"], check_in=row["check_in"], check_out=row["check_out"],
+                              status=row["status"], reviewer=reviewer, approved=approved, reviewed_at=now)
+             for row in rows],
+            batch_size=500,
+        )
+        invalidate(*{row["date"] for row in rows})
+    return reviewed
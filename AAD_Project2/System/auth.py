@@ -0,0 +1,50 @@
+# System/auth.py
+"""
+Authentication that keeps working while the main database is unreachable.
+
+Sessions are signed cookies (``SESSION_ENGINE``), and ``CachedModelBackend``
+keeps the users it loads in ``SYSTEM_CACHES["users"]``. A till that was logged
+in before an outage therefore still gets its user without a query, and its
+checkout reaches the offline queue (``System.till_queue``). A user is dropped
+from the cache once a save or delete of it commits (see ``System.signals``);
+logging in still needs the database.
+"""
+
+import copy
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.backends import ModelBackend
+from django.db import transaction
+
+from .cache import get_cache
+
+CACHE_NAME = "users"
+
+
+def cache_key(user_id):
+    return f"user:{user_id}"
+
+
+class CachedModelBackend(ModelBackend):
+    """``ModelBackend`` whose ``get_user`` reads through the users cache."""
+
+    def get_user(self, user_id):
+        cache = get_cache(CACHE_NAME)
+        user = cache.get(cache_key(user_id))
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(cache_key(user_id), copy.copy(user))
+            return user
+        # Never hand out the cached object itself; requests may change it.
+        user = copy.copy(user)
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        return await sync_to_async(self.get_user)(user_id)
+
+
+def invalidate(user_id):
+    """Drop ``user_id`` from the cache once the current transaction commits."""
+    transaction.on_commit(lambda: get_cache(CACHE_NAME).delete(cache_key(user_id)))
@@ -0,0 +1,202 @@
+# System/cache.py
+"""
+Small LRU caches with pluggable backends, configured in ``SYSTEM_CACHES``::
+
+    SYSTEM_CACHES = {
+        "invoices": {
+            "BACKEND": "System.cache.FileBackend",
+            "OPTIONS": {"location": "/var/cache/aad/invoices", "max_entries": 5000},
+        },
+    }
+
+Every cache counts its hits, misses and evictions in ``System.metrics``
+(``cache_<name>_hits_total`` and so on).
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import metrics
+
+DEFAULT_BACKEND = "System.cache.LocMemBackend"
+
+_caches = {}
+_caches_lock = threading.Lock()
+_missing = object()
+
+
+class BaseBackend:
+    def __init__(self, name, max_entries=1000, timeout=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.hits = metrics.counter(f"cache_{name}_hits_total", f"Hits in the {name} cache.")
+        self.misses = metrics.counter(f"cache_{name}_misses_total", f"Misses in the {name} cache.")
+        self.evictions = metrics.counter(f"cache_{name}_evictions_total", f"LRU evictions from the {name} cache.")
+        self._lock = threading.Lock()
+
+    def _expires(self, timeout):
+        timeout = self.timeout if timeout is None else timeout
+        return time.time() + timeout if timeout else None
+
+    def get(self, key, default=None):
+        raise NotImplementedError
+
+    def set(self, key, value, timeout=None):
+        """Store ``value``; ``timeout`` (seconds) overrides the cache's default."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def get_or_set(self, key, default, timeout=None):
+        """Return the cached value, computing it with ``default()`` on a miss."""
+        value = self.get(key, _missing)
+        if value is _missing:
+            value = default()
+            self.set(key, value, timeout)
+        return value
+
+
+class LocMemBackend(BaseBackend):
+    """Process-local LRU dictionary."""
+
+    def __init__(self, name, max_entries=1000, timeout=None):
+        super().__init__(name, max_entries, timeout)
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.time()):
+                self._data.move_to_end(key)
+                self.hits.inc()
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+        self.misses.inc()
+        return default
+
+    def set(self, key, value, timeout=None):
+        with self._lock:
+            self._data[key] = (self._expires(timeout), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions.inc()
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class FileBackend(BaseBackend):
+    """
+    One pickle file per key in ``location``; survives restarts and is shared
+    by the worker processes of a single node. Recency is the file's mtime.
+    """
+
+    def __init__(self, name, location=None, max_entries=1000, timeout=None):
+        super().__init__(name, max_entries, timeout)
+        self.location = location or os.path.join(tempfile.gettempdir(), "aad_cache", name)
+        os.makedirs(self.location, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.location, hashlib.sha1(str(key).encode()).hexdigest() + ".cache")
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                expires, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses.inc()
+            return default
+        if expires is not None and expires <= time.time():
+            self._remove(path)
+            self.misses.inc()
+            return default
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits.inc()
+        return value
+
+    def set(self, key, value, timeout=None):
+        path = self._path(key)
+        fd, tmp = tempfile.mkstemp(dir=self.location, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((self._expires(timeout), value), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self._cull()
+
+    def delete(self, key):
+        self._remove(self._path(key))
+
+    def clear(self):
+        for path in self._entries():
+            self._remove(path)
+
+    def _entries(self):
+        return [os.path.join(self.location, n) for n in os.listdir(self.location) if n.endswith(".cache")]
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _cull(self):
+        with self._lock:
+            entries = self._entries()
+            if len(entries) <= self.max_entries:
+                return
+            entries.sort(key=_mtime)
+            for path in entries[:len(entries) - self.max_entries]:
+                self._remove(path)
+                self.evictions.inc()
+
+    def __len__(self):
+        return len(self._entries())
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def get_cache(name):
+    """The cache called ``name``, built from ``SYSTEM_CACHES`` on first use."""
+    with _caches_lock:
+        if name not in _caches:
+            config = getattr(settings, "SYSTEM_CACHES", {}).get(name, {})
+            backend = import_string(config.get("BACKEND", DEFAULT_BACKEND))
+            _caches[name] = backend(name, **config.get("OPTIONS", {}))
+        return _caches[name]
+
+
+def reset_caches():
+    """Forget every configured cache (used when settings change, e.g. in tests)."""
+    with _caches_lock:
+        _caches.clear()
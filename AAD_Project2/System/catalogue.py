@@ -0,0 +1,161 @@
+# System/catalogue.py
+"""
+Read-through cache of ``Product`` rows keyed by ``product_id``
+(``SYSTEM_CACHES["catalogue"]``, bounded by ``max_entries``).
+
+Each product that has changed has a version token in
+``SYSTEM_CACHES["catalogue_versions"]``, replaced with a fresh one when a save
+or delete of the product commits (see ``System.signals``). That cache is
+meant to be shared (the ``FileBackend``), so every worker sees every change,
+even when the entries themselves are kept per process. A reader notes the
+token before it goes to the database and only stores what it read if the
+token is still the same, so a row read just before a price change can never
+overwrite the invalidation, and an entry stored under an older token is a
+miss.
+
+SKUs scanned at the till are also mapped to their ``product_id``
+(``SYSTEM_CACHES["catalogue_skus"]``), so ``cached`` can price a basket from
+the cache alone while the database is unreachable (``System.till_queue``).
+"""
+
+import copy
+import uuid
+
+from django.db import transaction
+
+from .cache import get_cache
+from .models import Product
+from .text import normalize_code
+
+CACHE_NAME = "catalogue"
+VERSIONS_CACHE_NAME = "catalogue_versions"
+SKUS_CACHE_NAME = "catalogue_skus"
+
+
+def cache_key(product_id):
+    return f"product:{product_id}"
+
+
+def sku_key(sku):
+    return f"sku:{sku}"
+
+
+def _version(product_id):
+    return get_cache(VERSIONS_CACHE_NAME).get(cache_key(product_id))
+
+
+def get_many(product_ids):
+    """``{product_id: Product}`` for the known products among ``product_ids``; at most one query."""
+    cache = get_cache(CACHE_NAME)
+    found, missing = {}, {}
+    for product_id in product_ids:
+        version = _version(product_id)
+        entry = cache.get(cache_key(product_id))
+        if entry is not None and entry[0] == version:
+            # Callers may change the instance they get (e.g. attach it to a
+            # model), so never hand out the cached object itself.
+            found[product_id] = copy.copy(entry[1])
+        else:
+            missing[product_id] = version
+    if missing:
+        for product_id, product in Product.objects.in_bulk(list(missing)).items():
+            if _version(product_id) == missing[product_id]:
+                cache.set(cache_key(product_id), (missing[product_id], copy.copy(product)))
+            found[product_id] = product
+    return found
+
+
+def get(product_id):
+    """The ``Product`` with ``product_id``; raises ``Product.DoesNotExist``."""
+    product = get_many([product_id]).get(product_id)
+    if product is None:
+        raise Product.DoesNotExist(f"Product {product_id} does not exist.")
+    return product
+
+
+def resolve_codes(codes):
+    """
+    ``{code: Product}`` for scanned or typed ``codes``: each is a SKU/barcode
+    or a ``product_id``. All SKUs are looked up in one indexed query; ids go
+    through the cache. Unknown codes are left out.
+    """
+    by_id, by_sku = {}, {}
+    for code in codes:
+        try:
+            by_id[code] = uuid.UUID(str(code))
+        except ValueError:
+            sku = normalize_code(code)
+            if sku:
+                by_sku[code] = sku
+    resolved = {}
+    if by_id:
+        products = get_many(set(by_id.values()))
+        resolved.update({code: products[pid] for code, pid in by_id.items() if pid in products})
+    if by_sku:
+        products = {p.sku: p for p in Product.objects.filter(sku__in=set(by_sku.values()))}
+        skus = get_cache(SKUS_CACHE_NAME)
+        for sku, product in products.items():
+            skus.set(sku_key(sku), product.pk)
+        resolved.update({code: products[sku] for code, sku in by_sku.items() if sku in products})
+    return resolved
+
+
+def cached(codes):
+    """
+    ``{code: Product}`` like ``resolve_codes``, but from the cache alone and
+    without a query. Codes whose product is not cached, or whose entry is
+    older than the product's last change, are left out.
+    """
+    cache = get_cache(CACHE_NAME)
+    resolved = {}
+    for code in codes:
+        try:
+            product_id, sku = uuid.UUID(str(code)), None
+        except ValueError:
+            sku = normalize_code(code)
+            product_id = get_cache(SKUS_CACHE_NAME).get(sku_key(sku)) if sku else None
+        if product_id is None:
+            continue
+        entry = cache.get(cache_key(product_id))
+        if entry is None or entry[0] != _version(product_id):
+            continue
+        if sku is not None and entry[1].sku != sku:
+            # The code has moved to another product since it was mapped.
+            continue
+        resolved[code] = copy.copy(entry[1])
+    return resolved
+
+
+def attach(items):
+    """Set ``item.product`` on each of ``items`` from the cache instead of a join."""
+    products = get_many({item.product_id for item in items})
+    for item in items:
+        item.product = products[item.product_id]
+    return items
+
+
+def _bump(product_ids):
+    # A new random token rather than a counter: two workers bumping at once
+    # still both leave a token no reader has seen, with no shared increment.
+    versions, cache = get_cache(VERSIONS_CACHE_NAME), get_cache(CACHE_NAME)
+    for product_id in product_ids:
+        versions.set(cache_key(product_id), uuid.uuid4().hex, timeout=0)
+        cache.delete(cache_key(product_id))
+
+
+def invalidate(*product_ids):
+    """Drop ``product_ids`` from the cache once the current transaction commits."""
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: _bump(product_ids))
+
+
+def warm(batch_size=1000):
+    """Load the catalogue (up to the cache's size bound) and its SKUs into the cache; returns the number of products loaded."""
+    cache, skus = get_cache(CACHE_NAME), get_cache(SKUS_CACHE_NAME)
+    loaded = 0
+    for product in Product.objects.order_by("product_id")[:cache.max_entries].iterator(chunk_size=batch_size):
+        cache.set(cache_key(product.pk), (_version(product.pk), product))
+        if product.sku:
+            skus.set(sku_key(product.sku), product.pk)
+        loaded += 1
+    return loaded
@@ -0,0 +1,128 @@
+# System/checkout.py
+"""
+Set-based checkout: the whole basket is validated and written with a fixed
+number of queries, whatever the number of lines.
+
+A submission may carry an idempotency key. The key is stored with the
+purchase in the same transaction, so a till that sends the same basket again
+(a double press, a retry after a timeout) gets the original purchase back
+after one indexed lookup, and stock is only taken once.
+"""
+
+import re
+
+from django.db import IntegrityError, transaction
+
+from . import catalogue, sales_summary
+from .inventory import InventoryMissing, StockError, merge_lines, reserve, run_with_retry
+from .models import CustomerPurchase, IdempotencyKey, Product, PurchaseItem
+
+# Errors the till shows to the cashier as they are.
+CheckoutError = StockError
+
+__all__ = ["CheckoutError", "InventoryMissing", "UnknownProducts", "checkout", "place_order", "valid_key"]
+
+_KEY = re.compile(r"[A-Za-z0-9_-]{8,64}")
+
+
+class UnknownProducts(Product.DoesNotExist):
+    """Some scanned or typed codes match no product; ``codes`` lists them."""
+
+    def __init__(self, codes):
+        super().__init__("Unknown product codes: " + ", ".join(map(str, codes)))
+        self.codes = codes
+
+
+def valid_key(key):
+    """Whether ``key`` can be used as an idempotency key (8-64 of ``[A-Za-z0-9_-]``)."""
+    return isinstance(key, str) and _KEY.fullmatch(key) is not None
+
+
+def replayed(key):
+    """
+    The purchase an earlier submission with ``key`` created, marked with
+    ``replayed = True``, or ``None``.
+    """
+    try:
+        purchase = IdempotencyKey.objects.select_related("purchase").get(key=key).purchase
+    except IdempotencyKey.DoesNotExist:
+        return None
+    purchase.replayed = True
+    return purchase
+
+
+def checkout(lines, mode=None, key=None, sold_at=None, prices=None):
+    """
+    The till's entry point: sell ``lines`` of ``(code, quantity)``, where a
+    code is a SKU/barcode or a ``product_id``, and return the new
+    ``CustomerPurchase``. Raises ``UnknownProducts`` before touching stock if
+    a code is not known, and ``CheckoutError`` as ``place_order`` does. With
+    ``key``, a repeated submission returns the first one's purchase.
+    ``sold_at`` backdates the purchase and ``prices`` (``{code: unit_price}``)
+    replaces the catalogue prices, for sales replayed from the till queue at
+    the prices the customer paid.
+    """
+    if key:
+        purchase = replayed(key)
+        if purchase is not None:
+            return purchase
+    lines = list(lines)
+    products = catalogue.resolve_codes({code for code, quantity in lines})
+    unknown = list(dict.fromkeys(code for code, quantity in lines if code not in products))
+    if unknown:
+        raise UnknownProducts(unknown)
+    if prices is not None:
+        prices = {products[code].pk: price for code, price in prices.items()}
+    return place_order([(products[code].pk, quantity) for code, quantity in lines], mode, key, sold_at, prices)
+
+
+def place_order(lines, mode=None, key=None, sold_at=None, prices=None):
+    """
+    Sell ``lines`` (an iterable of ``(product_id, quantity)``) and return the
+    new ``CustomerPurchase``. Lines for the same product are merged into one
+    invoice row. ``mode`` overrides ``INVENTORY_CONCURRENCY_MODE``; ``key`` is
+    an idempotency key, ``sold_at`` a sale time and ``prices``
+    (``{product_id: unit_price}``) the prices to charge (see ``checkout``).
+
+    Raises ``Product.DoesNotExist`` for unknown products and ``CheckoutError``
+    when stock runs short; nothing is written in either case.
+    """
+    quantities = merge_lines(lines)
+    try:
+        return run_with_retry(_place_order, quantities, mode, key, sold_at, prices or {})
+    except IntegrityError:
+        # A concurrent submission with the same key committed first; this
+        # one has been rolled back, stock included.
+        purchase = replayed(key) if key else None
+        if purchase is None:
+            raise
+        return purchase
+
+
+def _place_order(quantities, mode, key, sold_at, prices):
+    product_ids = list(quantities)
+    with transaction.atomic():
+        products = catalogue.get_many(product_ids)
+        if len(products) != len(product_ids):
+            raise Product.DoesNotExist("Unknown product in basket.")
+
+        prices = {pid: prices.get(pid, product.price) for pid, product in products.items()}
+        total = sum(prices[pid] * quantity for pid, quantity in quantities.items())
+        purchase = CustomerPurchase.objects.create(total_amount=total)
+        if sold_at is not None:
+            # purchase_date is auto_now_add, so a backdated sale is moved afterwards.
+            CustomerPurchase.objects.filter(pk=purchase.pk).update(purchase_date=sold_at)
+            purchase.purchase_date = sold_at
+        if key:
+            # Before any stock is locked, so a duplicate in flight waits here
+            # on the unique index rather than on the inventory rows.
+            IdempotencyKey.objects.create(key=key, purchase=purchase)
+
+        reserve(quantities, names={pid: p.name for pid, p in products.items()}, mode=mode)
+
+        PurchaseItem.objects.bulk_create([
+            PurchaseItem(purchase=purchase, product=products[pid], quantity=quantity, price=prices[pid])
+            for pid, quantity in quantities.items()
+        ])
+        sales_summary.record_purchase_on_commit(purchase.pk)
+    return purchase
@@ -0,0 +1,110 @@
+# System/dashboard.py
+"""
+Aggregates behind the store manager and employee dashboards.
+
+Each panel group is a handful of aggregate queries whose result is cached
+(``SYSTEM_CACHES["dashboard"]``). A snapshot older than ``DASHBOARD_CACHE_TTL``
+seconds is still served while a background thread recomputes it, so a
+terminal refreshing its dashboard never waits on the database once the cache
+is warm.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from . import ledger
+from .cache import get_cache
+from .inventory import run_in_background
+from .models import Attendance, DailySalesSummary, Debt, Inventory, SpecialCustomer
+
+CACHE_NAME = "dashboard"
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def _ttl():
+    return getattr(settings, "DASHBOARD_CACHE_TTL", 30)
+
+
+def floor_panels(today):
+    """Sales, top sellers and low stock: what the shop floor needs (three queries)."""
+    sold = DailySalesSummary.objects.filter(date=today).aggregate(revenue=Sum("revenue"), quantity=Sum("quantity"))
+    top_sellers = list(
+        DailySalesSummary.objects.filter(date=today)
+        .values("product_id", "product__name")
+        .annotate(quantity=Sum("quantity"), revenue=Sum("revenue"))
+        .order_by("-quantity", "product_id")[:getattr(settings, "DASHBOARD_TOP_SELLERS", 5)]
+    )
+    low_stock = list(
+        Inventory.objects.low_stock()
+        .order_by("quantity", "product_id")
+        .values("product_id", "product__name", "quantity", "reorder_threshold")
+        [:getattr(settings, "DASHBOARD_LOW_STOCK_ROWS", 10)]
+    )
+    return {
+        "revenue": sold["revenue"] or 0,
+        "items_sold": sold["quantity"] or 0,
+        "top_sellers": top_sellers,
+        "low_stock": low_stock,
+    }
+
+
+def office_panels(today):
+    """Credit balances and top debtors, overdue debt and today's attendance (four queries)."""
+    credit = SpecialCustomer.objects.filter(balance__gt=0).aggregate(total=Sum("balance"), customers=Count("pk"))
+    debt = Debt.objects.unpaid().filter(due_date__lt=today).aggregate(total=Sum("amount"), count=Count("pk"))
+    attendance = dict(
+        Attendance.objects.filter(date=today).values_list("status").annotate(count=Count("pk")).order_by()
+    )
+    return {
+        "unpaid_credit": credit["total"] or 0,
+        "credit_customers": credit["customers"],
+        "top_debtors": ledger.top_debtors(getattr(settings, "DASHBOARD_TOP_DEBTORS", 5)),
+        "overdue_debt": debt["total"] or 0,
+        "overdue_debts": debt["count"],
+        "attendance": [(label, attendance.get(status, 0)) for status, label in Attendance.STATUS_CHOICES],
+    }
+
+
+PANELS = {"floor": floor_panels, "office": office_panels}
+
+
+def _recompute(name, today):
+    data = PANELS[name](today)
+    # Stored without expiry: staleness is judged from the timestamp so an
+    # old snapshot can be served while the new one is computed.
+    get_cache(CACHE_NAME).set(f"{name}:{today}", (time.time(), data), timeout=0)
+    return data
+
+
+def _refresh_in_background(name, today):
+    key = (name, today)
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def refresh():
+        try:
+            _recompute(name, today)
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+    run_in_background(refresh)
+
+
+def panels(name):
+    """The ``name`` panel group for today, from the cache where possible."""
+    today = timezone.localdate()
+    entry = get_cache(CACHE_NAME).get(f"{name}:{today}")
+    if entry is None:
+        return _recompute(name, today)
+    computed_at, data = entry
+    if time.time() - computed_at > _ttl():
+        _refresh_in_background(name, today)
+    return data
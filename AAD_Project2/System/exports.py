@@ -0,0 +1,150 @@
+# System/exports.py
+"""
+Streaming exports of sales, wholesale purchases and inventory.
+
+Rows are read with ``QuerySet.iterator(chunk_size=...)`` (a server-side cursor
+where the backend has one) and written out as they arrive, so memory stays
+flat whether the export covers a day or five years.
+"""
+
+import csv
+import datetime
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import DecimalField, ExpressionWrapper, F
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Inventory, Product, PurchaseItem, WholesalePurchaseItem
+
+FORMATS = ("csv", "json")
+
+# Rows per yielded chunk of output.
+ROWS_PER_CHUNK = 200
+
+
+def _money(expression):
+    return ExpressionWrapper(expression, output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def filter_days(queryset, field, date_from, date_to):
+    # Half-open datetime range, so the purchase_date index can be used.
+    if date_from:
+        queryset = queryset.filter(**{f"{field}__gte": day_start(date_from)})
+    if date_to:
+        queryset = queryset.filter(**{f"{field}__lt": day_start(date_to + datetime.timedelta(days=1))})
+    return queryset
+
+
+def sales(date_from=None, date_to=None, product_type=None):
+    queryset = PurchaseItem.objects.all()
+    queryset = filter_days(queryset, "purchase__purchase_date", date_from, date_to)
+    if product_type:
+        queryset = queryset.filter(product__product_type=product_type)
+    return queryset.annotate(line_total=_money(F("quantity") * F("price"))).order_by(
+        "purchase__purchase_date", "purchase_id", "pi_id",
+    ).values_list(
+        "purchase_id", "purchase__purchase_date", "product_id", "product__name", "product__product_type",
+        "quantity", "price", "line_total",
+    )
+
+
+def wholesale(date_from=None, date_to=None, product_type=None):
+    queryset = WholesalePurchaseItem.objects.all()
+    queryset = filter_days(queryset, "purchase__purchase_date", date_from, date_to)
+    if product_type:
+        queryset = queryset.filter(product__product_type=product_type)
+    return queryset.annotate(line_total=_money(F("quantity") * F("price"))).order_by(
+        "purchase__purchase_date", "purchase_id", "wpi_id",
+    ).values_list(
+        "purchase_id", "purchase__purchase_date", "purchase__wholesaler__name", "product_id", "product__name",
+        "product__product_type", "quantity", "price", "line_total",
+    )
+
+
+def inventory(date_from=None, date_to=None, product_type=None):
+    queryset = Inventory.objects.all()
+    queryset = filter_days(queryset, "updated_at", date_from, date_to)
+    if product_type:
+        queryset = queryset.filter(product__product_type=product_type)
+    return queryset.annotate(stock_value=_money(F("quantity") * F("product__price"))).order_by(
+        "product_id",
+    ).values_list(
+        "product_id", "product__name", "product__product_type", "quantity", "product__price", "stock_value",
+        "updated_at",
+    )
+
+
+EXPORTS = {
+    "sales": (sales, ("purchase_id", "purchase_date", "product_id", "product_name", "product_type",
+                      "quantity", "unit_price", "line_total")),
+    "wholesale": (wholesale, ("purchase_id", "purchase_date", "wholesaler", "product_id", "product_name",
+                              "product_type", "quantity", "unit_price", "line_total")),
+    "inventory": (inventory, ("product_id", "product_name", "product_type", "quantity", "unit_price",
+                              "stock_value", "updated_at")),
+}
+
+
+def parse_filters(data):
+    """Read ``from``, ``to`` and ``product_type`` from a mapping; raise ``ValueError`` on bad input."""
+    filters = {}
+    for key, name in (("from", "date_from"), ("to", "date_to")):
+        if data.get(key):
+            day = parse_date(data[key])
+            if day is None:
+                raise ValueError(f"'{key}' must be a YYYY-MM-DD date.")
+            filters[name] = day
+    product_type = data.get("product_type")
+    if product_type:
+        if product_type not in dict(Product.PRODUCT_TYPE_CHOICES):
+            raise ValueError(f"Unknown product type '{product_type}'.")
+        filters["product_type"] = product_type
+    return filters
+
+
+def rows(kind, **filters):
+    """Header and a lazy row iterator for export ``kind``."""
+    queryset_for, header = EXPORTS[kind]
+    chunk_size = getattr(settings, "EXPORT_CHUNK_SIZE", 2000)
+    return header, queryset_for(**filters).iterator(chunk_size=chunk_size)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(_Echo())
+    chunk = [writer.writerow(header)]
+    for row in rows:
+        chunk.append(writer.writerow(row))
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def stream_json(header, rows):
+    yield "["
+    separator = ""
+    chunk = []
+    for row in rows:
+        chunk.append(separator + json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder, ensure_ascii=False))
+        separator = ","
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield "".join(chunk)
+            chunk = []
+    yield "".join(chunk) + "]"
+
+
+def stream(kind, fmt, **filters):
+    header, data = rows(kind, **filters)
+    return stream_csv(header, data) if fmt == "csv" else stream_json(header, data)
@@ -1,11 +1,52 @@
 ﻿# System/forms.py
+import uuid
+
 from django import forms
 from django.forms import formset_factory
 
+from .models import Wholesaler
+
 class PurchaseItemForm(forms.Form):
-    product_id = forms.UUIDField(label="آیدی کالا")
+    # بارکد/کد کالا یا آیدی کامل؛ checkout.checkout آن را به کالا تبدیل می‌کند
+    product_id = forms.CharField(max_length=36, label="کد یا آیدی کالا")
     quantity = forms.IntegerField(min_value=1, label="تعداد")
 
 # Initial visible rows; client-side JS can add more dynamically
 PurchaseItemFormSet = formset_factory(PurchaseItemForm, extra=1)
 
+class WholesaleImportForm(forms.Form):
+    wholesaler = forms.ModelChoiceField(queryset=Wholesaler.objects.all(), label="عمده‌فروش")
+    file = forms.FileField(label="فایل تحویل (CSV یا XLSX)")
+
+class AttendanceReviewForm(forms.Form):
+    # ردیف‌های انتخاب‌شده از صف، یا اگر هیچ‌کدام انتخاب نشده باشد کل بازه تاریخ
+    ACTION_CHOICES = [("approve", "تأیید"), ("reject", "رد")]
+    action = forms.ChoiceField(choices=ACTION_CHOICES, label="عملیات")
+    attendance_id = forms.TypedMultipleChoiceField(required=False, coerce=uuid.UUID, label="ردیف‌ها")
+    date_from = forms.DateField(required=False, label="از تاریخ")
+    date_to = forms.DateField(required=False, label="تا تاریخ")
+    max_rows = 500
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # شناسه‌ها از صف ارسال می‌شوند و فهرست ثابتی ندارند
+        self.fields["attendance_id"].valid_value = self._is_uuid
+
+    @staticmethod
+    def _is_uuid(value):
+        try:
+            uuid.UUID(str(value))
+        except ValueError:
+            return False
+        return True
+
+    def clean(self):
+        cleaned = super().clean()
+        ids, date_from, date_to = cleaned.get("attendance_id"), cleaned.get("date_from"), cleaned.get("date_to")
+        if not ids and not (date_from and date_to):
+            raise forms.ValidationError("چند ردیف را انتخاب کنید یا بازه تاریخ را کامل وارد کنید.")
+        if ids and len(ids) > self.max_rows:
+            raise forms.ValidationError(f"حداکثر {self.max_rows} ردیف در هر بار.")
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("تاریخ شروع باید قبل از تاریخ پایان باشد.")
+        return cleaned
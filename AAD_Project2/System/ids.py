@@ -0,0 +1,49 @@
+# System/ids.py
+"""
+Time-ordered primary keys.
+
+``uuid7()`` returns RFC 9562 version-7 UUIDs: a 48-bit Unix millisecond
+timestamp followed by random bits. Keys generated later sort after keys
+generated earlier (in hex/string order too, which is how the SQL Server
+backend stores ``UUIDField``), so inserts land at the end of the clustered
+index instead of splitting pages all over it.
+"""
+
+import os
+import threading
+import time
+import uuid
+
+_lock = threading.Lock()
+_last_ms = 0
+_sequence = 0
+
+
+def uuid7():
+    """A new version-7 UUID; strictly increasing within this process."""
+    global _last_ms, _sequence
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            # Start low in the 12-bit counter so a busy millisecond has room.
+            _sequence = int.from_bytes(os.urandom(2), "big") & 0x7FF
+        else:
+            _sequence += 1
+            if _sequence > 0xFFF:
+                # Counter exhausted (or the clock went back): borrow the next millisecond.
+                _last_ms += 1
+                _sequence = 0
+        ms, sequence = _last_ms, _sequence
+
+    value = (ms & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76
+    value |= sequence << 64
+    value |= 0b10 << 62
+    value |= int.from_bytes(os.urandom(8), "big") & 0x3FFFFFFFFFFFFFFF
+    return uuid.UUID(int=value)
+
+
+def uuid7_time(value):
+    """The Unix time in seconds encoded in a version-7 UUID."""
+    return (value.int >> 80) / 1000
@@ -0,0 +1,188 @@
+# System/imports.py
+"""
+Bulk import of a wholesaler's delivery from CSV or XLSX.
+
+Each line names a product (``product_id`` or ``name``), the ``quantity``
+received and its ``unit_price``; ``product_type`` and ``sale_price`` are
+optional. The whole file is imported in one transaction: products are
+upserted, the ``WholesalePurchase`` and its items are written with
+``bulk_create``, stock is raised with set-based UPDATEs and the purchase total
+is computed in SQL.
+"""
+
+import csv
+import io
+import os
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+
+from . import catalogue, inventory, search
+from .models import Product, WholesalePurchase, WholesalePurchaseItem
+from .text import normalize_search
+
+# SQL Server accepts at most 2100 parameters per statement.
+IN_BATCH = 1000
+INSERT_BATCH = 300
+
+MAX_REPORTED_ERRORS = 20
+
+
+class ImportFailed(Exception):
+    """The file could not be imported; ``errors`` lists what was wrong with it."""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def read_rows(fileobj, filename):
+    """Yield each data row of a CSV or XLSX file as a dict keyed by lower-case header."""
+    if os.path.splitext(filename)[1].lower() == ".xlsx":
+        yield from _read_xlsx(fileobj)
+        return
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        for row in csv.DictReader(text):
+            yield {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+    finally:
+        text.detach()
+
+
+def _read_xlsx(fileobj):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFailed(["Reading XLSX files needs the openpyxl package; upload a CSV instead."])
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(h or "").strip().lower() for h in next(rows, ())]
+        for values in rows:
+            yield {h: "" if v is None else str(v).strip() for h, v in zip(header, values)}
+    finally:
+        workbook.close()
+
+
+def _decimal(value):
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        return None
+    return number if number.is_finite() and number >= 0 else None
+
+
+def parse_lines(rows):
+    """Validate ``rows`` and return a list of line dicts; raise ``ImportFailed`` on bad input."""
+    types = dict(Product.PRODUCT_TYPE_CHOICES)
+    lines, errors = [], []
+    for number, row in enumerate(rows, start=2):
+        line = {"row": number}
+        if row.get("product_id"):
+            try:
+                line["product_id"] = uuid.UUID(row["product_id"])
+            except ValueError:
+                errors.append(f"ردیف {number}: شناسه کالا نامعتبر است.")
+        elif row.get("name"):
+            line["name"] = row["name"]
+        else:
+            errors.append(f"ردیف {number}: نام یا شناسه کالا لازم است.")
+        try:
+            line["quantity"] = int(row.get("quantity", ""))
+            if line["quantity"] < 1:
+                raise ValueError
+        except ValueError:
+            errors.append(f"ردیف {number}: تعداد نامعتبر است.")
+        line["unit_price"] = _decimal(row.get("unit_price", ""))
+        if line["unit_price"] is None:
+            errors.append(f"ردیف {number}: قیمت واحد نامعتبر است.")
+        if row.get("sale_price"):
+            line["sale_price"] = _decimal(row["sale_price"])
+            if line["sale_price"] is None:
+                errors.append(f"ردیف {number}: قیمت فروش نامعتبر است.")
+        line["product_type"] = row.get("product_type") or "OTHER"
+        if line["product_type"] not in types:
+            errors.append(f"ردیف {number}: نوع کالا «{line['product_type']}» نامعتبر است.")
+        lines.append(line)
+        if len(errors) >= MAX_REPORTED_ERRORS:
+            break
+    if errors:
+        raise ImportFailed(errors)
+    if not lines:
+        raise ImportFailed(["فایل هیچ ردیفی ندارد."])
+    return lines
+
+
+def _chunks(values, size=IN_BATCH):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _upsert_products(lines):
+    """Resolve every line to a Product, creating and updating rows in bulk."""
+    by_id, by_name = {}, {}
+    ids = {line["product_id"] for line in lines if "product_id" in line}
+    names = {line["name"] for line in lines if "name" in line}
+    for chunk in _chunks(ids):
+        by_id.update(Product.objects.in_bulk(chunk))
+    for chunk in _chunks(names):
+        for product in Product.objects.filter(name__in=chunk).order_by("product_id"):
+            by_name.setdefault(product.name, product)
+
+    missing_ids = ids - set(by_id)
+    if missing_ids:
+        raise ImportFailed([f"کالا با شناسه {pid} وجود ندارد." for pid in sorted(map(str, missing_ids))][:MAX_REPORTED_ERRORS])
+
+    created, changed = {}, {}
+    for line in lines:
+        product = by_id.get(line.get("product_id")) or by_name.get(line.get("name"))
+        if product is None:
+            product = created.get(line["name"])
+            if product is None:
+                product = Product(name=line["name"], search_name=normalize_search(line["name"]),
+                                  product_type=line["product_type"], price=line.get("sale_price", line["unit_price"]))
+                created[product.name] = product
+        elif "sale_price" in line and product.price != line["sale_price"]:
+            product.price = line["sale_price"]
+            changed[product.pk] = product
+        line["product"] = product
+
+    Product.objects.bulk_create(created.values(), batch_size=INSERT_BATCH)
+    Product.objects.bulk_update(changed.values(), ["price"], batch_size=INSERT_BATCH)
+    # bulk_create/bulk_update send no post_save, so the caches are dropped here.
+    catalogue.invalidate(*changed)
+    if created or changed:
+        search.invalidate()
+    return len(created), len(changed)
+
+
+def import_delivery(wholesaler, rows):
+    """
+    Import the delivery in ``rows`` (see ``read_rows``) from ``wholesaler``.
+    Returns ``(purchase, summary)``; raises ``ImportFailed`` without writing
+    anything if a line is invalid.
+    """
+    lines = parse_lines(rows)
+    with transaction.atomic():
+        created, updated = _upsert_products(lines)
+        purchase = WholesalePurchase.objects.create(wholesaler=wholesaler)
+        WholesalePurchaseItem.objects.bulk_create([
+            WholesalePurchaseItem(purchase=purchase, product=line["product"], quantity=line["quantity"],
+                                  price=line["unit_price"])
+            for line in lines
+        ], batch_size=INSERT_BATCH)
+        inventory.restock_wholesale(purchase.pk)
+
+        money = DecimalField(max_digits=12, decimal_places=2)
+        total = (
+            WholesalePurchaseItem.objects.filter(purchase_id=OuterRef("pk"))
+            .values("purchase_id")
+            .annotate(total=Sum(ExpressionWrapper(F("quantity") * F("price"), output_field=money)))
+            .values("total")
+        )
+        WholesalePurchase.objects.filter(pk=purchase.pk).update(total_amount=Subquery(total, output_field=money))
+        purchase.refresh_from_db(fields=["total_amount"])
+    return purchase, {"lines": len(lines), "created": created, "updated": updated}
@@ -0,0 +1,167 @@
+# System/instrumentation.py
+"""
+Per-view request metrics: SQL query count, database time, template render
+time and total latency, observed into ``System.metrics`` histograms labelled
+with the resolved view name (``system:purchase_invoice``, ...).
+
+``RequestMetricsMiddleware`` opens a small per-request record in a context
+variable. Every database connection gets ``record_query`` as a permanent
+execute wrapper when it is created, and ``TimedDjangoTemplates`` times
+``Template.render`` (a nested render counts towards the outermost template);
+both add to the current record, if there is one, and do nothing else
+otherwise. The cost per query is two ``perf_counter`` calls and
+a context variable lookup, cheap enough to leave on. Requests slower than
+``METRICS_SLOW_REQUEST_SECONDS`` or running more than
+``METRICS_SLOW_REQUEST_QUERIES`` queries are also logged.
+
+Latency is measured until the view returns its response; the body of a
+streaming response is produced after that and is not included.
+"""
+
+import contextvars
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+UNRESOLVED = "<unresolved>"
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+request_seconds = metrics.histogram(
+    "http_request_duration_seconds", "Time from the request entering the middleware to the response.",
+    SECONDS_BUCKETS)
+request_db_seconds = metrics.histogram(
+    "http_request_db_seconds", "Time spent executing SQL per request.", SECONDS_BUCKETS)
+request_queries = metrics.histogram(
+    "http_request_queries", "SQL statements executed per request.", QUERY_BUCKETS)
+request_template_seconds = metrics.histogram(
+    "http_request_template_seconds", "Time spent rendering templates per request.", SECONDS_BUCKETS)
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+class _Record:
+    __slots__ = ("started", "queries", "db_seconds", "template_seconds", "template_depth")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper (see ``connection.execute_wrapper``) adding the query to the current request."""
+    record = _current.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record.db_seconds += time.perf_counter() - started
+        record.queries += 1
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    """``connection_created`` receiver: wrap every new connection's queries."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        record = _current.get()
+        if record is None:
+            return super().render(context, request)
+        # Only the outermost render is timed: a template rendered from inside
+        # another (e.g. a cached invoice body) is part of the outer template's
+        # time and gets no figure of its own.
+        record.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            record.template_depth -= 1
+            if not record.template_depth:
+                record.template_seconds += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render time added to the request metrics."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match is not None else UNRESOLVED
+
+
+def _finish(request, record, response):
+    seconds = time.perf_counter() - record.started
+    view = view_name(request)
+    request_seconds.observe(seconds, view=view)
+    request_db_seconds.observe(record.db_seconds, view=view)
+    request_queries.observe(record.queries, view=view)
+    request_template_seconds.observe(record.template_seconds, view=view)
+    slow_seconds = getattr(settings, "METRICS_SLOW_REQUEST_SECONDS", 1.0)
+    slow_queries = getattr(settings, "METRICS_SLOW_REQUEST_QUERIES", 50)
+    if (slow_seconds is not None and seconds >= slow_seconds) or \
+            (slow_queries is not None and record.queries >= slow_queries):
+        logger.warning(
+            "Slow request %s %s (%s) -> %s: %.3fs, %d queries in %.3fs, templates %.3fs",
+            request.method, request.path, view, getattr(response, "status_code", "-"),
+            seconds, record.queries, record.db_seconds, record.template_seconds,
+        )
+
+
+class RequestMetricsMiddleware:
+    """Observe each request's latency, queries, DB and template time under its view name."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        record = _Record()
+        token = _current.set(record)
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            _current.reset(token)
+            _finish(request, record, response)
+
+    async def __acall__(self, request):
+        record = _Record()
+        token = _current.set(record)
+        response = None
+        try:
+            response = await self.get_response(request)
+            return response
+        finally:
+            _current.reset(token)
+            _finish(request, record, response)
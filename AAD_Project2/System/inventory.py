@@ -0,0 +1,421 @@
+# System/inventory.py
+"""
+Stock reservation. Two concurrency modes are available, chosen with the
+``INVENTORY_CONCURRENCY_MODE`` setting:
+
+* ``pessimistic`` locks the rows in ``product_id`` order (so two tills selling
+  overlapping baskets can never deadlock each other), checks them and then
+  decrements them.
+* ``optimistic`` takes no row locks up front and relies on one conditional
+  UPDATE (``quantity >= n``); a short row shows up in the affected-row count.
+
+In both modes a transaction that still loses to the database (deadlock victim,
+serialization failure) is retried with bounded exponential backoff.
+
+With ``INVENTORY_SHARDED_STOCK`` enabled, hot products can have their stock
+split across K ``InventoryShard`` rows. A sale takes from one random shard
+that can cover it, so tills selling the same product rarely meet on one row,
+and it never writes the product's ``Inventory`` row. ``Inventory.quantity`` of
+a sharded product is a copy of the sum of its shards, refreshed by
+``rebalance``, by deliveries and by ``manage.py shard_inventory --refresh``
+(meant to run on a schedule); the shards are the stock a sale checks.
+
+Every UPDATE that changes ``Inventory.quantity`` also sets
+``Inventory.below_threshold`` from the new quantity (``below_threshold()``), so
+the low-stock list is an index seek and never needs a scan of the table.
+"""
+
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import BooleanField, Case, F, OuterRef, PositiveIntegerField, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import metrics
+from .models import Inventory, InventoryShard, WholesalePurchaseItem
+
+lock_wait_seconds = metrics.counter(
+    "inventory_lock_wait_seconds_total", "Time spent waiting for inventory row locks.")
+lock_acquisitions = metrics.counter(
+    "inventory_lock_acquisitions_total", "Inventory lock statements executed.")
+retries = metrics.counter(
+    "inventory_retries_total", "Transactions retried after a deadlock or serialization failure.")
+retries_exhausted = metrics.counter(
+    "inventory_retries_exhausted_total", "Transactions that still failed after the last retry.")
+shard_fallbacks = metrics.counter(
+    "inventory_shard_fallbacks_total", "Sharded sales no single shard could cover.")
+
+PESSIMISTIC = "pessimistic"
+OPTIMISTIC = "optimistic"
+MODES = (PESSIMISTIC, OPTIMISTIC)
+
+# Random shards tried with a conditional UPDATE before locking them all.
+SHARD_ATTEMPTS = 3
+
+# Driver codes the supported backends use for "try the transaction again",
+# matched exactly. SQLSTATE 40001 serialization failure (also SQL Server's
+# deadlock victim), 40P01 PostgreSQL deadlock_detected; SQL Server native
+# errors 1205 deadlock victim, 3960 snapshot update conflict; SQLite busy or
+# locked database.
+RETRYABLE_SQLSTATES = frozenset({"40001", "40P01"})
+RETRYABLE_NATIVE_ERRORS = frozenset({1205, 3960})
+RETRYABLE_SQLITE_ERRORS = frozenset({"SQLITE_BUSY", "SQLITE_LOCKED"})
+
+_SQLSTATE = re.compile(r"[0-9A-Z]{5}")
+# pyodbc ends each diagnostic record with "(<native error>) (SQL<function>)".
+_NATIVE_ERROR = re.compile(r"\((\d+)\) \(SQL\w+\)")
+
+
+class StockError(Exception):
+    """Stock could not be reserved; the message is shown to the cashier."""
+
+
+class InventoryMissing(StockError):
+    def __init__(self, message="برای برخی کالاها رکورد موجودی یافت نشد."):
+        super().__init__(message)
+
+
+class InsufficientStock(StockError):
+    def __init__(self, product_id, message):
+        super().__init__(message)
+        self.product_id = product_id
+
+
+def merge_lines(lines):
+    """Sum quantities per product, keeping the order the products first appear in."""
+    quantities = {}
+    for product_id, quantity in lines:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def error_codes(exc):
+    """
+    ``(sqlstate, native_errors, sqlite_error)`` the driver reported for
+    ``exc`` (a Django error or the driver's own); parts the driver did not
+    give are ``None`` or empty.
+    """
+    cause = exc.__cause__ or exc
+    args = [arg for arg in getattr(cause, "args", ()) if isinstance(arg, str)]
+    # psycopg has the SQLSTATE as an attribute; pyodbc passes it as the first
+    # argument, ahead of the message.
+    sqlstate = getattr(cause, "sqlstate", None) or getattr(cause, "pgcode", None)
+    if not sqlstate and args and args[0].strip():
+        first = args[0].split(maxsplit=1)[0]
+        if _SQLSTATE.fullmatch(first):
+            sqlstate = first
+    native_errors = {int(code) for arg in args[1:] for code in _NATIVE_ERROR.findall(arg)}
+    return sqlstate, native_errors, getattr(cause, "sqlite_errorname", None)
+
+
+def is_retryable(exc):
+    """Whether ``exc`` is a deadlock or serialization failure, so running the transaction again can succeed."""
+    if isinstance(exc, IntegrityError):
+        return False
+    sqlstate, native_errors, sqlite_error = error_codes(exc)
+    return (
+        sqlstate in RETRYABLE_SQLSTATES
+        or bool(native_errors & RETRYABLE_NATIVE_ERRORS)
+        or sqlite_error in RETRYABLE_SQLITE_ERRORS
+    )
+
+
+def run_with_retry(func, *args, **kwargs):
+    """
+    Call ``func`` and retry it when the database reports a deadlock or
+    serialization failure. ``func`` must open its own transaction; inside an
+    outer atomic block there is nothing safe to retry, so it runs once.
+    """
+    attempts = getattr(settings, "INVENTORY_MAX_RETRIES", 3)
+    base_delay = getattr(settings, "INVENTORY_RETRY_BASE_DELAY", 0.02)
+    max_delay = getattr(settings, "INVENTORY_RETRY_MAX_DELAY", 0.5)
+    if transaction.get_connection().in_atomic_block:
+        attempts = 0
+
+    attempt = 0
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except DatabaseError as exc:
+            if not is_retryable(exc):
+                raise
+            if attempt >= attempts:
+                retries_exhausted.inc()
+                raise
+            attempt += 1
+            retries.inc()
+            # Full jitter keeps competing tills from retrying in lock step.
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+
+
+def lock_stock(product_ids):
+    """Lock the inventory rows of ``product_ids`` in a fixed order and return ``{product_id: quantity}``."""
+    started = time.perf_counter()
+    stock = dict(
+        Inventory.objects.select_for_update()
+        .filter(product_id__in=product_ids)
+        .order_by("product_id")
+        .values_list("product_id", "quantity")
+    )
+    lock_wait_seconds.inc(time.perf_counter() - started)
+    lock_acquisitions.inc()
+    return stock
+
+
+def concurrency_mode():
+    mode = getattr(settings, "INVENTORY_CONCURRENCY_MODE", PESSIMISTIC)
+    if mode not in MODES:
+        raise ValueError(f"Unknown INVENTORY_CONCURRENCY_MODE {mode!r}")
+    return mode
+
+
+def reserve(quantities, names=None, mode=None):
+    """
+    Take ``quantities`` (``{product_id: quantity}``) out of stock. Must run
+    inside a transaction. ``names`` maps product ids to display names for the
+    shortage message; ``mode`` overrides ``INVENTORY_CONCURRENCY_MODE``.
+    """
+    names = names or {}
+    mode = mode or concurrency_mode()
+    sharded = sharded_inventories(list(quantities)) if sharding_enabled() else {}
+    plain = {pid: quantity for pid, quantity in quantities.items() if pid not in sharded}
+    if plain:
+        _reserve_rows(plain, names, mode)
+    for product_id in sorted(sharded):
+        take_from_shards(sharded[product_id], product_id, quantities[product_id], names)
+
+
+def _reserve_rows(quantities, names, mode):
+    if mode == PESSIMISTIC:
+        stock = lock_stock(list(quantities))
+        _check(quantities, stock, names)
+        if decrement(quantities) == len(quantities):
+            return
+    else:
+        # The UPDATE may have touched some of the rows before finding a short
+        # one, so it runs in a savepoint that is undone before we look again.
+        sid = transaction.savepoint()
+        if decrement(quantities) == len(quantities):
+            transaction.savepoint_commit(sid)
+            return
+        transaction.savepoint_rollback(sid)
+    # Some row was missing or short; read the rows once more to say which.
+    stock = dict(
+        Inventory.objects.filter(product_id__in=list(quantities)).values_list("product_id", "quantity"))
+    _check(quantities, stock, names)
+    raise StockError("موجودی برخی کالاها در حین ثبت خرید تغییر کرد.")
+
+
+def _check(quantities, stock, names):
+    if len(stock) != len(quantities):
+        raise InventoryMissing()
+    for product_id, quantity in quantities.items():
+        if stock[product_id] < quantity:
+            raise InsufficientStock(
+                product_id, f"موجودی کافی برای «{names.get(product_id, product_id)}» وجود ندارد.")
+
+
+def below_threshold(quantity):
+    """
+    The value of ``Inventory.below_threshold`` once the row holds ``quantity``.
+    In an UPDATE, ``F()`` inside ``quantity`` still reads the old row, so this
+    can be set alongside ``quantity`` in the same statement.
+    """
+    return Case(
+        When(reorder_threshold__gte=quantity, then=Value(True)),
+        default=Value(False),
+        output_field=BooleanField(),
+    )
+
+
+def decrement(quantities):
+    """
+    Subtract ``quantities`` with one UPDATE and return the number of rows
+    changed. The WHERE clause checks ``quantity >= n`` for every row, so a
+    short row is left untouched and is missing from the count.
+    """
+    guard = Q()
+    for product_id, quantity in quantities.items():
+        guard |= Q(product_id=product_id, quantity__gte=quantity)
+    return Inventory.objects.filter(guard).update(
+        quantity=Case(
+            *[When(product_id=pid, then=F("quantity") - quantity) for pid, quantity in quantities.items()],
+            output_field=PositiveIntegerField(),
+        ),
+        below_threshold=Case(
+            *[When(product_id=pid, reorder_threshold__gte=F("quantity") - quantity, then=Value(True))
+              for pid, quantity in quantities.items()],
+            default=Value(False),
+            output_field=BooleanField(),
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+def sharding_enabled():
+    return getattr(settings, "INVENTORY_SHARDED_STOCK", False)
+
+
+def sharded_inventories(product_ids):
+    """``{product_id: inventory_id}`` for the sharded products among ``product_ids``."""
+    return dict(
+        Inventory.objects.filter(product_id__in=product_ids, is_sharded=True)
+        .values_list("product_id", "inventory_id")
+    )
+
+
+def take_from_shards(inventory_id, product_id, quantity, names=None):
+    """Take ``quantity`` from the shards of one sharded inventory. Must run inside a transaction."""
+    candidates = list(
+        InventoryShard.objects.filter(inventory_id=inventory_id, quantity__gte=quantity)
+        .values_list("shard_id", flat=True)
+    )
+    random.shuffle(candidates)
+    for shard_id in candidates[:SHARD_ATTEMPTS]:
+        if InventoryShard.objects.filter(shard_id=shard_id, quantity__gte=quantity).update(
+                quantity=F("quantity") - quantity):
+            return
+
+    # No single shard could cover the sale: lock them all, take from each in
+    # turn and even them out again once the sale has committed.
+    shard_fallbacks.inc()
+    shards = list(InventoryShard.objects.select_for_update().filter(inventory_id=inventory_id).order_by("shard_no"))
+    if sum(shard.quantity for shard in shards) < quantity:
+        name = (names or {}).get(product_id, product_id)
+        raise InsufficientStock(product_id, f"موجودی کافی برای «{name}» وجود ندارد.")
+    remaining = quantity
+    for shard in shards:
+        taken = min(shard.quantity, remaining)
+        shard.quantity -= taken
+        remaining -= taken
+    InventoryShard.objects.bulk_update(shards, ["quantity"])
+    transaction.on_commit(lambda: run_in_background(rebalance, inventory_id))
+
+
+def restock_wholesale(purchase_id):
+    """
+    Add every item of wholesale purchase ``purchase_id`` to stock with
+    set-based UPDATEs (one for plain rows, one for sharded rows); products
+    without an inventory row get one first.
+    """
+    items = WholesalePurchaseItem.objects.filter(purchase_id=purchase_id)
+    received = (
+        items.filter(product_id=OuterRef("product_id"))
+        .values("product_id")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    product_ids = items.values("product_id")
+    have_rows = set(Inventory.objects.filter(product_id__in=product_ids).values_list("product_id", flat=True))
+    Inventory.objects.bulk_create(
+        [Inventory(product_id=pid, quantity=0) for pid in set(product_ids.values_list("product_id", flat=True)) - have_rows],
+        batch_size=500,
+    )
+    now = timezone.now()
+    Inventory.objects.filter(product_id__in=product_ids, is_sharded=False).update(
+        quantity=F("quantity") + Subquery(received),
+        below_threshold=below_threshold(F("quantity") + Subquery(received)),
+        updated_at=now,
+    )
+
+    # Sharded products take the delivery into their first shard; the next
+    # rebalance spreads it out.
+    received_by_inventory = (
+        items.filter(product__inventory__inventory_id=OuterRef("inventory_id"))
+        .values("product_id")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    if InventoryShard.objects.filter(inventory__product_id__in=product_ids, shard_no=0).update(
+            quantity=F("quantity") + Subquery(received_by_inventory)):
+        refresh_totals(product_ids)
+
+
+def refresh_totals(product_ids=None):
+    """
+    Copy the summed shard quantities into ``Inventory.quantity`` for the
+    sharded products among ``product_ids`` (all of them by default), with one
+    UPDATE. Returns the number of rows refreshed.
+    """
+    total = (
+        InventoryShard.objects.filter(inventory=OuterRef("pk"))
+        .values("inventory")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    rows = Inventory.objects.filter(is_sharded=True)
+    if product_ids is not None:
+        rows = rows.filter(product_id__in=product_ids)
+    return rows.update(
+        quantity=Coalesce(Subquery(total), 0),
+        below_threshold=below_threshold(Coalesce(Subquery(total), 0)),
+        updated_at=timezone.now(),
+    )
+
+
+def _split(total, count):
+    share, extra = divmod(total, count)
+    return [share + (1 if i < extra else 0) for i in range(count)]
+
+
+def shard(inventory, count):
+    """Split the stock of ``inventory`` across ``count`` shards (re-splitting if already sharded)."""
+    if count < 1:
+        raise ValueError("count must be positive")
+    with transaction.atomic():
+        inventory = Inventory.objects.select_for_update().get(pk=inventory.pk)
+        if inventory.is_sharded:
+            total = inventory.shards.aggregate(total=Sum("quantity"))["total"] or 0
+            inventory.shards.all().delete()
+        else:
+            total = inventory.quantity
+        InventoryShard.objects.bulk_create([
+            InventoryShard(inventory=inventory, shard_no=i, quantity=quantity)
+            for i, quantity in enumerate(_split(total, count))
+        ])
+        inventory.quantity = total
+        inventory.is_sharded = True
+        inventory.save()
+    return inventory
+
+
+def unshard(inventory):
+    """Fold the shards of ``inventory`` back into ``Inventory.quantity``."""
+    with transaction.atomic():
+        inventory = Inventory.objects.select_for_update().get(pk=inventory.pk)
+        if not inventory.is_sharded:
+            return inventory
+        inventory.quantity = inventory.shards.aggregate(total=Sum("quantity"))["total"] or 0
+        inventory.is_sharded = False
+        inventory.save()
+        inventory.shards.all().delete()
+    return inventory
+
+
+def rebalance(inventory_id):
+    """Spread the stock of one sharded inventory evenly over its shards again."""
+    with transaction.atomic():
+        shards = list(InventoryShard.objects.select_for_update().filter(inventory_id=inventory_id).order_by("shard_no"))
+        if not shards:
+            return
+        for shard_row, quantity in zip(shards, _split(sum(s.quantity for s in shards), len(shards))):
+            shard_row.quantity = quantity
+        InventoryShard.objects.bulk_update(shards, ["quantity"])
+        total = sum(s.quantity for s in shards)
+        Inventory.objects.filter(inventory_id=inventory_id).update(
+            quantity=total, below_threshold=below_threshold(Value(total)), updated_at=timezone.now())
+
+
+def run_in_background(func, *args):
+    """Run ``func`` on a daemon thread with its own database connection."""
+    def target():
+        try:
+            func(*args)
+        finally:
+            connection.close()
+    threading.Thread(target=target, daemon=True).start()
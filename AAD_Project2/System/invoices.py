@@ -0,0 +1,39 @@
+# System/invoices.py
+"""
+Rendered invoice fragments. A committed purchase only changes when one of its
+items, the purchase itself or its credit is written, and the signal handlers
+in ``System.signals`` drop the cached fragment when that happens.
+"""
+
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import catalogue
+from .cache import get_cache
+
+CACHE_NAME = "invoices"
+
+
+def cache_key(purchase_id):
+    return f"invoice:{purchase_id}"
+
+
+def cached_body(purchase_id):
+    """The cached invoice markup for ``purchase_id``, or ``None``."""
+    body = get_cache(CACHE_NAME).get(cache_key(purchase_id))
+    return mark_safe(body) if body is not None else None
+
+
+def render_body(purchase, request=None):
+    """Render the invoice markup for ``purchase`` and cache it; item products come from the catalogue cache."""
+    catalogue.attach(purchase.items.all())
+    body = render_to_string("purchase_invoice_body.html", {"purchase": purchase}, request)
+    get_cache(CACHE_NAME).set(cache_key(purchase.pk), str(body))
+    return body
+
+
+def invalidate(purchase_id):
+    """Drop the cached invoice once the current transaction commits."""
+    key = cache_key(purchase_id)
+    transaction.on_commit(lambda: get_cache(CACHE_NAME).delete(key))
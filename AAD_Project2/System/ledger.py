@@ -0,0 +1,141 @@
+# System/ledger.py
+"""
+Credit ledger of special customers.
+
+Every charge (a purchase on credit) and every payment, whole or partial, is
+appended to ``CreditEntry``; entries are never changed or deleted. In the same
+transaction ``SpecialCustomer.balance`` is moved by the entry's amount with a
+single ``UPDATE ... SET balance = balance + x``, so reading what a customer
+owes is one row, not a sum over their history. ``reconcile`` recomputes the
+balances from the ledger to prove they still agree.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Sum, When
+
+from .models import Credit, CreditEntry, SpecialCustomer
+
+
+class LedgerError(ValueError):
+    def __init__(self, message="مبلغ باید بیشتر از صفر باشد."):
+        super().__init__(message)
+
+
+def _amount(amount):
+    amount = Decimal(amount)
+    if amount <= 0:
+        raise LedgerError()
+    return amount
+
+
+def _post(customer_id, kind, amount, credit=None, note=""):
+    entry = CreditEntry.objects.create(customer_id=customer_id, kind=kind, amount=amount, credit=credit, note=note)
+    delta = amount if kind == CreditEntry.CHARGE else -amount
+    SpecialCustomer.objects.filter(pk=customer_id).update(balance=F("balance") + delta)
+    return entry
+
+
+def charge(customer_id, purchase, amount=None, note=""):
+    """
+    Put ``purchase`` on ``customer_id``'s account (by default its whole
+    ``total_amount``): creates its ``Credit`` and a charge entry. Returns the
+    ``Credit``.
+    """
+    amount = _amount(purchase.total_amount if amount is None else amount)
+    with transaction.atomic():
+        credit = Credit.objects.create(customer_id=customer_id, total_debt=amount, purchase=purchase)
+        _post(customer_id, CreditEntry.CHARGE, amount, credit=credit, note=note)
+    return credit
+
+
+def pay(customer_id, amount, note=""):
+    """
+    Record a payment of ``amount`` (it may be any part of what is owed) and
+    return the entry. Credits the payment covers in full, oldest first, are
+    marked ``is_paid``; a partly paid credit stays open.
+    """
+    amount = _amount(amount)
+    with transaction.atomic():
+        # Lock the customer row so concurrent payments settle credits in turn.
+        balance = SpecialCustomer.objects.select_for_update().values_list("balance", flat=True).get(pk=customer_id)
+        entry = _post(customer_id, CreditEntry.PAYMENT, amount, note=note)
+        _settle(customer_id, balance - amount)
+    return entry
+
+
+def _settle(customer_id, balance):
+    # What is still owed is the newest credits; everything older than the
+    # credit that reaches ``balance`` has been paid off. Age comes from the
+    # purchase date: credits from before 0004 keep random uuid4 keys.
+    owed, settled = Decimal(0), []
+    open_credits = Credit.objects.filter(customer_id=customer_id, is_paid__in=[False]).order_by(
+        "-purchase__purchase_date", "-credit_id")
+    for credit_id, total_debt in open_credits.values_list("credit_id", "total_debt"):
+        if owed >= balance:
+            settled.append(credit_id)
+        else:
+            owed += total_debt
+    if settled:
+        Credit.objects.filter(pk__in=settled).update(is_paid=True)
+
+
+def top_debtors(limit=10):
+    """The ``limit`` customers who owe the most, as dicts, from the balance index in one query."""
+    return list(
+        SpecialCustomer.objects.filter(balance__gt=0)
+        .order_by("-balance", "person_id")
+        .values("person_id", "first_name", "last_name", "phone_number", "balance")[:limit]
+    )
+
+
+def ledger_balances(customer_ids):
+    """``{customer_id: charges - payments}`` from the ledger for ``customer_ids``."""
+    signed = Case(
+        When(kind=CreditEntry.PAYMENT, then=-F("amount")),
+        default=F("amount"),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+    rows = (
+        CreditEntry.objects.filter(customer_id__in=customer_ids)
+        .values("customer_id").annotate(total=Sum(signed)).order_by()
+    )
+    return {row["customer_id"]: row["total"] for row in rows}
+
+
+def reconcile(batch_size=500, fix=False):
+    """
+    Compare every customer's ``balance`` with their ledger, ``batch_size``
+    customers per round-trip (keyset by ``person_id``), and yield
+    ``(customer_id, balance, ledger_balance)`` for each that disagrees. With
+    ``fix`` the balance is reset to the ledger's figure.
+    """
+    customers = SpecialCustomer.objects.order_by("person_id").values_list("person_id", "balance")
+    last = None
+    while True:
+        batch = list((customers.filter(person_id__gt=last) if last else customers)[:batch_size])
+        if not batch:
+            return
+        last = batch[-1][0]
+        expected = ledger_balances([pk for pk, _ in batch])
+        for customer_id, balance in batch:
+            ledger_balance = expected.get(customer_id) or Decimal(0)
+            if balance != ledger_balance:
+                if fix:
+                    balance, ledger_balance = _fix(customer_id)
+                    if balance == ledger_balance:
+                        # A charge or payment was in flight when the batch was read.
+                        continue
+                yield customer_id, balance, ledger_balance
+
+
+def _fix(customer_id):
+    # Re-read both figures under the customer's row lock, which every posting
+    # takes, so an entry committed meanwhile is counted exactly once.
+    with transaction.atomic():
+        balance = SpecialCustomer.objects.select_for_update().values_list("balance", flat=True).get(pk=customer_id)
+        ledger_balance = ledger_balances([customer_id]).get(customer_id) or Decimal(0)
+        if balance != ledger_balance:
+            SpecialCustomer.objects.filter(pk=customer_id).update(balance=ledger_balance)
+    return balance, ledger_balance
@@ -0,0 +1,62 @@
+# System/management/commands/bench_pk.py
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from System.ids import uuid7
+from System.models import CustomerPurchase, Product, PurchaseItem
+
+GENERATORS = {"uuid4": uuid.uuid4, "uuid7": uuid7}
+
+
+class Command(BaseCommand):
+    help = ("Insert PurchaseItem rows with uuid4 and with time-ordered uuid7 "
+            "keys and compare throughput. Runs against the configured database "
+            "and removes its own rows afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20000, help="Rows to insert per key type.")
+        parser.add_argument("--batch-size", type=int, default=1,
+                            help="Rows per INSERT; 1 mimics the old one-create-per-line checkout.")
+
+    def handle(self, *args, **options):
+        rows, batch_size = options["rows"], options["batch_size"]
+        if rows < 1 or batch_size < 1:
+            raise CommandError("--rows and --batch-size must be positive.")
+        product = Product.objects.create(name="bench-pk", price=1, product_type="OTHER")
+        purchase = CustomerPurchase.objects.create(total_amount=0)
+        try:
+            for name, generator in GENERATORS.items():
+                elapsed = self._insert(generator, purchase, product, rows, batch_size)
+                line = f"{name}: {rows} rows in {elapsed:.2f}s ({rows / elapsed:.0f} rows/s)"
+                fragmentation = self._fragmentation()
+                if fragmentation is not None:
+                    line += f", clustered index fragmentation {fragmentation:.1f}%"
+                self.stdout.write(line)
+                PurchaseItem.objects.filter(purchase=purchase).delete()
+        finally:
+            purchase.delete()
+            product.delete()
+
+    def _insert(self, generator, purchase, product, rows, batch_size):
+        started = time.perf_counter()
+        with transaction.atomic():
+            for offset in range(0, rows, batch_size):
+                PurchaseItem.objects.bulk_create([
+                    PurchaseItem(pi_id=generator(), purchase=purchase, product=product, quantity=1, price=1)
+                    for _ in range(min(batch_size, rows - offset))
+                ])
+        return time.perf_counter() - started
+
+    def _fragmentation(self):
+        if connection.vendor != "microsoft":
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT MAX(avg_fragmentation_in_percent) FROM sys.dm_db_index_physical_stats"
+                "(DB_ID(), OBJECT_ID(%s), 1, NULL, 'LIMITED')",
+                [PurchaseItem._meta.db_table],
+            )
+            return cursor.fetchone()[0]
@@ -0,0 +1,67 @@
+# System/management/commands/bench_stock.py
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+
+from System import inventory
+from System.checkout import CheckoutError, place_order
+from System.models import CustomerPurchase, Inventory, Product
+
+
+class Command(BaseCommand):
+    help = ("Compare the pessimistic and optimistic inventory modes with N "
+            "concurrent buyers of the same product. Runs against the configured "
+            "database and removes its own rows afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--buyers", type=int, default=8, help="Concurrent buyer threads.")
+        parser.add_argument("--sales", type=int, default=50, help="Sales per buyer.")
+        parser.add_argument("--mode", choices=inventory.MODES + ("both",), default="both")
+
+    def handle(self, *args, **options):
+        if options["buyers"] < 1 or options["sales"] < 1:
+            raise CommandError("--buyers and --sales must be positive.")
+        modes = inventory.MODES if options["mode"] == "both" else (options["mode"],)
+        for mode in modes:
+            self.stdout.write(self._run(mode, options["buyers"], options["sales"]))
+
+    def _run(self, mode, buyers, sales):
+        product = Product.objects.create(name="bench-stock", price=1, product_type="OTHER")
+        Inventory.objects.create(product=product, quantity=buyers * sales)
+        failures = []
+        aborted = []
+        retries_before = inventory.retries.value
+        lock_wait_before = inventory.lock_wait_seconds.value
+
+        def buyer():
+            try:
+                for _ in range(sales):
+                    try:
+                        place_order([(product.pk, 1)], mode=mode)
+                    except CheckoutError as e:
+                        failures.append(str(e))
+                    except DatabaseError as e:
+                        # Retries ran out (e.g. SQLite refusing a lock upgrade).
+                        aborted.append(str(e))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buyer) for _ in range(buyers)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        left = Inventory.objects.get(product=product).quantity
+        CustomerPurchase.objects.filter(items__product=product).delete()
+        product.delete()
+        sold = buyers * sales - left
+        return (f"{mode:<12} buyers={buyers} sales={sold}/{buyers * sales} "
+                f"time={elapsed:.2f}s throughput={sold / elapsed:.1f}/s "
+                f"retries={inventory.retries.value - retries_before} "
+                f"lock_wait={inventory.lock_wait_seconds.value - lock_wait_before:.3f}s "
+                f"failures={len(failures)} aborted={len(aborted)}")
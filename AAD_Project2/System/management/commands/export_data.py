@@ -0,0 +1,30 @@
+# System/management/commands/export_data.py
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from System import exports
+
+
+class Command(BaseCommand):
+    help = "Stream sales, wholesale purchases or inventory as CSV or JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(exports.EXPORTS))
+        parser.add_argument("--format", choices=exports.FORMATS, default="csv")
+        parser.add_argument("--from", dest="from", help="First day (YYYY-MM-DD), inclusive.")
+        parser.add_argument("--to", dest="to", help="Last day (YYYY-MM-DD), inclusive.")
+        parser.add_argument("--product-type", dest="product_type")
+        parser.add_argument("--output", "-o", help="File to write; standard output by default.")
+
+    def handle(self, *args, **options):
+        try:
+            filters = exports.parse_filters(options)
+        except ValueError as e:
+            raise CommandError(str(e))
+        chunks = exports.stream(options["kind"], options["format"], **filters)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as f:
+                f.writelines(chunks)
+        else:
+            sys.stdout.writelines(chunks)
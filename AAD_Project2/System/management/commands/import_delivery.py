@@ -0,0 +1,44 @@
+# System/management/commands/import_delivery.py
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from System.imports import ImportFailed, import_delivery, read_rows
+from System.models import Wholesaler
+
+
+class Command(BaseCommand):
+    help = ("Import a wholesaler's delivery (CSV or XLSX with product_id or name, "
+            "quantity, unit_price and optional product_type, sale_price columns).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--wholesaler", required=True, help="Wholesaler id or exact name.")
+
+    def handle(self, *args, **options):
+        wholesaler = self._wholesaler(options["wholesaler"])
+        try:
+            with open(options["path"], "rb") as f:
+                purchase, summary = import_delivery(wholesaler, read_rows(f, options["path"]))
+        except OSError as e:
+            raise CommandError(str(e))
+        except ImportFailed as e:
+            raise CommandError("\n".join(e.errors))
+        self.stdout.write(
+            f"Imported {summary['lines']} lines into {purchase.wp_id} "
+            f"({summary['created']} new products, {summary['updated']} prices updated), "
+            f"total {purchase.total_amount}."
+        )
+
+    def _wholesaler(self, value):
+        lookup = {"name": value}
+        try:
+            lookup = {"wholesaler_id": uuid.UUID(value)}
+        except ValueError:
+            pass
+        try:
+            return Wholesaler.objects.get(**lookup)
+        except Wholesaler.DoesNotExist:
+            raise CommandError(f"No wholesaler {value!r}.")
+        except Wholesaler.MultipleObjectsReturned:
+            raise CommandError(f"Several wholesalers are called {value!r}; use the id.")
@@ -0,0 +1,30 @@
+# System/management/commands/purge_idempotency_keys.py
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from System.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete checkout idempotency keys older than IDEMPOTENCY_KEY_TTL_HOURS, in batches (run it from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=int, default=getattr(settings, "IDEMPOTENCY_KEY_TTL_HOURS", 48))
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options["hours"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--hours and --batch-size must be positive.")
+        cutoff = timezone.now() - datetime.timedelta(hours=options["hours"])
+        expired = IdempotencyKey.objects.filter(created_at__lt=cutoff)
+        deleted = 0
+        while True:
+            # Short transactions: the tills keep inserting keys while this runs.
+            batch = list(expired.order_by("created_at").values_list("pk", flat=True)[:options["batch_size"]])
+            if not batch:
+                break
+            deleted += IdempotencyKey.objects.filter(pk__in=batch).delete()[0]
+        self.stdout.write(f"Deleted {deleted} keys older than {options['hours']} hours.")
@@ -0,0 +1,40 @@
+# System/management/commands/rebuild_sales_summary.py
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from System import sales_summary
+from System.models import CustomerPurchase
+
+
+class Command(BaseCommand):
+    help = "Recompute DailySalesSummary for a date range (all history by default), in batches of days."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="from", help="First day (YYYY-MM-DD).")
+        parser.add_argument("--to", dest="to", help="Last day (YYYY-MM-DD); today by default.")
+        parser.add_argument("--batch-days", type=int, default=7)
+
+    def handle(self, *args, **options):
+        date_to = self._date(options["to"]) if options["to"] else timezone.localdate()
+        if options["from"]:
+            date_from = self._date(options["from"])
+        else:
+            first = CustomerPurchase.objects.order_by("purchase_date").values_list("purchase_date", flat=True).first()
+            if first is None:
+                self.stdout.write("No purchases yet.")
+                return
+            date_from = timezone.localdate(first)
+        if options["batch_days"] < 1 or date_from > date_to:
+            raise CommandError("Need --batch-days >= 1 and --from <= --to.")
+        total = 0
+        for start, end, rows in sales_summary.rebuild(date_from, date_to, options["batch_days"]):
+            total += rows
+            self.stdout.write(f"{start}..{end}: {rows} rows")
+        self.stdout.write(f"Done: {total} summary rows.")
+
+    def _date(self, value):
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"{value!r} is not a YYYY-MM-DD date.")
+        return day
@@ -0,0 +1,25 @@
+# System/management/commands/reconcile_credit_balances.py
+from django.core.management.base import BaseCommand, CommandError
+
+from System import ledger
+
+
+class Command(BaseCommand):
+    help = "Check every special customer's balance against the credit ledger, in batches; --fix resets the ones that differ."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--fix", action="store_true", help="Set mismatched balances to the ledger's figure.")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        mismatches = 0
+        for customer_id, balance, ledger_balance in ledger.reconcile(options["batch_size"], fix=options["fix"]):
+            mismatches += 1
+            self.stdout.write(f"{customer_id}: balance {balance}, ledger {ledger_balance}")
+        action = "fixed" if options["fix"] else "found"
+        self.stdout.write(f"{mismatches} mismatched balances {action}.")
+        if mismatches and not options["fix"]:
+            # Non-zero exit so cron / monitoring notices.
+            raise CommandError("Balances do not match the ledger; rerun with --fix after checking.")
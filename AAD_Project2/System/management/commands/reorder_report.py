@@ -0,0 +1,35 @@
+# System/management/commands/reorder_report.py
+import csv
+
+from django.core.management.base import BaseCommand
+
+from System import reorder
+
+
+class Command(BaseCommand):
+    help = "List every product at or below its reorder threshold, grouped by its last wholesaler (one query)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=("text", "csv"), default="text")
+
+    def handle(self, *args, **options):
+        # A full comparison rather than the below_threshold flag, so the report
+        # also catches rows changed behind the application's back.
+        groups = reorder.by_wholesaler(reorder.suggestions(full_scan=True))
+        if options["format"] == "csv":
+            writer = csv.writer(self.stdout)
+            writer.writerow(["wholesaler", "product_id", "product_name", "quantity", "reorder_threshold",
+                             "suggested", "last_price"])
+            for wholesaler, rows in groups:
+                for row in rows:
+                    writer.writerow([wholesaler, row["product_id"], row["product__name"], row["quantity"],
+                                     row["reorder_threshold"], row["suggested"], row["last_price"]])
+            return
+        if not groups:
+            self.stdout.write("No product is below its reorder threshold.")
+        for wholesaler, rows in groups:
+            self.stdout.write(wholesaler)
+            for row in rows:
+                self.stdout.write(
+                    f"  {row['product__name']}: {row['quantity']} (threshold {row['reorder_threshold']}), "
+                    f"order {row['suggested']}")
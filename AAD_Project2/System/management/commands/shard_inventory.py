@@ -0,0 +1,45 @@
+# System/management/commands/shard_inventory.py
+from django.core.management.base import BaseCommand, CommandError
+
+from System import inventory
+from System.models import Inventory
+
+
+class Command(BaseCommand):
+    help = ("Split the stock of hot products across several shard rows, fold "
+            "them back, even out the shards of every sharded product, or copy "
+            "the shard totals into the products' inventory rows (run --refresh "
+            "on a schedule).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("product_ids", nargs="*", help="Products to shard or unshard.")
+        parser.add_argument("--shards", type=int, default=4, help="Number of shards per product.")
+        parser.add_argument("--unshard", action="store_true", help="Fold the shards back into one row.")
+        parser.add_argument("--rebalance", action="store_true", help="Rebalance every sharded product.")
+        parser.add_argument("--refresh", action="store_true",
+                            help="Refresh the inventory quantity of every sharded product from its shards.")
+
+    def handle(self, *args, **options):
+        if options["refresh"]:
+            self.stdout.write(f"Refreshed {inventory.refresh_totals()} sharded products.")
+            return
+
+        if options["rebalance"]:
+            ids = list(Inventory.objects.filter(is_sharded=True).values_list("inventory_id", flat=True))
+            for inventory_id in ids:
+                inventory.rebalance(inventory_id)
+            self.stdout.write(f"Rebalanced {len(ids)} sharded products.")
+            return
+
+        if not options["product_ids"]:
+            raise CommandError("Give at least one product id, or --rebalance or --refresh.")
+        rows = list(Inventory.objects.filter(product_id__in=options["product_ids"]).select_related("product"))
+        if len(rows) != len(set(options["product_ids"])):
+            raise CommandError("Some products have no inventory row.")
+        for row in rows:
+            if options["unshard"]:
+                row = inventory.unshard(row)
+                self.stdout.write(f"{row.product.name}: unsharded ({row.quantity})")
+            else:
+                row = inventory.shard(row, options["shards"])
+                self.stdout.write(f"{row.product.name}: {options['shards']} shards ({row.quantity})")
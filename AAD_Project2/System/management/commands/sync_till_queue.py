@@ -0,0 +1,26 @@
+# System/management/commands/sync_till_queue.py
+from django.core.management.base import BaseCommand
+
+from System import till_queue
+
+
+class Command(BaseCommand):
+    help = "Replay sales queued on this till while the database was unreachable, oldest first, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--conflicts", action="store_true", help="List the queued sales that could not be sold.")
+
+    def handle(self, *args, **options):
+        if options["conflicts"]:
+            for sale in till_queue.conflicts():
+                self.stdout.write(f"#{sale['seq']} {sale['sold_at']} {sale['lines']}: {sale['error']}")
+            return
+        synced = conflicts = 0
+        while True:
+            result = till_queue.replay(options["batch_size"])
+            synced += result["synced"]
+            conflicts += result["conflicts"]
+            if not result["left"] or not (result["synced"] or result["conflicts"]):
+                break
+        self.stdout.write(f"Synced {synced}, conflicts {conflicts}, still queued {result['left']}.")
@@ -0,0 +1,19 @@
+# System/management/commands/warm_catalogue.py
+from django.core.management.base import BaseCommand
+
+from System import catalogue
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the product catalogue into the 'catalogue' cache. This fills a shared backend "
+        "(System.cache.FileBackend) for every worker on the node; with the process-local backend "
+        "set CATALOGUE_WARM_ON_STARTUP so each worker warms itself."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        loaded = catalogue.warm(batch_size=options["batch_size"])
+        self.stdout.write(f"Loaded {loaded} products.")
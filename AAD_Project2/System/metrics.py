@@ -0,0 +1,128 @@
+# System/metrics.py
+"""
+In-process counters and histograms for monitoring. Values live for the
+lifetime of the worker process; ``snapshot()`` reads the counters and
+``exposition()`` renders everything in the Prometheus text format.
+"""
+
+import bisect
+import threading
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class Counter:
+    """A monotonically increasing, thread-safe number."""
+
+    def __init__(self, name, documentation=""):
+        self.name = name
+        self.documentation = documentation
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def reset(self):
+        with self._lock:
+            self._value = 0
+
+
+class Histogram:
+    """
+    Observations counted into fixed ``buckets`` (upper bounds), kept apart
+    per set of label values, e.g. ``observe(0.2, view="system:login")``.
+    """
+
+    def __init__(self, name, documentation="", buckets=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # One slot per bucket plus +Inf, then the sum.
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0]
+            series[index] += 1
+            series[-1] += value
+
+    def series(self):
+        """``{labels: (cumulative bucket counts incl. +Inf, sum)}``."""
+        with self._lock:
+            items = [(key, list(values)) for key, values in self._series.items()]
+        result = {}
+        for key, values in items:
+            cumulative, total = [], 0
+            for count in values[:-1]:
+                total += count
+                cumulative.append(total)
+            result[key] = (cumulative, values[-1])
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+
+
+def counter(name, documentation=""):
+    """Return the counter called ``name``, creating it on first use."""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Counter(name, documentation)
+        return _registry[name]
+
+
+def histogram(name, documentation="", buckets=()):
+    """Return the histogram called ``name``, creating it on first use."""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Histogram(name, documentation, buckets)
+        return _registry[name]
+
+
+def snapshot():
+    """Current value of every registered counter, keyed by name."""
+    with _registry_lock:
+        metrics = [m for m in _registry.values() if isinstance(m, Counter)]
+    return {m.name: m.value for m in metrics}
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def exposition():
+    """Every registered metric in the Prometheus text exposition format (0.0.4)."""
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda m: m.name)
+    lines = []
+    for metric in metrics:
+        if metric.documentation:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+        if isinstance(metric, Histogram):
+            lines.append(f"# TYPE {metric.name} histogram")
+            for key, (cumulative, total) in sorted(metric.series().items()):
+                bounds = [repr(float(bound)) for bound in metric.buckets] + ["+Inf"]
+                for bound, count in zip(bounds, cumulative):
+                    lines.append(f"{metric.name}_bucket{_labels(key + (('le', bound),))} {count}")
+                lines.append(f"{metric.name}_sum{_labels(key)} {total}")
+                lines.append(f"{metric.name}_count{_labels(key)} {cumulative[-1]}")
+        else:
+            lines.append(f"# TYPE {metric.name} counter")
+            lines.append(f"{metric.name} {metric.value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:32
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('System', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='is_sharded',
+            field=models.BooleanField(default=False, verbose_name='موجودی تقسیم\u200cشده'),
+        ),
+        migrations.CreateModel(
+            name='InventoryShard',
+            fields=[
+                ('shard_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('shard_no', models.PositiveSmallIntegerField(verbose_name='شماره بخش')),
+                ('quantity', models.PositiveIntegerField(verbose_name='تعداد موجودی')),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='System.inventory', verbose_name='موجودی')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('inventory', 'shard_no'), name='inventoryshard_inventory_shard_no_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:33
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_inventories(apps, schema_editor):
+    # The unique constraint below needs one inventory row per product; fold
+    # any duplicates into the oldest-updated row first.
+    Inventory = apps.get_model('System', 'Inventory')
+    duplicated = (
+        Inventory.objects.values('product_id')
+        .annotate(rows=Count('inventory_id'), total=Sum('quantity'))
+        .filter(rows__gt=1)
+    )
+    for dup in duplicated:
+        rows = list(Inventory.objects.filter(product_id=dup['product_id']).order_by('updated_at', 'inventory_id'))
+        keep = rows[0]
+        Inventory.objects.filter(pk=keep.pk).update(quantity=dup['total'])
+        Inventory.objects.filter(pk__in=[row.pk for row in rows[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('System', '0002_inventory_shards'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['employee', 'date'], name='attendance_employee_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='credit',
+            index=models.Index(fields=['customer', 'is_paid'], include=('total_debt',), name='credit_customer_paid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customerpurchase',
+            index=models.Index(fields=['purchase_date'], name='customerpurchase_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='debt',
+            index=models.Index(fields=['is_paid', 'due_date'], include=('creditor', 'amount'), name='debt_paid_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseitem',
+            index=models.Index(fields=['purchase', 'product'], include=('quantity', 'price'), name='purchaseitem_purchase_prod_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_inventories, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='inventory',
+            constraint=models.UniqueConstraint(fields=('product',), name='inventory_product_uniq'),
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:34
+
+import System.ids
+from django.db import migrations, models
+
+
+def rebuild_insert_heavy_indexes(apps, schema_editor):
+    # Existing rows keep their uuid4 keys (they are still valid and every
+    # foreign key pointing at them stays untouched); new rows get ordered keys
+    # and append at the end of the index. On SQL Server, rebuild the indexes
+    # the random keys have fragmented so the old pages start out compact too.
+    if schema_editor.connection.vendor != 'microsoft':
+        return
+    for model_name in ('PurchaseItem', 'Attendance', 'CustomerPurchase'):
+        table = apps.get_model('System', model_name)._meta.db_table
+        schema_editor.execute('ALTER INDEX ALL ON %s REBUILD' % schema_editor.quote_name(table))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('System', '0003_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attendance',
+            name='attendance_id',
+            field=models.UUIDField(default=System.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='credit',
+            name='credit_id',
+            field=models.UUIDField(default=System.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='creditor',
+            name='creditor_id',
+            field=models.UUIDField(default=System.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='customerpurchase',
+            name='cp_id',
+            field=models.UUIDField(default=System.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='user_id',
+            field=models.UUIDField(default=System.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='debt',
+            name='debt_id',
+            field=models.UUIDField(default=System.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='inventory',
+            name='inventory_id',
+            field=models.UUIDField(default=System.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='inventoryshard',
+            name='shard_id',
+            field=models.UUIDField(default=System.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='person',
+            name='person_id',
+            field=models.UUIDField(default=System.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='product_id',
+            field=models.UUIDField(default=System.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='purchaseitem',
+            name='pi_id',
+            field=models.UUIDField(default=System.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='wholesalepurchase',
+            name='wp_id',
+            field=models.UUIDField(default=System.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='wholesalepurchaseitem',
+            name='wpi_id',
+            field=models.UUIDField(default=System.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='wholesaler',
+            name='wholesaler_id',
+            field=models.UUIDField(default=System.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.RunPython(rebuild_insert_heavy_indexes, migrations.RunPython.noop, elidable=True),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('System', '0004_ordered_primary_keys'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(fields=['updated_at', 'inventory_id'], name='inventory_updated_idx'),
+        ),
+    ]
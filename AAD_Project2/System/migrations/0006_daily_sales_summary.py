@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:39
+
+import System.ids
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('System', '0005_inventory_list_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesSummary',
+            fields=[
+                ('summary_id', models.UUIDField(default=System.ids.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField(verbose_name='تاریخ')),
+                ('product_type', models.CharField(choices=[('WRITING', 'ابزار نوشتن'), ('PAPER', 'محصولات کاغذی'), ('ACCESSORY', 'لوازم جانبی'), ('STORAGE', 'وسایل نگهداری'), ('OTHER', 'سایر')], max_length=20, verbose_name='نوع کالا')),
+                ('quantity', models.PositiveIntegerField(verbose_name='تعداد فروش')),
+                ('revenue', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='مبلغ فروش')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='System.product', verbose_name='کالا')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'product_type'], include=('quantity', 'revenue'), name='dailysales_date_type_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'product'), name='dailysales_date_product_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('System', '0006_daily_sales_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='below_threshold',
+            field=models.BooleanField(default=False, editable=False, verbose_name='زیر حد سفارش'),
+        ),
+        migrations.AddField(
+            model_name='inventory',
+            name='reorder_quantity',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='مقدار سفارش مجدد'),
+        ),
+        migrations.AddField(
+            model_name='inventory',
+            name='reorder_threshold',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='حد سفارش مجدد'),
+        ),
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(fields=['below_threshold', 'quantity'], name='inventory_below_threshold_idx'),
+        ),
+    ]
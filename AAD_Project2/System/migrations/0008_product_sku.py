@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('System', '0007_reorder_thresholds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, max_length=32, null=True, verbose_name='کد کالا / بارکد'),
+        ),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(condition=models.Q(('sku__isnull', False)), fields=('sku',), name='product_sku_uniq'),
+        ),
+    ]
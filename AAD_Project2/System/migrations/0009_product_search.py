@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:48
+
+from django.db import migrations, models
+
+from System.text import normalize_search
+
+
+def fill_search_names(apps, schema_editor):
+    Product = apps.get_model('System', 'Product')
+    batch = []
+    for product in Product.objects.only('product_id', 'name').iterator(chunk_size=2000):
+        product.search_name = normalize_search(product.name)
+        batch.append(product)
+        if len(batch) == 2000:
+            Product.objects.bulk_update(batch, ['search_name'], batch_size=500)
+            batch = []
+    Product.objects.bulk_update(batch, ['search_name'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('System', '0008_product_sku'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_name',
+            field=models.CharField(default='', editable=False, max_length=100, verbose_name='نام جستجو'),
+        ),
+        migrations.RunPython(fill_search_names, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['search_name', 'product_id'], name='product_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['product_type', 'search_name', 'product_id'], name='product_type_search_idx'),
+        ),
+    ]
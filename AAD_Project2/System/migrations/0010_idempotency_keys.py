@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:51
+
+import System.ids
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('System', '0009_product_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('key_id', models.UUIDField(default=System.ids.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('key', models.CharField(max_length=64, verbose_name='کلید درخواست')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='زمان ثبت')),
+                ('purchase', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_keys', to='System.customerpurchase', verbose_name='خرید')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='idempotencykey_created_idx')],
+                'constraints': [models.UniqueConstraint(fields=('key',), name='idempotencykey_key_uniq')],
+            },
+        ),
+    ]
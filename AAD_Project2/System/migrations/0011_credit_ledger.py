@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:56
+
+import System.ids
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def open_ledger(apps, schema_editor):
+    # One charge per existing credit, and a payment for each one already paid,
+    # so every balance starts out equal to its ledger.
+    Credit = apps.get_model('System', 'Credit')
+    CreditEntry = apps.get_model('System', 'CreditEntry')
+    SpecialCustomer = apps.get_model('System', 'SpecialCustomer')
+    batch = []
+    for credit in Credit.objects.order_by('credit_id').iterator(chunk_size=2000):
+        batch.append(CreditEntry(customer_id=credit.customer_id, kind='CHARGE', amount=credit.total_debt, credit=credit))
+        if credit.is_paid:
+            batch.append(CreditEntry(customer_id=credit.customer_id, kind='PAYMENT', amount=credit.total_debt, credit=credit))
+        if len(batch) >= 2000:
+            CreditEntry.objects.bulk_create(batch, batch_size=500)
+            batch = []
+    CreditEntry.objects.bulk_create(batch, batch_size=500)
+    owed = Credit.objects.filter(is_paid=False).values('customer_id').annotate(total=Sum('total_debt')).order_by()
+    for row in owed.iterator(chunk_size=2000):
+        SpecialCustomer.objects.filter(pk=row['customer_id']).update(balance=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('System', '0010_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CreditEntry',
+            fields=[
+                ('entry_id', models.UUIDField(default=System.ids.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('CHARGE', 'نسیه'), ('PAYMENT', 'پرداخت')], max_length=10, verbose_name='نوع')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='مبلغ')),
+                ('note', models.CharField(blank=True, default='', max_length=255, verbose_name='توضیحات')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='زمان ثبت')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='specialcustomer',
+            name='balance',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14, verbose_name='مانده بدهی'),
+        ),
+        migrations.AddIndex(
+            model_name='specialcustomer',
+            index=models.Index(fields=['balance'], name='specialcustomer_balance_idx'),
+        ),
+        migrations.AddField(
+            model_name='creditentry',
+            name='credit',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='entries', to='System.credit', verbose_name='نسیه مرتبط'),
+        ),
+        migrations.AddField(
+            model_name='creditentry',
+            name='customer',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='ledger', to='System.specialcustomer', verbose_name='مشتری ویژه'),
+        ),
+        migrations.AddIndex(
+            model_name='creditentry',
+            index=models.Index(fields=['customer', 'created_at'], include=('kind', 'amount'), name='creditentry_customer_idx'),
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
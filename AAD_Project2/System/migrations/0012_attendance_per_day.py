@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:59
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def merge_duplicate_days(apps, schema_editor):
+    # Fold extra rows for the same employee and day into the one clocked
+    # last (latest check-out, then check-in; the key only breaks ties, since
+    # rows from before 0004 have random uuid4 keys), which keeps its status:
+    # earliest check-in, latest check-out, approved if any row was.
+    Attendance = apps.get_model('System', 'Attendance')
+    duplicates = (
+        Attendance.objects.values('employee_id', 'date').annotate(rows=Count('pk')).filter(rows__gt=1).order_by()
+    )
+    for day in duplicates.iterator():
+        rows = list(
+            Attendance.objects.filter(employee_id=day['employee_id'], date=day['date']).order_by(
+                F('check_out').desc(nulls_last=True), F('check_in').desc(nulls_last=True), '-attendance_id')
+        )
+        keep = rows[0]
+        check_ins = [row.check_in for row in rows if row.check_in]
+        check_outs = [row.check_out for row in rows if row.check_out]
+        keep.check_in = min(check_ins) if check_ins else None
+        keep.check_out = max(check_outs) if check_outs else None
+        keep.approved_by_manager = any(row.approved_by_manager for row in rows)
+        keep.notes = '\n'.join(row.notes for row in rows if row.notes) or None
+        keep.save()
+        Attendance.objects.filter(pk__in=[row.pk for row in rows[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('System', '0011_credit_ledger'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='attendance',
+            name='attendance_employee_date_idx',
+        ),
+        migrations.AlterField(
+            model_name='attendance',
+            name='date',
+            field=models.DateField(default=django.utils.timezone.localdate, verbose_name='تاریخ'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date', 'employee'], include=('status', 'check_in', 'check_out', 'approved_by_manager'), name='attendance_date_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_days, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='attendance',
+            constraint=models.UniqueConstraint(fields=('employee', 'date'), name='attendance_employee_date_uniq'),
+        ),
+    ]
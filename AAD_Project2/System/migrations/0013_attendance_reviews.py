@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:02
+
+import System.ids
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Now
+
+
+def mark_approved_reviewed(apps, schema_editor):
+    # Rows approved before the queue existed are not waiting for review.
+    Attendance = apps.get_model('System', 'Attendance')
+    Attendance.objects.filter(approved_by_manager=True).update(reviewed_at=Now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('System', '0012_attendance_per_day'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceReview',
+            fields=[
+                ('review_id', models.UUIDField(default=System.ids.uuid7, editable=False, primary_key=True, serialize=False)),
+                ('approved', models.BooleanField(verbose_name='تأیید شد؟')),
+                ('reviewed_at', models.DateTimeField(verbose_name='زمان بررسی')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='reviewed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='زمان بررسی'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['reviewed_at', 'date', 'attendance_id'], name='attendance_pending_idx'),
+        ),
+        migrations.AddField(
+            model_name='attendancereview',
+            name='attendance',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='reviews', to='System.attendance', verbose_name='حضور'),
+        ),
+        migrations.AddField(
+            model_name='attendancereview',
+            name='reviewer',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attendance_reviews', to=settings.AUTH_USER_MODEL, verbose_name='بررسی\u200cکننده'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancereview',
+            index=models.Index(fields=['attendance', 'reviewed_at'], name='attendancereview_att_idx'),
+        ),
+        migrations.RunPython(mark_approved_reviewed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('System', '0013_attendance_reviews'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attendancereview',
+            name='attendance',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='System.attendance', verbose_name='حضور'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def snapshot_reviewed_rows(apps, schema_editor):
+    # Reviews written before the snapshot existed take the attendance row as it is now.
+    AttendanceReview = apps.get_model('System', 'AttendanceReview')
+    reviews = list(AttendanceReview.objects.select_related('attendance__employee'))
+    for review in reviews:
+        row = review.attendance
+        review.employee_id = row.employee_id
+        review.employee_name = f'{row.employee.first_name} {row.employee.last_name}'
+        review.date = row.date
+        review.check_in, review.check_out, review.status = row.check_in, row.check_out, row.status
+    AttendanceReview.objects.bulk_update(
+        reviews, ['employee', 'employee_name', 'date', 'check_in', 'check_out', 'status'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('System', '0014_attendance_review_cascade'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attendancereview',
+            name='attendance',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reviews', to='System.attendance', verbose_name='حضور'),
+        ),
+        migrations.AddField(
+            model_name='attendancereview',
+            name='employee',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attendance_reviews', to='System.employee', verbose_name='کارمند'),
+        ),
+        migrations.AddField(
+            model_name='attendancereview',
+            name='employee_name',
+            field=models.CharField(default='', max_length=101, verbose_name='نام کارمند'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='attendancereview',
+            name='date',
+            field=models.DateField(null=True, verbose_name='تاریخ'),
+        ),
+        migrations.AddField(
+            model_name='attendancereview',
+            name='check_in',
+            field=models.TimeField(blank=True, null=True, verbose_name='ساعت ورود'),
+        ),
+        migrations.AddField(
+            model_name='attendancereview',
+            name='check_out',
+            field=models.TimeField(blank=True, null=True, verbose_name='ساعت خروج'),
+        ),
+        migrations.AddField(
+            model_name='attendancereview',
+            name='status',
+            field=models.CharField(choices=[('PRESENT', 'حاضر'), ('ABSENT', 'غایب'), ('LATE', 'دیرکرد')], default='', max_length=10, verbose_name='وضعیت'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(snapshot_reviewed_rows, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='attendancereview',
+            name='date',
+            field=models.DateField(verbose_name='تاریخ'),
+        ),
+    ]
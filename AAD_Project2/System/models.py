@@ -1,10 +1,12 @@
 ﻿from django.db import models 
 from django.core.validators import MinLengthValidator, MaxLengthValidator 
 from django.contrib.auth.models import AbstractUser
-import uuid
+from django.utils import timezone
+from .ids import uuid7
+from .text import normalize_code, normalize_search
 
 class Person(models.Model):
-    person_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    person_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     first_name = models.CharField(max_length=50, verbose_name="نام")
     last_name = models.CharField(max_length=50, verbose_name="نام خانوادگی")
     birth_date = models.DateField(verbose_name="تاریخ تولد")
@@ -27,7 +29,7 @@ class Employee(Person):
     def __str__(self):
         return f"{self.first_name} {self.last_name} - {self.get_job_display()}"
 class Product(models.Model):
-    product_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    product_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=100, verbose_name="اسم کالا")
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="قیمت کالا")
     PRODUCT_TYPE_CHOICES = [
@@ -39,54 +41,188 @@ class Product(models.Model):
     ]
     product_type = models.CharField(max_length=20, choices=PRODUCT_TYPE_CHOICES, verbose_name="نوع کالا")
     photo = models.ImageField(upload_to='products/', verbose_name="عکس کالا", blank=True, null=True)
+    # کد کوتاه یا بارکد برای ورود سریع در صندوق؛ کالای بدون کد NULL می‌ماند
+    sku = models.CharField(max_length=32, null=True, blank=True, verbose_name="کد کالا / بارکد")
+    # نام یکسان‌شده برای جستجوی پیشوندی (ی/ک عربی، نیم‌فاصله و ارقام؛ System/text.py)
+    search_name = models.CharField(max_length=100, default="", editable=False, verbose_name="نام جستجو")
+    class Meta:
+        constraints = [
+            # یکتا فقط بین کالاهای کددار (SQL Server بیش از یک NULL را در ایندکس یکتا نمی‌پذیرد)
+            models.UniqueConstraint(fields=["sku"], condition=models.Q(sku__isnull=False), name="product_sku_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["search_name", "product_id"], name="product_search_idx"),
+            models.Index(fields=["product_type", "search_name", "product_id"], name="product_type_search_idx"),
+        ]
+    def save(self, *args, **kwargs):
+        self.sku = normalize_code(self.sku) or None
+        self.search_name = normalize_search(self.name)
+        if kwargs.get("update_fields") is not None and "name" in kwargs["update_fields"]:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "search_name"}
+        super().save(*args, **kwargs)
     def __str__(self):
         return f"{self.name} - {self.get_product_type_display()}"
+class InventoryQuerySet(models.QuerySet):
+    def low_stock(self):
+        # "IN (true)" به جای "= true" تا ایندکس below_threshold استفاده شود (مانند Debt.unpaid)
+        return self.filter(below_threshold__in=[True])
 class Inventory(models.Model):
-    inventory_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    inventory_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     # ارتباط با کالا
     product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name="کالا")
     # تعداد موجودی
     quantity = models.PositiveIntegerField(verbose_name="تعداد موجودی")
     # تاریخ آخرین بروزرسانی
     updated_at = models.DateTimeField(auto_now=True, verbose_name="آخرین بروزرسانی")
+    # برای کالاهای پرفروش موجودی بین چند ردیف InventoryShard تقسیم می‌شود و
+    # quantity فقط رونوشت مجموع آن‌هاست؛ فروش این ردیف را تغییر نمی‌دهد و
+    # رونوشت در rebalance، ورود کالا و دستور shard_inventory --refresh تازه می‌شود
+    is_sharded = models.BooleanField(default=False, verbose_name="موجودی تقسیم‌شده")
+    # هشدار کمبود: وقتی quantity به حد سفارش مجدد برسد below_threshold روشن می‌شود.
+    # این پرچم در همان UPDATE که موجودی را تغییر می‌دهد به‌روز می‌شود (System/inventory.py)
+    reorder_threshold = models.PositiveIntegerField(null=True, blank=True, verbose_name="حد سفارش مجدد")
+    reorder_quantity = models.PositiveIntegerField(null=True, blank=True, verbose_name="مقدار سفارش مجدد")
+    below_threshold = models.BooleanField(default=False, editable=False, verbose_name="زیر حد سفارش")
+
+    objects = InventoryQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # هر کالا فقط یک ردیف موجودی دارد
+            models.UniqueConstraint(fields=["product"], name="inventory_product_uniq"),
+        ]
+        indexes = [
+            # صفحه‌بندی لیست موجودی (keyset)
+            models.Index(fields=["updated_at", "inventory_id"], name="inventory_updated_idx"),
+            # فهرست کالاهای زیر حد سفارش
+            models.Index(fields=["below_threshold", "quantity"], name="inventory_below_threshold_idx"),
+        ]
+    def save(self, *args, **kwargs):
+        self.below_threshold = self.reorder_threshold is not None and self.quantity <= self.reorder_threshold
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "below_threshold"}
+        super().save(*args, **kwargs)
     def __str__(self):
         return f"{self.product.name} - موجودی: {self.quantity}"
+class InventoryShard(models.Model):
+    shard_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    inventory = models.ForeignKey(Inventory, on_delete=models.CASCADE, related_name="shards", verbose_name="موجودی")
+    shard_no = models.PositiveSmallIntegerField(verbose_name="شماره بخش")
+    quantity = models.PositiveIntegerField(verbose_name="تعداد موجودی")
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["inventory", "shard_no"], name="inventoryshard_inventory_shard_no_uniq"),
+        ]
+    def __str__(self):
+        return f"{self.inventory.product.name} - بخش {self.shard_no}: {self.quantity}"
 class CustomerPurchase(models.Model):
-    cp_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    cp_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     purchase_date = models.DateTimeField(auto_now_add=True, verbose_name="تاریخ خرید")
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="مجموع خرید",null=True)
     # رابطه چندبه‌چند با کالا از طریق مدل واسط PurchaseItem
     products = models.ManyToManyField(Product, through='PurchaseItem', verbose_name="کالاهای خریداری‌شده")
+    class Meta:
+        indexes = [
+            models.Index(fields=["purchase_date"], name="customerpurchase_date_idx"),
+        ]
     def __str__(self):
-        return f"خرید {self.customer} در تاریخ {self.purchase_date.strftime('%Y-%m-%d')} - مجموع: {self.total_amount}"
+        return f"خرید {self.cp_id} در تاریخ {self.purchase_date.strftime('%Y-%m-%d')} - مجموع: {self.total_amount}"
 class PurchaseItem(models.Model):
-    pi_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    pi_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     purchase = models.ForeignKey('CustomerPurchase', on_delete=models.CASCADE, related_name="items", verbose_name="خرید")
     product = models.ForeignKey('Product', on_delete=models.CASCADE, verbose_name="کالا")
     quantity = models.PositiveIntegerField(verbose_name="تعداد")
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="قیمت واحد")
 
+    class Meta:
+        indexes = [
+            # فاکتور و گزارش‌ها فقط همین ستون‌ها را می‌خوانند
+            models.Index(fields=["purchase", "product"], include=["quantity", "price"], name="purchaseitem_purchase_prod_idx"),
+        ]
+
     def get_total_price(self):
         return self.quantity * self.price
 
     def __str__(self):
-        return f"{self.product.name} × {self.quantity} (خرید: {self.purchase.id})"
+        return f"{self.product.name} × {self.quantity} (خرید: {self.purchase_id})"
+class IdempotencyKey(models.Model):
+    # کلید هر ارسال خرید از صندوق؛ ارسال دوباره همان کلید فاکتور قبلی را برمی‌گرداند
+    key_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    key = models.CharField(max_length=64, verbose_name="کلید درخواست")
+    purchase = models.ForeignKey(CustomerPurchase, on_delete=models.CASCADE, related_name="idempotency_keys", verbose_name="خرید")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="زمان ثبت")
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["key"], name="idempotencykey_key_uniq"),
+        ]
+        indexes = [
+            # پاک‌سازی کلیدهای قدیمی (purge_idempotency_keys)
+            models.Index(fields=["created_at"], name="idempotencykey_created_idx"),
+        ]
+    def __str__(self):
+        return f"{self.key} -> {self.purchase_id}"
+class DailySalesSummary(models.Model):
+    # جمع فروش هر کالا در هر روز؛ با هر خرید به‌روز می‌شود تا گزارش‌ها کل تاریخچه را نخوانند
+    summary_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    date = models.DateField(verbose_name="تاریخ")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="daily_sales", verbose_name="کالا")
+    product_type = models.CharField(max_length=20, choices=Product.PRODUCT_TYPE_CHOICES, verbose_name="نوع کالا")
+    quantity = models.PositiveIntegerField(verbose_name="تعداد فروش")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, verbose_name="مبلغ فروش")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="آخرین بروزرسانی")
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["date", "product"], name="dailysales_date_product_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["date", "product_type"], include=["quantity", "revenue"], name="dailysales_date_type_idx"),
+        ]
+    def __str__(self):
+        return f"فروش {self.date}: {self.quantity} عدد - {self.revenue}"
 class SpecialCustomer(Person):
     address = models.CharField(max_length=255, verbose_name="آدرس")
     position = models.CharField(max_length=50,default='specialcustomer', verbose_name="سمت شخص", editable=False) 
+    # مانده حساب (جمع نسیه‌ها منهای پرداخت‌ها)؛ فقط از طریق System.ledger و در همان تراکنش ثبت دفتر تغییر می‌کند
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False, verbose_name="مانده بدهی")
+    class Meta:
+        indexes = [
+            # گزارش بیشترین بدهکاران
+            models.Index(fields=["balance"], name="specialcustomer_balance_idx"),
+        ]
     def __str__(self):
         return f"مشتری ویژه: {self.first_name} {self.last_name}"
 class Credit(models.Model):
-    credit_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    credit_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     customer = models.ForeignKey(SpecialCustomer,on_delete=models.CASCADE,related_name="credits",verbose_name="مشتری ویژه")
     total_debt = models.DecimalField(max_digits=12,decimal_places=2,verbose_name="مجموع بدهی")
     is_paid = models.BooleanField(default=False, verbose_name="پرداخت شده؟")
     purchase = models.OneToOneField(CustomerPurchase,on_delete=models.CASCADE,related_name="credit",verbose_name="خرید مرتبط")
+    class Meta:
+        indexes = [
+            models.Index(fields=["customer", "is_paid"], include=["total_debt"], name="credit_customer_paid_idx"),
+        ]
     def __str__(self):
         status = "پرداخت شده" if self.is_paid else "بدهکار"
         return f"نسیه مشتری {self.customer} - مجموع بدهی: {self.total_debt} ({status})"
+class CreditEntry(models.Model):
+    # دفتر حساب مشتریان ویژه؛ فقط اضافه می‌شود و هیچ ردیفی ویرایش یا حذف نمی‌شود
+    CHARGE, PAYMENT = "CHARGE", "PAYMENT"
+    KIND_CHOICES = [(CHARGE, "نسیه"), (PAYMENT, "پرداخت")]
+    entry_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    customer = models.ForeignKey(SpecialCustomer, on_delete=models.PROTECT, related_name="ledger", verbose_name="مشتری ویژه")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name="نوع")
+    amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="مبلغ")
+    credit = models.ForeignKey(Credit, on_delete=models.PROTECT, null=True, blank=True, related_name="entries", verbose_name="نسیه مرتبط")
+    note = models.CharField(max_length=255, blank=True, default="", verbose_name="توضیحات")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="زمان ثبت")
+    class Meta:
+        indexes = [
+            models.Index(fields=["customer", "created_at"], include=["kind", "amount"], name="creditentry_customer_idx"),
+        ]
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.amount} - {self.customer_id}"
 class Creditor(models.Model):
-    creditor_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    creditor_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=100, verbose_name="نام طلبکار")
     creditor_type_choices = [
         ('PERSON', 'فرد'),
@@ -103,8 +239,13 @@ class Creditor(models.Model):
 
     def __str__(self):
         return f"{self.name} ({self.get_creditor_type_display()})"
+class DebtQuerySet(models.QuerySet):
+    def unpaid(self):
+        # به جای "is_paid = false" از "is_paid IN (false)" استفاده می‌شود؛ برخی پایگاه‌داده‌ها
+        # اولی را به "NOT is_paid" تبدیل می‌کنند که نمی‌تواند روی ایندکس (is_paid, due_date) جستجو کند
+        return self.filter(is_paid__in=[False])
 class Debt(models.Model):
-    debt_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    debt_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     creditor = models.ForeignKey(
         Creditor,
         on_delete=models.CASCADE,
@@ -116,18 +257,25 @@ class Debt(models.Model):
     is_paid = models.BooleanField(default=False, verbose_name="پرداخت شده؟")
     description = models.TextField(blank=True, null=True, verbose_name="توضیحات بدهی")
 
+    objects = DebtQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["is_paid", "due_date"], include=["creditor", "amount"], name="debt_paid_due_idx"),
+        ]
+
     def __str__(self):
         status = "پرداخت شده" if self.is_paid else "بدهی معوق"
         return f"بدهی به {self.creditor.name} - مبلغ: {self.amount} ({status})"
 class Wholesaler(models.Model):
-    wholesaler_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    wholesaler_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=100, verbose_name="نام عمده‌فروش")
     phone_number = models.CharField(max_length=15, verbose_name="شماره تماس")
     address = models.CharField(max_length=255, verbose_name="آدرس")
     def __str__(self):
         return f"عمده‌فروش: {self.name}"
 class WholesalePurchase(models.Model):
-    wp_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    wp_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     wholesaler = models.ForeignKey(Wholesaler,on_delete=models.CASCADE,related_name="purchases", verbose_name="عمده‌فروش")
     purchase_date = models.DateTimeField(auto_now_add=True, verbose_name="تاریخ خرید")
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="مجموع خرید", null=True)
@@ -135,7 +283,7 @@ class WholesalePurchase(models.Model):
     def __str__(self):
         return f"خرید از {self.wholesaler.name} در تاریخ {self.purchase_date.strftime('%Y-%m-%d')} - مجموع: {self.total_amount}"
 class WholesalePurchaseItem(models.Model):
-    wpi_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    wpi_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     purchase = models.ForeignKey(WholesalePurchase,on_delete=models.CASCADE,related_name="items",verbose_name="خرید عمده")
     product = models.ForeignKey('Product', on_delete=models.CASCADE, verbose_name="کالا")
     quantity = models.PositiveIntegerField(verbose_name="تعداد")
@@ -143,11 +291,11 @@ class WholesalePurchaseItem(models.Model):
     def get_total_price(self):
         return self.quantity * self.price
     def __str__(self):
-        return f"{self.product.name} × {self.quantity} (خرید عمده: {self.purchase.wp_id})"
+        return f"{self.product.name} × {self.quantity} (خرید عمده: {self.purchase_id})"
 class StoreManager(Person): 
       position = models.CharField(max_length=50,default='storemanager', verbose_name="سمت شخص", editable=False) 
 class CustomUser(AbstractUser):
-    user_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
 
     POSITION_CHOICES = [
         ("storemanager", "مدیر فروشگاه"),
@@ -169,9 +317,9 @@ class EmployeeProfile(models.Model):
     def __str__(self):
         return f"پروفایل کارمند: {self.user.username}"
 class Attendance(models.Model):
-    attendance_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    attendance_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="attendances", verbose_name="کارمند")
-    date = models.DateField(auto_now_add=True, verbose_name="تاریخ")
+    date = models.DateField(default=timezone.localdate, verbose_name="تاریخ")
     check_in = models.TimeField(verbose_name="ساعت ورود", null=True, blank=True)
     check_out = models.TimeField(verbose_name="ساعت خروج", null=True, blank=True)
 
@@ -185,8 +333,44 @@ class Attendance(models.Model):
 
     # فیلد تأیید مدیریت
     approved_by_manager = models.BooleanField(default=False, verbose_name="تأیید مدیریت")
+    # زمان بررسی مدیر (تأیید یا رد)؛ خالی یعنی در صف تأیید
+    reviewed_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="زمان بررسی")
 
     notes = models.TextField(blank=True, null=True, verbose_name="توضیحات")
 
+    class Meta:
+        constraints = [
+            # یک ردیف برای هر کارمند در هر روز؛ ثبت گروهی ورود/خروج روی آن upsert می‌کند
+            models.UniqueConstraint(fields=["employee", "date"], name="attendance_employee_date_uniq"),
+        ]
+        indexes = [
+            # کارکرد ماهانه و حضور امروز داشبورد بدون خواندن جدول
+            models.Index(fields=["date", "employee"], include=["status", "check_in", "check_out", "approved_by_manager"],
+                         name="attendance_date_idx"),
+            # صف تأیید مدیر (reviewed_at خالی) به ترتیب صفحه‌بندی keyset
+            models.Index(fields=["reviewed_at", "date", "attendance_id"], name="attendance_pending_idx"),
+        ]
+
     def __str__(self):
         return f"{self.employee.first_name} {self.employee.last_name} - {self.date} ({self.get_status_display()})"
+class AttendanceReview(models.Model):
+    # سابقه بررسی حضور توسط مدیر؛ هر تأیید یا رد گروهی یک ردیف برای هر حضور می‌نویسد.
+    # کارمند، روز و ساعت‌های بررسی‌شده همین‌جا هم ذخیره می‌شوند تا با حذف حضور یا کارمند سابقه از بین نرود
+    review_id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    attendance = models.ForeignKey(Attendance, on_delete=models.SET_NULL, null=True, related_name="reviews", verbose_name="حضور")
+    employee = models.ForeignKey(Employee, on_delete=models.SET_NULL, null=True, related_name="attendance_reviews", verbose_name="کارمند")
+    employee_name = models.CharField(max_length=101, verbose_name="نام کارمند")
+    date = models.DateField(verbose_name="تاریخ")
+    check_in = models.TimeField(null=True, blank=True, verbose_name="ساعت ورود")
+    check_out = models.TimeField(null=True, blank=True, verbose_name="ساعت خروج")
+    status = models.CharField(max_length=10, choices=Attendance.STATUS_CHOICES, verbose_name="وضعیت")
+    reviewer = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, related_name="attendance_reviews", verbose_name="بررسی‌کننده")
+    approved = models.BooleanField(verbose_name="تأیید شد؟")
+    reviewed_at = models.DateTimeField(verbose_name="زمان بررسی")
+    class Meta:
+        indexes = [
+            models.Index(fields=["attendance", "reviewed_at"], name="attendancereview_att_idx"),
+        ]
+    def __str__(self):
+        status = "تأیید" if self.approved else "رد"
+        return f"{status} حضور {self.employee_name} در {self.date} ({self.reviewed_at:%Y-%m-%d %H:%M})"
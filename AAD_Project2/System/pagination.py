@@ -0,0 +1,59 @@
+# System/pagination.py
+"""
+Keyset ("seek") pagination. Instead of OFFSET, each page starts strictly
+after the ordering key of the previous page's last row, so page 1000 costs
+the same index seek as page 1.
+"""
+
+import base64
+import datetime
+
+from django.core.exceptions import BadRequest, ValidationError
+from django.db.models import Q
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=50):
+    """
+    Return ``(rows, next_cursor)`` for ``queryset`` ordered by ``ordering``
+    (field names, ``-`` for descending; the last one must be unique).
+    ``next_cursor`` is ``None`` on the last page.
+    """
+    fields = [(name.lstrip("-"), name.startswith("-")) for name in ordering]
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(_after(fields, decode_cursor(queryset.model, fields, cursor)))
+    rows = list(queryset[:page_size + 1])
+    next_cursor = encode_cursor(rows[page_size - 1], fields) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
+
+
+def _after(fields, values):
+    # (a, b) after (x, y)  ==  a after x  OR  (a = x AND b after y)
+    condition = Q()
+    equal = {}
+    for (name, descending), value in zip(fields, values):
+        condition |= Q(**equal, **{f"{name}__{'lt' if descending else 'gt'}": value})
+        equal[name] = value
+    return condition
+
+
+def _text(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(row, fields):
+    raw = "|".join(_text(getattr(row, name)) for name, _ in fields)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(model, fields, cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        parts = raw.split("|")
+        if len(parts) != len(fields):
+            raise ValueError(cursor)
+        return [model._meta.get_field(name).to_python(part) for (name, _), part in zip(fields, parts)]
+    except (ValueError, ValidationError, UnicodeDecodeError):
+        raise BadRequest("Invalid page cursor.")
@@ -0,0 +1,70 @@
+# System/pool.py
+"""
+A bounded thread pool for running ORM work from async views.
+
+The event loop never touches the database; each call runs on one of
+``CHECKOUT_POOL_SIZE`` threads, which keep their connections between calls
+the way a WSGI worker does (``close_old_connections`` on the way in and out).
+At most ``CHECKOUT_MAX_PENDING`` calls may be running or queued; beyond that
+``run`` raises ``Saturated`` at once so the client can back off instead of
+holding a socket open in an ever-longer queue.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+_pending = None
+_lock = threading.Lock()
+
+
+class Saturated(Exception):
+    """Every thread is busy and the queue is full."""
+
+
+def _setup():
+    global _executor, _pending
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "CHECKOUT_POOL_SIZE", 8), thread_name_prefix="checkout")
+            _pending = threading.BoundedSemaphore(getattr(settings, "CHECKOUT_MAX_PENDING", 64))
+    return _executor, _pending
+
+
+def _call(func, args, kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run(func, *args, **kwargs):
+    """Await ``func(*args, **kwargs)`` run on the pool; raises ``Saturated`` when it is full."""
+    executor, pending = _setup()
+    if not pending.acquire(blocking=False):
+        raise Saturated()
+    try:
+        loop = asyncio.get_running_loop()
+        # Run in a copy of the caller's context so per-request state (the
+        # request metrics) follows the work onto the pool thread.
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(executor, functools.partial(context.run, _call, func, args, kwargs))
+    finally:
+        pending.release()
+
+
+def shutdown():
+    """Stop the pool (tests and settings changes); it is recreated on next use."""
+    global _executor, _pending
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+        _executor = _pending = None
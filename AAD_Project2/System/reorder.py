@@ -0,0 +1,49 @@
+# System/reorder.py
+"""
+Reorder suggestions for products at or below their ``reorder_threshold``,
+grouped by the wholesaler each product was last bought from.
+"""
+
+from django.db.models import F, OuterRef, Subquery
+
+from .models import Inventory, WholesalePurchaseItem
+
+NO_WHOLESALER = "بدون سابقه خرید عمده"
+
+
+def suggestions(full_scan=False):
+    """
+    One query for the low-stock rows with their last wholesaler and price.
+    By default this seeks the ``below_threshold`` index; ``full_scan``
+    compares every row's quantity with its threshold instead, which does not
+    rely on the flag being current.
+    """
+    if full_scan:
+        queryset = Inventory.objects.filter(reorder_threshold__gte=F("quantity"))
+    else:
+        queryset = Inventory.objects.low_stock()
+    last = WholesalePurchaseItem.objects.filter(product_id=OuterRef("product_id")).order_by(
+        "-purchase__purchase_date", "-wpi_id")
+    rows = queryset.annotate(
+        wholesaler_id=Subquery(last.values("purchase__wholesaler_id")[:1]),
+        wholesaler_name=Subquery(last.values("purchase__wholesaler__name")[:1]),
+        last_price=Subquery(last.values("price")[:1]),
+    ).order_by("product__name", "product_id").values(
+        "product_id", "product__name", "quantity", "reorder_threshold", "reorder_quantity",
+        "wholesaler_id", "wholesaler_name", "last_price",
+    )
+    result = []
+    for row in rows:
+        # Without an explicit reorder quantity, order back up to twice the threshold.
+        row["suggested"] = row["reorder_quantity"] or max(2 * row["reorder_threshold"] - row["quantity"], 1)
+        result.append(row)
+    return result
+
+
+def by_wholesaler(rows):
+    """Group ``suggestions()`` rows as ``[(wholesaler_name, rows), ...]``, unknown wholesaler last."""
+    groups = {}
+    for row in rows:
+        groups.setdefault(row["wholesaler_id"], []).append(row)
+    order = sorted(groups, key=lambda wid: (wid is None, groups[wid][0]["wholesaler_name"] or ""))
+    return [(groups[wid][0]["wholesaler_name"] or NO_WHOLESALER, groups[wid]) for wid in order]
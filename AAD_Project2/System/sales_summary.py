@@ -0,0 +1,179 @@
+# System/sales_summary.py
+"""
+``DailySalesSummary`` maintenance and the reports that read it.
+
+Once a sale commits, the checkout adds it to the summary rows of its day and
+products with ``UPDATE ... SET quantity = quantity + n`` (inserting the rows
+that do not exist yet), so the cost of a sale does not grow with the day's
+volume and reports never touch ``PurchaseItem``. ``refresh`` recomputes a
+slice from the sales themselves; ``rebuild`` (and the ``rebuild_sales_summary``
+command) uses it to backfill or repair any date range in batches.
+"""
+
+import datetime
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, PositiveIntegerField, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .exports import filter_days
+from .models import DailySalesSummary, PurchaseItem
+
+logger = logging.getLogger(__name__)
+
+
+def _aggregate(date_from, date_to, product_ids=None):
+    items = filter_days(PurchaseItem.objects.all(), "purchase__purchase_date", date_from, date_to)
+    if product_ids is not None:
+        items = items.filter(product_id__in=product_ids)
+    return (
+        items.annotate(day=TruncDate("purchase__purchase_date"))
+        .values("day", "product_id", "product__product_type")
+        .annotate(
+            sold=Sum("quantity"),
+            revenue=Sum(ExpressionWrapper(F("quantity") * F("price"),
+                                          output_field=DecimalField(max_digits=14, decimal_places=2))),
+        )
+        .order_by()
+    )
+
+
+def refresh(date_from, date_to, product_ids=None):
+    """Recompute the summary rows for ``date_from``..``date_to`` (inclusive), optionally for some products only."""
+    slice_ = DailySalesSummary.objects.filter(date__gte=date_from, date__lte=date_to)
+    if product_ids is not None:
+        slice_ = slice_.filter(product_id__in=product_ids)
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                return _refresh_locked(slice_, date_from, date_to, product_ids)
+        except IntegrityError:
+            # Two tills created the first row of the same day and product at
+            # once. The row exists now, so the second pass locks it and
+            # recomputes from every committed sale.
+            if attempt:
+                raise
+
+
+def _refresh_locked(slice_, date_from, date_to, product_ids):
+    # Lock the slice before reading the sales, so refreshes of the same day
+    # and product run one after another and the last one to commit has seen
+    # every sale committed before it. Rows are changed in place, not deleted
+    # and reinserted, so a refresh waiting on the lock still finds them.
+    existing = {(row.date, row.product_id): row for row in slice_.select_for_update()}
+    now = timezone.now()
+    changed, created = [], []
+    for row in _aggregate(date_from, date_to, product_ids):
+        key = (row["day"], row["product_id"])
+        summary = existing.pop(key, None)
+        if summary is None:
+            created.append(DailySalesSummary(date=row["day"], product_id=row["product_id"],
+                                             product_type=row["product__product_type"],
+                                             quantity=row["sold"], revenue=row["revenue"]))
+            continue
+        summary.product_type, summary.quantity, summary.revenue = row["product__product_type"], row["sold"], row["revenue"]
+        summary.updated_at = now
+        changed.append(summary)
+    if changed:
+        DailySalesSummary.objects.bulk_update(
+            changed, ["product_type", "quantity", "revenue", "updated_at"], batch_size=300)
+    if created:
+        DailySalesSummary.objects.bulk_create(created, batch_size=300)
+    if existing:
+        # Sales that are gone (e.g. a deleted purchase).
+        DailySalesSummary.objects.filter(pk__in=[row.pk for row in existing.values()]).delete()
+    return len(changed) + len(created)
+
+
+def record_purchase(purchase_id):
+    """Add a committed purchase to the summary rows of its day and products."""
+    lines = list(
+        PurchaseItem.objects.filter(purchase_id=purchase_id)
+        .values("purchase__purchase_date", "product_id", "product__product_type")
+        .annotate(sold=Sum("quantity"), revenue=Sum(ExpressionWrapper(
+            F("quantity") * F("price"), output_field=DecimalField(max_digits=14, decimal_places=2))))
+        .order_by("product_id")
+    )
+    if not lines:
+        return
+    day = timezone.localdate(lines[0]["purchase__purchase_date"])
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                return _add(day, lines)
+        except IntegrityError:
+            # Another till inserted the first row of this day and product;
+            # nothing was applied, and the second pass adds to its row.
+            if attempt:
+                raise
+
+
+def _add(day, lines):
+    product_ids = [line["product_id"] for line in lines]
+    existing = set(
+        DailySalesSummary.objects.filter(date=day, product_id__in=product_ids).values_list("product_id", flat=True))
+    new = [line for line in lines if line["product_id"] not in existing]
+    if new:
+        DailySalesSummary.objects.bulk_create([
+            DailySalesSummary(date=day, product_id=line["product_id"], product_type=line["product__product_type"],
+                              quantity=line["sold"], revenue=line["revenue"])
+            for line in new
+        ])
+    if existing:
+        # One UPDATE for every row: each gets its own increment, applied by
+        # the database to whatever the row holds when its lock is granted.
+        def delta(name, field):
+            return Case(*[When(product_id=line["product_id"], then=Value(line[name]))
+                          for line in lines if line["product_id"] in existing], output_field=field)
+        DailySalesSummary.objects.filter(date=day, product_id__in=existing).update(
+            quantity=F("quantity") + delta("sold", PositiveIntegerField()),
+            revenue=F("revenue") + delta("revenue", DecimalField(max_digits=14, decimal_places=2)),
+            updated_at=timezone.now(),
+        )
+
+
+def record_purchase_on_commit(purchase_id):
+    """Schedule ``record_purchase``; a failure is logged and never undoes the sale."""
+    def run():
+        try:
+            record_purchase(purchase_id)
+        except Exception:
+            logger.exception("Could not update the daily sales summary for purchase %s", purchase_id)
+    transaction.on_commit(run)
+
+
+def rebuild(date_from, date_to, batch_days=7):
+    """Recompute ``date_from``..``date_to`` in batches of ``batch_days``; yields ``(start, end, rows)``."""
+    start = date_from
+    while start <= date_to:
+        end = min(start + datetime.timedelta(days=batch_days - 1), date_to)
+        yield start, end, refresh(start, end)
+        start = end + datetime.timedelta(days=1)
+
+
+def _summary(date_from, date_to):
+    return DailySalesSummary.objects.filter(date__gte=date_from, date__lte=date_to)
+
+
+def sales_by_day(date_from, date_to):
+    return list(
+        _summary(date_from, date_to).values("date")
+        .annotate(quantity=Sum("quantity"), revenue=Sum("revenue")).order_by("date")
+    )
+
+
+def sales_by_type(date_from, date_to):
+    return list(
+        _summary(date_from, date_to).values("product_type")
+        .annotate(quantity=Sum("quantity"), revenue=Sum("revenue")).order_by("-revenue")
+    )
+
+
+def sales_by_product(date_from, date_to, limit=None):
+    rows = (
+        _summary(date_from, date_to).values("product_id", "product__name")
+        .annotate(quantity=Sum("quantity"), revenue=Sum("revenue")).order_by("-revenue", "product_id")
+    )
+    return list(rows[:limit] if limit else rows)
@@ -0,0 +1,49 @@
+# System/search.py
+"""
+Product autocomplete. Names are matched by prefix on ``Product.search_name``
+(see ``System.text.normalize_search``) with ``LIKE 'prefix%'``, which SQL
+Server turns into a seek on ``product_search_idx`` / ``product_type_search_idx``
+under the column's own collation, and read back in index order, so the cost is
+the page size, not the catalogue size. (A hand-built ``>= prefix AND < bumped
+prefix`` range would only be right under a binary collation.)
+Answers for recent prefixes are kept in ``SYSTEM_CACHES["search"]`` and
+dropped whenever a product changes.
+"""
+
+from django.db import transaction
+
+from .cache import get_cache
+from .models import Product
+from .text import normalize_search
+
+CACHE_NAME = "search"
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 25
+FIELDS = ("product_id", "name", "sku", "price", "product_type")
+
+
+def search(query="", product_type=None, limit=DEFAULT_LIMIT):
+    """
+    Up to ``limit`` products whose normalized name starts with ``query``,
+    optionally of one ``product_type``, as dicts of ``FIELDS``. An exact name
+    match sorts first, then the rest alphabetically.
+    """
+    prefix = normalize_search(query)
+    limit = max(1, min(limit, MAX_LIMIT))
+    key = f"{product_type or ''}:{limit}:{prefix}"
+    cache = get_cache(CACHE_NAME)
+    results = cache.get(key)
+    if results is None:
+        queryset = Product.objects.all()
+        if product_type:
+            queryset = queryset.filter(product_type=product_type)
+        if prefix:
+            queryset = queryset.filter(search_name__startswith=prefix)
+        results = list(queryset.order_by("search_name", "product_id").values(*FIELDS)[:limit])
+        cache.set(key, results)
+    return results
+
+
+def invalidate():
+    """Forget every cached answer once the current transaction commits."""
+    transaction.on_commit(lambda: get_cache(CACHE_NAME).clear())
@@ -0,0 +1,38 @@
+# System/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import aging, attendance, auth, catalogue, invoices, search
+from .models import Attendance, Credit, CustomerPurchase, CustomUser, Debt, Product, PurchaseItem
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_changed(sender, instance, **kwargs):
+    catalogue.invalidate(instance.pk)
+    search.invalidate()
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def user_changed(sender, instance, **kwargs):
+    auth.invalidate(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=CustomerPurchase)
+def purchase_changed(sender, instance, **kwargs):
+    invoices.invalidate(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=PurchaseItem)
+@receiver([post_save, post_delete], sender=Credit)
+def purchase_part_changed(sender, instance, **kwargs):
+    invoices.invalidate(instance.purchase_id)
+
+
+@receiver([post_save, post_delete], sender=Debt)
+def debt_changed(sender, instance, **kwargs):
+    aging.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Attendance)
+def attendance_changed(sender, instance, **kwargs):
+    attendance.invalidate(instance.date)
@@ -0,0 +1,54 @@
+"""Fixtures and assertions shared by the test modules."""
+
+from decimal import Decimal
+
+from django.contrib.auth import SESSION_KEY
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from ..auth import CachedModelBackend
+from ..models import Inventory, Product
+
+
+DEADLOCK_MESSAGE = (
+    "[40001] [Microsoft][ODBC Driver 18 for SQL Server][SQL Server]Transaction (Process ID 52) was deadlocked "
+    "on lock resources with another process and has been chosen as the deadlock victim. Rerun the transaction. "
+    "(1205) (SQLExecDirectW)"
+)
+
+
+def make_product(name="مداد", price="10.00", stock=10, product_type="WRITING"):
+    product = Product.objects.create(name=name, price=Decimal(price), product_type=product_type)
+    Inventory.objects.create(product=product, quantity=stock)
+    return product
+
+
+def query_plan(queryset):
+    """The backend's plan for ``queryset`` as text (SQLite EXPLAIN or SQL Server SHOWPLAN_XML)."""
+    if connection.vendor == "microsoft":
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("SET SHOWPLAN_XML ON")
+            try:
+                cursor.execute(sql, params)
+                return "".join(row[0] for row in cursor.fetchall())
+            finally:
+                cursor.execute("SET SHOWPLAN_XML OFF")
+    return queryset.explain()
+
+
+class QueryCountMixin:
+    """Fail when the number of queries a page needs grows with its size."""
+
+    def assertQueryCountFlat(self, make_url, sizes=(1, 5, 25)):
+        # The session's user is read once and then cached (System/auth.py).
+        CachedModelBackend().get_user(self.client.session[SESSION_KEY])
+        counts = []
+        for size in sizes:
+            url = make_url(size)
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(len(set(counts)), 1, f"query count grows with size: {dict(zip(sizes, counts))}")
+        return counts[0]
@@ -0,0 +1,135 @@
+"""Tests for clocking, timesheets and attendance approval."""
+
+import datetime
+import uuid
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import attendance
+from ..cache import reset_caches
+from ..models import Attendance, AttendanceReview, CustomUser, Employee
+
+
+@override_settings(ATTENDANCE_WORKDAY_START="08:00", ATTENDANCE_LATE_GRACE_MINUTES=10)
+class AttendanceTest(TestCase):
+    """Tests for bulk clocking and the monthly timesheet."""
+
+    def setUp(self):
+        reset_caches()
+        self.sara, self.reza = (
+            Employee.objects.create(first_name=first, last_name=last, birth_date="1995-01-01", gender="F",
+                                    phone_number=1, job="SELLER")
+            for first, last in (("سارا", "احمدی"), ("رضا", "کریمی"))
+        )
+        self.client.force_login(CustomUser.objects.create_user(username="boss", password="x", position="storemanager"))
+
+    def clock(self, day, entries):
+        return self.client.post(reverse("system:attendance_clock"), {"date": str(day), "entries": entries},
+                                content_type="application/json")
+
+    def test_clock_in_then_out_upserts_one_row_per_day(self):
+        day = datetime.date(2025, 1, 5)
+        attendance.clock([{"employee_id": self.sara.pk, "check_in": datetime.time(8, 5)}], day)
+        # SQL Server's backend has no upsert; the clock must not need one.
+        with mock.patch.object(connection.features, "supports_update_conflicts", False), \
+                CaptureQueriesContext(connection) as ctx:
+            attendance.clock([{"employee_id": self.sara.pk, "check_out": datetime.time(16, 5)},
+                              {"employee_id": self.reza.pk, "check_in": datetime.time(8, 30)}], day)
+        statements = [q["sql"].split()[0] for q in ctx.captured_queries if "System_attendance" in q["sql"]]
+        self.assertEqual(statements, ["SELECT", "UPDATE", "INSERT"])
+        self.assertFalse([q for q in ctx.captured_queries if "ON CONFLICT" in q["sql"]])
+        response = self.clock(day, [{"employee_id": str(self.reza.pk), "check_out": "16:00"}])
+        self.assertEqual(response.json(), {"saved": 1})
+        rows = Attendance.objects.filter(date=day).order_by("employee__first_name")
+        self.assertEqual([(a.check_in, a.check_out, a.status) for a in rows], [
+            (datetime.time(8, 30), datetime.time(16, 0), "LATE"),
+            (datetime.time(8, 5), datetime.time(16, 5), "PRESENT"),
+        ])
+        bad = self.clock(day, [{"employee_id": str(uuid.uuid4()), "check_in": "08:00"}])
+        self.assertEqual(bad.status_code, 400)
+
+    def test_closed_month_timesheet_is_cached_until_changed(self):
+        attendance.clock([{"employee_id": self.sara.pk, "check_in": datetime.time(8, 0),
+                           "check_out": datetime.time(16, 30)},
+                          {"employee_id": self.reza.pk, "status": "ABSENT"}], datetime.date(2025, 1, 5))
+        attendance.clock([{"employee_id": self.sara.pk, "check_in": datetime.time(9, 0),
+                           "check_out": datetime.time(12, 0)}], datetime.date(2025, 1, 6))
+        url = reverse("system:timesheet", args=[2025, 1])
+        with self.assertNumQueries(2):  # the (not yet cached) user and the timesheet
+            sheet = {row["name"]: row for row in self.client.get(url).json()["employees"]}
+        self.assertEqual(sheet["سارا احمدی"]["worked_minutes"], 690)
+        self.assertEqual((sheet["سارا احمدی"]["late"], sheet["رضا کریمی"]["absent"]), (1, 1))
+        self.assertEqual(sheet["سارا احمدی"]["pending_approval"], 2)
+        with self.assertNumQueries(0):
+            attendance.timesheet(2025, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.filter(employee=self.sara, date=datetime.date(2025, 1, 5)).get().delete()
+        self.assertEqual(attendance.timesheet(2025, 1)[0]["worked_minutes"], 180)
+
+
+@override_settings(ATTENDANCE_QUEUE_PAGE_SIZE=2)
+class AttendanceApprovalTest(TestCase):
+    """Tests for the manager's attendance approval queue."""
+
+    def setUp(self):
+        reset_caches()
+        self.manager = CustomUser.objects.create_user(username="boss", password="x", position="storemanager")
+        self.client.force_login(self.manager)
+        self.sara = Employee.objects.create(first_name="سارا", last_name="احمدی", birth_date="1995-01-01", gender="F",
+                                            phone_number=1, job="SELLER")
+        self.days = [datetime.date(2025, 1, day) for day in (3, 4, 5)]
+        for day in self.days:
+            Attendance.objects.create(employee=self.sara, date=day, status="PRESENT")
+        self.url = reverse("system:attendance_approvals")
+
+    def test_queue_pages_pending_rows_with_their_employee(self):
+        response = self.client.get(self.url)
+        self.assertEqual([row.date for row in response.context["rows"]], self.days[:2])
+        with self.assertNumQueries(1):
+            rows, _ = attendance.pending(response.context["next_cursor"], page_size=2)
+            self.assertEqual([(row.date, row.employee.first_name) for row in rows], [(self.days[2], "سارا")])
+
+    def test_selected_rows_are_approved_in_one_update_with_audit(self):
+        attendance.timesheet(2025, 1)
+        ids = list(Attendance.objects.filter(date__in=self.days[:2]).values_list("pk", flat=True))
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(attendance.review(self.manager, True, attendance_ids=ids), 2)
+        self.assertEqual(len([q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]), 1)
+        self.assertEqual(set(AttendanceReview.objects.values_list("attendance_id", "reviewer", "approved")),
+                         {(pk, self.manager.pk, True) for pk in ids})
+        self.assertEqual(attendance.timesheet(2025, 1)[0]["approved"], 2)
+        # Submitting the same rows again reviews nothing new.
+        response = self.client.post(self.url, {"action": "reject", "attendance_id": [str(pk) for pk in ids]})
+        self.assertRedirects(response, self.url)
+        self.assertEqual(Attendance.objects.filter(approved_by_manager=True).count(), 2)
+        self.assertEqual(AttendanceReview.objects.count(), 2)
+
+    def test_date_range_rejection_and_validation(self):
+        self.client.post(self.url, {"action": "reject", "date_from": "2025-01-04", "date_to": "2025-01-31"})
+        self.assertEqual(Attendance.objects.filter(reviewed_at__isnull=False, approved_by_manager=False).count(), 2)
+        self.assertEqual(AttendanceReview.objects.filter(approved=False).count(), 2)
+        response = self.client.post(self.url, {"action": "approve"})
+        self.assertContains(response, "بازه تاریخ را کامل وارد کنید")
+
+    def test_correcting_reviewed_times_sends_the_row_back_for_review(self):
+        attendance.review(self.manager, True, attendance_ids=list(Attendance.objects.values_list("pk", flat=True)))
+        attendance.clock([{"employee_id": self.sara.pk, "check_in": datetime.time(9, 30)}], self.days[0])
+        attendance.clock([{"employee_id": self.sara.pk, "notes": "مرخصی ساعتی"}], self.days[1])
+        rows = {row.date: row for row in Attendance.objects.all()}
+        self.assertEqual((rows[self.days[0]].approved_by_manager, rows[self.days[0]].reviewed_at), (False, None))
+        self.assertTrue(rows[self.days[1]].approved_by_manager)
+        rows, _ = attendance.pending()
+        self.assertEqual([row.date for row in rows], [self.days[0]])
+
+    def test_deleting_an_employee_keeps_the_review_trail(self):
+        attendance.review(self.manager, True, date_from=self.days[0], date_to=self.days[-1])
+        self.sara.delete()
+        self.assertFalse(Attendance.objects.exists())
+        self.assertEqual(
+            list(AttendanceReview.objects.order_by("date").values_list("attendance", "employee", "employee_name", "date",
+                                                                       "status", "approved")),
+            [(None, None, "سارا احمدی", day, "PRESENT", True) for day in self.days])
@@ -23,4 +23,4 @@ class SimpleTest(TestCase):
         """
         Tests that 1 + 1 always equals 2.
         """
-        self.assertEqual(1 + 1, 2)
\ No newline at end of file
+        self.assertEqual(1 + 1, 2)
@@ -0,0 +1,172 @@
+"""Tests for the product catalogue, SKU lookup and search."""
+
+import io
+import tempfile
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import catalogue, search
+from ..cache import FileBackend, reset_caches
+from ..checkout import place_order
+from ..imports import import_delivery
+from ..models import CustomUser, Inventory, Product, Wholesaler
+from .helpers import make_product
+
+
+class CatalogueCacheTest(TestCase):
+    """Tests for the read-through product catalogue."""
+
+    def setUp(self):
+        reset_caches()
+        self.pen = make_product("خودکار", "5.00", stock=10)
+
+    def test_reads_through_once(self):
+        with self.assertNumQueries(1):
+            catalogue.get(self.pen.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(catalogue.get(self.pen.pk).price, Decimal("5.00"))
+        with self.assertRaises(Product.DoesNotExist):
+            catalogue.get(uuid.uuid4())
+
+    def test_save_invalidates_after_commit(self):
+        catalogue.get(self.pen.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.pen.pk).update(price=Decimal("6.00"))
+            self.pen.refresh_from_db()
+            self.pen.save()
+        self.assertEqual(catalogue.get(self.pen.pk).price, Decimal("6.00"))
+
+    def test_stale_read_is_not_stored(self):
+        # A price change commits while a reader is between its version check and its SELECT.
+        real_in_bulk = Product.objects.in_bulk
+
+        def in_bulk_racing_a_save(ids):
+            rows = real_in_bulk(ids)
+            catalogue._bump([self.pen.pk])
+            return rows
+        with mock.patch.object(Product.objects, "in_bulk", side_effect=in_bulk_racing_a_save):
+            catalogue.get(self.pen.pk)
+        with self.assertNumQueries(1):
+            catalogue.get(self.pen.pk)
+
+    def test_change_in_another_worker_is_seen(self):
+        with tempfile.TemporaryDirectory() as location, override_settings(SYSTEM_CACHES={
+            "catalogue_versions": {"BACKEND": "System.cache.FileBackend", "OPTIONS": {"location": location}},
+        }):
+            reset_caches()
+            catalogue.get(self.pen.pk)
+            # Another process commits a price change; only the shared versions
+            # cache, not this process's catalogue entries, hears about it.
+            Product.objects.filter(pk=self.pen.pk).update(price=Decimal("6.00"))
+            other_worker = FileBackend(catalogue.VERSIONS_CACHE_NAME, location=location)
+            other_worker.set(catalogue.cache_key(self.pen.pk), "bumped-elsewhere", timeout=0)
+            self.assertEqual(catalogue.get(self.pen.pk).price, Decimal("6.00"))
+            with self.assertNumQueries(0):
+                catalogue.get(self.pen.pk)
+        reset_caches()
+
+    def test_checkout_and_views_use_the_cache(self):
+        self.client.force_login(CustomUser.objects.create_user(username="till1", password="x"))
+        call_command("warm_catalogue", stdout=io.StringIO())
+        with self.assertNumQueries(6):
+            purchase = place_order([(self.pen.pk, 1)])
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertContains(self.client.get(reverse("system:product_detail", args=[self.pen.pk])), "خودکار")
+            self.assertContains(self.client.get(reverse("system:purchase_invoice", args=[purchase.pk])), "خودکار")
+        self.assertFalse([q for q in ctx.captured_queries if "System_product" in q["sql"]])
+
+    def test_import_price_change_invalidates(self):
+        catalogue.get(self.pen.pk)
+        wholesaler = Wholesaler.objects.create(name="پخش البرز", phone_number="1", address="-")
+        with self.captureOnCommitCallbacks(execute=True):
+            import_delivery(wholesaler, [{"product_id": str(self.pen.pk), "quantity": "1", "unit_price": "3",
+                                          "sale_price": "7"}])
+        self.assertEqual(catalogue.get(self.pen.pk).price, Decimal("7"))
+
+
+class SkuLookupTest(TestCase):
+    """Tests for SKU/barcode entry at the till."""
+
+    def setUp(self):
+        reset_caches()
+        self.pen = make_product("خودکار", "5.00", stock=10)
+        self.pen.sku = " ۶۲۶۰۱۰۰ "
+        self.pen.save()
+        self.paper = make_product("کاغذ A4", "20.00", stock=10, product_type="PAPER")
+        self.client.force_login(CustomUser.objects.create_user(username="till1", password="x"))
+
+    def test_sku_is_normalized_and_unique(self):
+        self.assertEqual(Product.objects.get(pk=self.pen.pk).sku, "6260100")
+        self.assertIsNone(Product.objects.get(pk=self.paper.pk).sku)
+        make_product("مداد")  # any number of products without a code
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Product.objects.create(name="کپی", price=1, product_type="OTHER", sku="6260100")
+
+    def test_batch_resolves_in_one_query(self):
+        codes = ["6260100", "۶۲۶۰۱۰۰", "nope", str(self.paper.pk)]
+        catalogue.get(self.paper.pk)
+        with self.assertNumQueries(1):
+            products = catalogue.resolve_codes(codes)
+        self.assertEqual({code: p.pk for code, p in products.items()},
+                         {"6260100": self.pen.pk, "۶۲۶۰۱۰۰": self.pen.pk, str(self.paper.pk): self.paper.pk})
+        response = self.client.get(reverse("system:product_lookup"), {"code": codes})
+        self.assertEqual(response.json()["unknown"], ["nope"])
+
+    def test_checkout_form_accepts_codes(self):
+        response = self.client.post(reverse("system:multi_purchase_create"), {
+            "form-TOTAL_FORMS": "2", "form-INITIAL_FORMS": "0",
+            "form-0-product_id": "6260100", "form-0-quantity": "2",
+            "form-1-product_id": str(self.paper.pk), "form-1-quantity": "1",
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Inventory.objects.get(product=self.pen).quantity, 8)
+        response = self.client.post(reverse("system:multi_purchase_create"), {
+            "form-TOTAL_FORMS": "1", "form-INITIAL_FORMS": "0",
+            "form-0-product_id": "999", "form-0-quantity": "1",
+        })
+        self.assertContains(response, "کالایی با این کد یافت نشد.")
+
+
+class ProductSearchTest(TestCase):
+    """Tests for the prefix autocomplete."""
+
+    def setUp(self):
+        reset_caches()
+        self.client.force_login(CustomUser.objects.create_user(username="till1", password="x"))
+        self.notebook = make_product("دفتر يادداشت ۱۰۰ برگ", product_type="PAPER")
+        self.notebook_short = make_product("دفتر", product_type="PAPER")
+        self.pen = make_product("خودکار آبی")
+        self.folder = make_product("دفترچه\u200cتلفن", product_type="STORAGE")
+
+    def names(self, **params):
+        response = self.client.get(reverse("system:product_search"), params)
+        return [row["name"] for row in response.json()["results"]]
+
+    def test_folds_arabic_letters_zwnj_and_digits(self):
+        self.assertEqual(self.notebook.search_name, "دفتر یادداشت 100 برگ")
+        self.assertEqual(self.names(q="دفتر ياد"), ["دفتر يادداشت ۱۰۰ برگ"])
+        self.assertEqual(self.names(q="دفترچه تل"), [])
+        self.assertEqual(self.names(q="دفترچهتل"), ["دفترچه\u200cتلفن"])
+
+    def test_ranked_limited_and_filtered_by_type(self):
+        self.assertEqual(self.names(q="دفتر")[0], "دفتر")
+        self.assertEqual(len(self.names(q="دفتر", limit=2)), 2)
+        self.assertEqual(self.names(q="دفتر", type="STORAGE"), ["دفترچه\u200cتلفن"])
+        self.assertEqual(self.names(type="WRITING"), ["خودکار آبی"])
+        self.assertEqual(self.client.get(reverse("system:product_search"), {"type": "X"}).status_code, 400)
+
+    def test_hot_prefix_is_cached_until_a_product_changes(self):
+        search.search("خود")
+        with self.assertNumQueries(0):
+            search.search("خود")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pen.name = "خودنویس"
+            self.pen.save()
+        self.assertEqual([row["name"] for row in search.search("خود")], ["خودنویس"])
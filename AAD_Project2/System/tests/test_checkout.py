@@ -0,0 +1,253 @@
+"""Tests for checkout: the till form, the JSON API, idempotency keys and the offline till queue."""
+
+import datetime
+import io
+import json
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import catalogue, checkout, pool, till_queue
+from ..cache import reset_caches
+from ..checkout import CheckoutError, place_order
+from ..models import CustomUser, CustomerPurchase, IdempotencyKey, Inventory, Product
+from .helpers import DEADLOCK_MESSAGE, make_product
+
+
+class CheckoutTest(TestCase):
+    """Tests for the set-based checkout service."""
+
+    def test_place_order_decrements_stock_and_totals(self):
+        pen = make_product("خودکار", "5.00", stock=10)
+        paper = make_product("کاغذ A4", "20.00", stock=3, product_type="PAPER")
+        purchase = place_order([(pen.pk, 2), (paper.pk, 3), (pen.pk, 1)])
+
+        self.assertEqual(purchase.total_amount, Decimal("75.00"))
+        self.assertEqual(sorted(purchase.items.values_list("quantity", flat=True)), [3, 3])
+        self.assertEqual(Inventory.objects.get(product=pen).quantity, 7)
+        self.assertEqual(Inventory.objects.get(product=paper).quantity, 0)
+
+    def test_query_count_is_constant(self):
+        products = [make_product(f"کالا {i}", stock=5) for i in range(40)]
+        with self.assertNumQueries(7):
+            place_order([(products[0].pk, 1)])
+        with self.assertNumQueries(7):
+            place_order([(p.pk, 1) for p in products])
+
+    def test_short_stock_keeps_message_and_writes_nothing(self):
+        pen = make_product("خودکار", stock=1)
+        with self.assertRaisesMessage(CheckoutError, "موجودی کافی برای «خودکار» وجود ندارد."):
+            place_order([(pen.pk, 1), (pen.pk, 1)])
+        self.assertEqual(Inventory.objects.get(product=pen).quantity, 1)
+        self.assertFalse(CustomerPurchase.objects.exists())
+
+    def test_view_redirects_to_invoice(self):
+        pen = make_product("خودکار", stock=4)
+        user = CustomUser.objects.create_user(username="till1", password="x")
+        self.client.force_login(user)
+        response = self.client.post(reverse("system:multi_purchase_create"), {
+            "form-TOTAL_FORMS": "1", "form-INITIAL_FORMS": "0",
+            "form-0-product_id": str(pen.pk), "form-0-quantity": "2",
+        })
+        purchase = CustomerPurchase.objects.get()
+        self.assertRedirects(response, reverse("system:purchase_invoice", args=[purchase.pk]), fetch_redirect_response=False)
+        self.assertEqual(Inventory.objects.get(product=pen).quantity, 2)
+
+
+class CheckoutAPITest(TransactionTestCase):
+    """Tests for the async JSON checkout, whose database work runs on the pool's threads."""
+
+    def setUp(self):
+        reset_caches()
+        self.pen = make_product("خودکار", "5.00", stock=3)
+        self.pen.sku = "111"
+        self.pen.save()
+        self.user = CustomUser.objects.create_user(username="till1", password="x")
+        self.url = reverse("system:checkout_api")
+
+    def tearDown(self):
+        pool.shutdown()
+
+    async def post(self, payload, login=True):
+        if login:
+            await self.async_client.aforce_login(self.user)
+        return await self.async_client.post(self.url, json.dumps(payload), content_type="application/json")
+
+    async def test_checkout_returns_invoice(self):
+        response = await self.post({"lines": [{"code": "111", "quantity": 2}, {"product_id": str(self.pen.pk), "quantity": 1}]})
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(Decimal(body["total_amount"]), Decimal("15.00"))
+        self.assertEqual(body["invoice_url"], reverse("system:purchase_invoice", args=[body["purchase_id"]]))
+
+    async def test_errors(self):
+        self.assertEqual((await self.post({"lines": []}, login=False)).status_code, 401)
+        self.assertEqual((await self.post({"lines": [{"code": "111", "quantity": 0}]})).status_code, 400)
+        response = await self.post({"lines": [{"code": "999", "quantity": 1}]})
+        self.assertEqual((response.status_code, response.json()["unknown"]), (404, ["999"]))
+        response = await self.post({"lines": [{"code": "111", "quantity": 4}]})
+        self.assertEqual(response.status_code, 409)
+        self.assertIn("خودکار", response.json()["error"])
+
+    @override_settings(CHECKOUT_MAX_PENDING=1)
+    async def test_full_pool_answers_503(self):
+        pool.shutdown()
+        _, pending = pool._setup()
+        pending.acquire()
+        try:
+            response = await self.post({"lines": [{"code": "111", "quantity": 1}]})
+        finally:
+            pending.release()
+        self.assertEqual(response.status_code, 503)
+
+    async def test_replayed_key_returns_the_same_purchase(self):
+        await self.async_client.aforce_login(self.user)
+        send = lambda: self.async_client.post(self.url, json.dumps({"lines": [{"code": "111", "quantity": 1}]}),
+                                              content_type="application/json", headers={"Idempotency-Key": "till1-0001"})
+        first, second = await send(), await send()
+        self.assertEqual((first.status_code, second.status_code), (201, 200))
+        self.assertEqual(first.json()["purchase_id"], second.json()["purchase_id"])
+
+
+class IdempotentCheckoutTest(TestCase):
+    """Tests for idempotency keys on checkout submissions."""
+
+    def setUp(self):
+        reset_caches()
+        self.pen = make_product("خودکار", "5.00", stock=5)
+        self.client.force_login(CustomUser.objects.create_user(username="till1", password="x"))
+
+    def submit(self, key):
+        return self.client.post(reverse("system:multi_purchase_create"), {
+            "form-TOTAL_FORMS": "1", "form-INITIAL_FORMS": "0",
+            "form-0-product_id": str(self.pen.pk), "form-0-quantity": "2", "idempotency_key": key,
+        })
+
+    def test_double_submit_sells_once(self):
+        key = self.client.get(reverse("system:multi_purchase_create")).context["idempotency_key"]
+        first = self.submit(key)
+        with self.assertNumQueries(1):  # the key lookup; the session and user need none
+            second = self.submit(key)
+        self.assertEqual(first["Location"], second["Location"])
+        self.assertEqual(CustomerPurchase.objects.count(), 1)
+        self.assertEqual(Inventory.objects.get(product=self.pen).quantity, 3)
+
+    def test_losing_a_race_on_the_key_returns_the_winner(self):
+        winner = place_order([(self.pen.pk, 1)], key="race-key-1")
+        with mock.patch("System.checkout.replayed", side_effect=[None, winner]):
+            purchase = checkout.checkout([(str(self.pen.pk), 1)], key="race-key-1")
+        self.assertEqual(purchase.pk, winner.pk)
+        self.assertEqual(Inventory.objects.get(product=self.pen).quantity, 4)
+
+    def test_purge_removes_expired_keys(self):
+        old = place_order([(self.pen.pk, 1)], key="old-key-01")
+        place_order([(self.pen.pk, 1)], key="new-key-01")
+        IdempotencyKey.objects.filter(purchase=old).update(created_at=timezone.now() - datetime.timedelta(days=3))
+        call_command("purge_idempotency_keys", stdout=io.StringIO())
+        self.assertEqual(list(IdempotencyKey.objects.values_list("key", flat=True)), ["new-key-01"])
+
+
+class TillQueueTest(TestCase):
+    """Tests for the offline sale journal and its replay."""
+
+    def setUp(self):
+        reset_caches()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        queue_settings = override_settings(TILL_QUEUE_PATH=os.path.join(directory.name, "queue.sqlite3"))
+        queue_settings.enable()
+        self.addCleanup(queue_settings.disable)
+        self.pen = make_product("خودکار", "5.00", stock=3)
+        catalogue.warm()
+        self.client.force_login(CustomUser.objects.create_user(username="till1", password="x"))
+
+    def offline(self):
+        return mock.patch("System.views.checkout", side_effect=OperationalError("08001 server not reachable"))
+
+    def submit(self, key):
+        return self.client.post(reverse("system:multi_purchase_create"), {
+            "form-TOTAL_FORMS": "1", "form-INITIAL_FORMS": "0",
+            "form-0-product_id": str(self.pen.pk), "form-0-quantity": "2", "idempotency_key": key,
+        })
+
+    def test_outage_queues_the_sale_once(self):
+        with self.offline():
+            first, again = self.submit("offline-key-1"), self.submit("offline-key-1")
+        self.assertContains(first, "در صف صندوق ثبت شد")
+        self.assertEqual(first.context["seq"], again.context["seq"])
+        self.assertFalse(CustomerPurchase.objects.exists())
+
+    def test_whole_database_down_still_queues_the_sale(self):
+        # The till was in use before the outage, so its user is cached.
+        self.client.get(reverse("system:multi_purchase_create"))
+
+        def unreachable(execute, sql, params, many, context):
+            raise OperationalError("08001", "[08001] [Microsoft][ODBC Driver 17 for SQL Server]TCP Provider: "
+                                            "No connection could be made because the target machine actively refused it.")
+        with connection.execute_wrapper(unreachable):
+            response = self.submit("offline-key-1")
+            self.assertContains(response, "در صف صندوق ثبت شد")
+            self.assertEqual(response.context["lines"], [(str(self.pen.pk), 2, Decimal("5.00"))])
+            self.assertEqual(response.context["total"], Decimal("10.00"))
+            reset_caches()
+            self.assertContains(self.submit("offline-key-2"), "قیمت این کالا بدون اتصال به سرور در دسترس نیست.")
+        self.assertEqual(till_queue.replay(), {"synced": 1, "conflicts": 0, "left": 0})
+        self.assertEqual(CustomerPurchase.objects.get().total_amount, Decimal("10.00"))
+
+    def test_replay_charges_the_queued_prices(self):
+        till_queue.enqueue([(str(self.pen.pk), 2, Decimal("5.00"))], "offline-key-1")
+        # The price went up before the till could sync.
+        Product.objects.filter(pk=self.pen.pk).update(price=Decimal("6.00"))
+        reset_caches()
+        self.assertEqual(till_queue.replay(), {"synced": 1, "conflicts": 0, "left": 0})
+        purchase = CustomerPurchase.objects.get()
+        self.assertEqual(purchase.total_amount, Decimal("10.00"))
+        self.assertEqual(purchase.items.get().price, Decimal("5.00"))
+
+    def test_replay_flags_a_total_that_differs_from_the_one_charged(self):
+        online = place_order([(self.pen.pk, 1)], key="offline-key-1")
+        till_queue.enqueue([(str(self.pen.pk), 2, Decimal("5.00"))], "offline-key-1")
+        self.assertEqual(till_queue.replay(), {"synced": 0, "conflicts": 1, "left": 0})
+        [sale] = till_queue.conflicts()
+        self.assertEqual((sale["purchase_id"], sale["total"]), (str(online.pk), "10.00"))
+
+    def test_replay_sells_in_order_and_flags_conflicts(self):
+        sold_at = timezone.now() - datetime.timedelta(hours=2)
+        with mock.patch("django.utils.timezone.now", return_value=sold_at):
+            till_queue.enqueue([(str(self.pen.pk), 2, Decimal("5.00"))], "offline-key-1")
+        till_queue.enqueue([(str(self.pen.pk), 2, Decimal("5.00"))], "offline-key-2")
+        till_queue.enqueue([("no-such-code", 1, Decimal("1.00"))], "offline-key-3")
+        self.assertEqual(till_queue.replay(batch_size=2), {"synced": 1, "conflicts": 1, "left": 1})
+        self.assertEqual(CustomerPurchase.objects.get().purchase_date, sold_at)
+        self.assertEqual(Inventory.objects.get(product=self.pen).quantity, 1)
+        out = io.StringIO()
+        call_command("sync_till_queue", stdout=out)
+        self.assertIn("conflicts 1, still queued 0", out.getvalue())
+        self.assertEqual([sale["seq"] for sale in till_queue.conflicts()], [2, 3])
+
+    def test_only_connection_failures_count_as_an_outage(self):
+        self.assertTrue(till_queue.database_unavailable(OperationalError("HYT00", "[HYT00] Login timeout expired")))
+        self.assertFalse(till_queue.database_unavailable(OperationalError("40001", DEADLOCK_MESSAGE)))
+        self.assertFalse(till_queue.database_unavailable(OperationalError("42S02", "[42S02] Invalid object name")))
+        self.assertFalse(till_queue.database_unavailable(OperationalError("no such table")))
+        with mock.patch("System.views.checkout", side_effect=OperationalError("no such table")), \
+                self.assertRaises(OperationalError):
+            self.submit("offline-key-1")
+        self.assertEqual(till_queue.replay(), {"synced": 0, "conflicts": 0, "left": 0})
+
+    def test_replay_waits_while_database_is_down_and_is_safe_to_repeat(self):
+        till_queue.enqueue([(str(self.pen.pk), 1, Decimal("5.00"))], "offline-key-1")
+        with mock.patch("System.checkout.checkout", side_effect=OperationalError("08S01 link failure")), \
+                self.assertLogs("System.till_queue", "WARNING"):
+            self.assertEqual(till_queue.replay(), {"synced": 0, "conflicts": 0, "left": 1})
+        # A replay that committed the sale but died before updating the journal.
+        place_order([(self.pen.pk, 1)], key="offline-key-1")
+        self.assertEqual(till_queue.replay(), {"synced": 1, "conflicts": 0, "left": 0})
+        self.assertEqual(Inventory.objects.get(product=self.pen).quantity, 2)
@@ -0,0 +1,123 @@
+"""Tests for exports and the wholesale delivery import."""
+
+import datetime
+import io
+import json
+from decimal import Decimal
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import inventory, search
+from ..cache import reset_caches
+from ..checkout import place_order
+from ..imports import ImportFailed, import_delivery, read_rows
+from ..models import CustomUser, Inventory, Product, WholesalePurchase, Wholesaler
+from .helpers import make_product
+
+
+class ExportTest(TestCase):
+    """Tests for the streaming exports."""
+
+    def setUp(self):
+        self.client.force_login(CustomUser.objects.create_user(username="boss", password="x", position="storemanager"))
+        self.pen = make_product("خودکار", "5.00", stock=10)
+        self.paper = make_product("کاغذ A4", "20.00", stock=10, product_type="PAPER")
+        place_order([(self.pen.pk, 2), (self.paper.pk, 1)])
+
+    def test_sales_csv_streams_filtered_rows(self):
+        response = self.client.get(reverse("system:export", args=["sales"]), {"product_type": "PAPER"})
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[:2], ["purchase_id", "purchase_date"])
+        self.assertEqual(len(lines), 2)
+        self.assertEqual([Decimal(v) for v in lines[1].split(",")[5:]], [1, 20, 20])
+
+    def test_inventory_json(self):
+        response = self.client.get(reverse("system:export", args=["inventory"]), {"format": "json"})
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(sorted(row["quantity"] for row in data), [8, 9])
+
+    def test_date_range_excludes_other_days(self):
+        tomorrow = (timezone.localdate() + datetime.timedelta(days=1)).isoformat()
+        response = self.client.get(reverse("system:export", args=["sales"]), {"from": tomorrow})
+        self.assertEqual(len(b"".join(response.streaming_content).decode().splitlines()), 1)
+
+    def test_bad_filter_and_non_manager(self):
+        self.assertEqual(self.client.get(reverse("system:export", args=["sales"]), {"from": "x"}).status_code, 400)
+        self.client.force_login(CustomUser.objects.create_user(username="till1", password="x"))
+        self.assertEqual(self.client.get(reverse("system:export", args=["sales"])).status_code, 403)
+
+    def test_management_command(self):
+        out = io.StringIO()
+        with mock.patch("sys.stdout", out):
+            call_command("export_data", "wholesale")
+        self.assertEqual(out.getvalue().splitlines()[0].split(",")[2], "wholesaler")
+
+
+class WholesaleImportTest(TestCase):
+    """Tests for the bulk delivery import."""
+
+    def setUp(self):
+        self.wholesaler = Wholesaler.objects.create(name="پخش نوشت‌افزار", phone_number="021", address="-")
+        self.pen = make_product("خودکار", "5.00", stock=2)
+
+    def csv_file(self, text):
+        return io.BytesIO(text.encode("utf-8"))
+
+    def test_import_upserts_products_restocks_and_totals(self):
+        rows = read_rows(self.csv_file(
+            "name,product_type,quantity,unit_price,sale_price\n"
+            "خودکار,WRITING,10,3.00,6.00\n"
+            "دفتر,PAPER,4,12.50,\n"
+            "دفتر,PAPER,1,12.50,\n"
+        ), "delivery.csv")
+        purchase, summary = import_delivery(self.wholesaler, rows)
+
+        self.assertEqual(summary, {"lines": 3, "created": 1, "updated": 1})
+        self.assertEqual(purchase.total_amount, Decimal("92.50"))
+        self.assertEqual(Inventory.objects.get(product=self.pen).quantity, 12)
+        self.assertEqual(Inventory.objects.get(product__name="دفتر").quantity, 5)
+        self.assertEqual(Product.objects.get(pk=self.pen.pk).price, Decimal("6.00"))
+
+    def test_repriced_product_drops_cached_search(self):
+        reset_caches()
+        self.assertEqual(search.search("خود")[0]["price"], Decimal("5.00"))
+        with self.captureOnCommitCallbacks(execute=True):
+            import_delivery(self.wholesaler, read_rows(self.csv_file(
+                "name,quantity,unit_price,sale_price\nخودکار,1,3.00,7.00\n"), "d.csv"))
+        self.assertEqual(search.search("خود")[0]["price"], Decimal("7.00"))
+
+    def test_query_count_does_not_grow_with_lines(self):
+        def run(lines):
+            body = "name,quantity,unit_price\n" + "".join(f"کالا {lines}-{i},1,1\n" for i in range(lines))
+            with CaptureQueriesContext(connection) as ctx:
+                import_delivery(self.wholesaler, read_rows(self.csv_file(body), "d.csv"))
+            return len(ctx.captured_queries)
+        self.assertEqual(run(3), run(60))
+
+    def test_bad_line_writes_nothing(self):
+        rows = read_rows(self.csv_file("name,quantity,unit_price\nخودکار,-1,3\n"), "d.csv")
+        with self.assertRaises(ImportFailed) as ctx:
+            import_delivery(self.wholesaler, rows)
+        self.assertIn("ردیف 2", ctx.exception.errors[0])
+        self.assertFalse(WholesalePurchase.objects.exists())
+
+    @override_settings(INVENTORY_SHARDED_STOCK=True)
+    def test_sharded_product_is_restocked(self):
+        inventory.shard(Inventory.objects.get(product=self.pen), 2)
+        import_delivery(self.wholesaler, read_rows(self.csv_file(f"product_id,quantity,unit_price\n{self.pen.pk},4,3\n"), "d.csv"))
+        self.assertEqual(Inventory.objects.get(product=self.pen).quantity, 6)
+
+    def test_upload_view(self):
+        self.client.force_login(CustomUser.objects.create_user(username="boss", password="x", position="storemanager"))
+        upload = SimpleUploadedFile("d.csv", "name,quantity,unit_price\nخودکار,3,3\n".encode())
+        response = self.client.post(reverse("system:wholesale_import"), {"wholesaler": self.wholesaler.pk, "file": upload})
+        self.assertRedirects(response, reverse("system:wholesale_import"))
+        self.assertEqual(Inventory.objects.get(product=self.pen).quantity, 5)
@@ -0,0 +1,72 @@
+"""Tests for query plans and ordered primary keys."""
+
+import datetime
+import uuid
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from .. import aging, attendance
+from ..ids import uuid7
+from ..models import Attendance, Credit, CustomerPurchase, Debt, Inventory, Product, PurchaseItem, SpecialCustomer
+from .helpers import make_product, query_plan
+
+
+class QueryPlanTest(TestCase):
+    """The report queries must seek an index, never scan the table."""
+
+    def assertSeeks(self, queryset, index_name):
+        plan = query_plan(queryset)
+        if connection.vendor == "microsoft":
+            self.assertIn("Index Seek", plan)
+            self.assertIn(index_name, plan)
+        elif connection.vendor == "sqlite":
+            # SQLite builds unique constraints as anonymous autoindexes.
+            self.assertRegex(plan, rf"SEARCH .*USING (COVERING )?INDEX ({index_name}|sqlite_autoindex_)")
+        else:
+            self.skipTest(f"No plan check for {connection.vendor}")
+
+    def test_hot_queries_use_indexes(self):
+        today = timezone.localdate()
+        self.assertSeeks(CustomerPurchase.objects.filter(purchase_date__gte=timezone.now()), "customerpurchase_date_idx")
+        self.assertSeeks(PurchaseItem.objects.filter(purchase_id=uuid.uuid4()).values("product_id", "quantity", "price"),
+                         "purchaseitem_purchase_prod_idx")
+        self.assertSeeks(Credit.objects.filter(customer_id=uuid.uuid4(), is_paid=False), "credit_customer_paid_idx")
+        self.assertSeeks(Debt.objects.unpaid().filter(due_date__lt=today), "debt_paid_due_idx")
+        self.assertSeeks(Attendance.objects.filter(employee_id=uuid.uuid4(), date=today), "attendance_employee_date_uniq")
+        self.assertSeeks(Attendance.objects.filter(reviewed_at__isnull=True)
+                         .order_by(*attendance.PENDING_ORDERING), "attendance_pending_idx")
+        self.assertSeeks(Attendance.objects.filter(date__gte=today, date__lt=today + datetime.timedelta(days=30))
+                         .values("employee_id").annotate(Count("pk")), "attendance_date_idx")
+        self.assertSeeks(Inventory.objects.filter(product_id=uuid.uuid4()), "inventory_product_uniq")
+        self.assertSeeks(Inventory.objects.low_stock().order_by("quantity"), "inventory_below_threshold_idx")
+        prefix = Product.objects.filter(search_name__startswith="کاغ").order_by("search_name", "product_id")
+        if connection.vendor == "sqlite":
+            # SQLite seeks LIKE only on NOCASE columns; it still reads the index in order.
+            self.assertIn("product_search_idx", query_plan(prefix))
+        else:
+            self.assertSeeks(prefix, "product_search_idx")
+        self.assertSeeks(SpecialCustomer.objects.filter(balance__gt=0).order_by("-balance"), "specialcustomer_balance_idx")
+        self.assertSeeks(Debt.objects.unpaid().values("creditor_id").annotate(**aging._bucket_sums(today)),
+                         "debt_paid_due_idx")
+
+    def test_inventory_is_unique_per_product(self):
+        pen = make_product("خودکار")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Inventory.objects.create(product=pen, quantity=1)
+
+
+class OrderedKeyTest(SimpleTestCase):
+    """Tests for the time-ordered primary key generator."""
+
+    def test_uuid7_is_version_7_and_increasing(self):
+        keys = [uuid7() for _ in range(5000)]
+        self.assertTrue(all(k.version == 7 for k in keys))
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual([k.hex for k in keys], sorted(k.hex for k in keys))
+        self.assertEqual(len(set(keys)), len(keys))
+
+    def test_models_default_to_ordered_keys(self):
+        self.assertEqual(PurchaseItem(quantity=1, price=1).pk.version, 7)
@@ -0,0 +1,234 @@
+"""Tests for stock reservation, retries, sharding, the inventory list and reordering."""
+
+import io
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import inventory, reorder
+from ..checkout import CheckoutError, place_order
+from ..imports import import_delivery
+from ..models import CustomUser, Inventory, InventoryShard, Product, Wholesaler
+from .helpers import DEADLOCK_MESSAGE, QueryCountMixin, make_product
+
+
+# Ordered by product_id ascending, by name or (as values_list compiles it on
+# some backends) by the position of the product_id column.
+LOCK_ORDER = r'^SELECT "System_inventory"\."product_id" .* ORDER BY (1|"System_inventory"\."product_id") ASC( FOR UPDATE)?$'
+
+
+class ReservationTest(TestCase):
+    """Tests for lock ordering in the reservation layer."""
+
+    def test_rows_are_locked_in_product_order(self):
+        products = [Product.objects.create(name=f"کالا {i}", price=Decimal("1.00"), product_type="OTHER")
+                    for i in range(4)]
+        # Inventory rows stored in the opposite order to their products' ids,
+        # so the table's own order cannot pass for the lock order.
+        for product in reversed(products):
+            Inventory.objects.create(product=product, quantity=5)
+        ids = sorted(p.pk for p in products)
+        basket = [ids[2], ids[0], ids[3], ids[1]]
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(list(inventory.lock_stock(basket)), ids)
+        self.assertRegex(ctx.captured_queries[0]["sql"], LOCK_ORDER)
+        with CaptureQueriesContext(connection) as ctx:
+            place_order([(pk, 1) for pk in basket])
+        lock_sql = next(q["sql"] for q in ctx.captured_queries if 'FROM "System_inventory"' in q["sql"])
+        self.assertRegex(lock_sql, LOCK_ORDER)
+
+
+class RetryTest(SimpleTestCase):
+    """Tests for deadlock retry with backoff."""
+
+    def test_deadlock_is_retried(self):
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError("40001", DEADLOCK_MESSAGE)
+            return "ok"
+
+        before = inventory.retries.value
+        with mock.patch("System.inventory.time.sleep"):
+            self.assertEqual(inventory.run_with_retry(flaky), "ok")
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(inventory.retries.value - before, 2)
+
+    def test_other_errors_are_not_retried(self):
+        def broken():
+            raise OperationalError("no such table")
+
+        with self.assertRaises(OperationalError):
+            inventory.run_with_retry(broken)
+
+    def test_only_exact_driver_codes_are_retryable(self):
+        snapshot = OperationalError("42000", "[42000] [Microsoft][SQL Server]Snapshot isolation transaction "
+                                             "aborted due to update conflict. (3960) (SQLExecDirectW)")
+        self.assertTrue(inventory.is_retryable(snapshot))
+        self.assertFalse(inventory.is_retryable(OperationalError("HY000", "[HY000] deadlock report (12050) (SQLExecDirectW)")))
+        self.assertFalse(inventory.is_retryable(OperationalError("could not serialize: deadlock 1205")))
+
+    def test_integrity_errors_are_never_retried(self):
+        calls = []
+
+        def duplicate():
+            calls.append(1)
+            raise IntegrityError("40001", DEADLOCK_MESSAGE)
+
+        with self.assertRaises(IntegrityError):
+            inventory.run_with_retry(duplicate)
+        self.assertEqual(len(calls), 1)
+
+
+class OptimisticModeTest(TestCase):
+    """Tests for the lock-free conditional-UPDATE mode."""
+
+    def test_sale_without_row_locks(self):
+        pen = make_product("خودکار", stock=3)
+        with CaptureQueriesContext(connection) as ctx:
+            place_order([(pen.pk, 2)], mode=inventory.OPTIMISTIC)
+        self.assertFalse(any("FOR UPDATE" in q["sql"] for q in ctx.captured_queries))
+        self.assertEqual(Inventory.objects.get(product=pen).quantity, 1)
+
+    def test_short_row_names_the_right_product(self):
+        pen = make_product("خودکار", stock=5)
+        paper = make_product("کاغذ A4", stock=1, product_type="PAPER")
+        with self.assertRaisesMessage(CheckoutError, "موجودی کافی برای «کاغذ A4» وجود ندارد."):
+            place_order([(pen.pk, 3), (paper.pk, 2)], mode=inventory.OPTIMISTIC)
+        self.assertEqual(Inventory.objects.get(product=pen).quantity, 5)
+
+
+@override_settings(INVENTORY_SHARDED_STOCK=True)
+class ShardedInventoryTest(TestCase):
+    """Tests for hot products whose stock is split across shard rows."""
+
+    def setUp(self):
+        self.pen = make_product("خودکار", stock=10)
+        inventory.shard(Inventory.objects.get(product=self.pen), 4)
+
+    def test_shards_split_the_stock(self):
+        shards = InventoryShard.objects.filter(inventory__product=self.pen).order_by("shard_no")
+        self.assertEqual([s.quantity for s in shards], [3, 3, 2, 2])
+
+    def test_sale_takes_from_shards_without_writing_the_inventory_row(self):
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            place_order([(self.pen.pk, 2)])
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith('UPDATE "System_inventory"')])
+        self.assertEqual(InventoryShard.objects.aggregate(total=Sum("quantity"))["total"], 8)
+        self.assertEqual(Inventory.objects.get(product=self.pen).quantity, 10)
+        out = io.StringIO()
+        call_command("shard_inventory", "--refresh", stdout=out)
+        self.assertIn("Refreshed 1 sharded products.", out.getvalue())
+        self.assertEqual(Inventory.objects.get(product=self.pen).quantity, 8)
+
+    def test_sale_larger_than_any_shard_falls_back(self):
+        with mock.patch("System.inventory.run_in_background") as background:
+            with self.captureOnCommitCallbacks(execute=True):
+                place_order([(self.pen.pk, 9)])
+        background.assert_called_once()
+        # The rebalance that follows a fallback also refreshes the total.
+        func, inventory_id = background.call_args.args
+        func(inventory_id)
+        self.assertEqual(Inventory.objects.get(product=self.pen).quantity, 1)
+        with self.assertRaisesMessage(CheckoutError, "موجودی کافی برای «خودکار» وجود ندارد."):
+            place_order([(self.pen.pk, 2)])
+
+    def test_unshard_folds_stock_back(self):
+        place_order([(self.pen.pk, 1)])
+        row = inventory.unshard(Inventory.objects.get(product=self.pen))
+        self.assertEqual(row.quantity, 9)
+        self.assertFalse(InventoryShard.objects.exists())
+
+
+@override_settings(INVENTORY_PAGE_SIZE=2)
+class InventoryListTest(QueryCountMixin, TestCase):
+    """Tests for the keyset-paginated inventory list."""
+
+    def setUp(self):
+        self.client.force_login(CustomUser.objects.create_user(username="till1", password="x"))
+
+    def test_pages_walk_every_row_once(self):
+        for i in range(5):
+            make_product(f"کالا {i}", "3.00", stock=i + 1)
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(reverse("system:inventory_list"), {"cursor": cursor} if cursor else {})
+            seen += [row.pk for row in response.context["inventories"]]
+            cursor = response.context["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(sorted(seen), sorted(Inventory.objects.values_list("pk", flat=True)))
+        self.assertContains(response, "3.00 تومان")
+
+    def test_stock_value_is_computed_in_sql(self):
+        make_product("خودکار", "2.50", stock=4)
+        response = self.client.get(reverse("system:inventory_list"))
+        self.assertEqual(response.context["inventories"][0].stock_value, Decimal("10.00"))
+
+    def test_query_count_does_not_grow(self):
+        def url(size):
+            for i in range(size):
+                make_product(f"کالا {size}-{i}")
+            return reverse("system:inventory_list")
+        self.assertQueryCountFlat(url)
+
+    def test_bad_cursor_is_rejected(self):
+        response = self.client.get(reverse("system:inventory_list"), {"cursor": "nonsense"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ReorderTest(TestCase):
+    """Tests for the below-threshold flag and the reorder suggestions."""
+
+    def setUp(self):
+        self.pen = make_product("خودکار", "5.00", stock=10)
+        self.paper = make_product("کاغذ A4", "20.00", stock=10, product_type="PAPER")
+        Inventory.objects.filter(product=self.pen).update(reorder_threshold=5)
+        Inventory.objects.filter(product=self.paper).update(reorder_threshold=5, reorder_quantity=40)
+        self.wholesaler = Wholesaler.objects.create(name="پخش البرز", phone_number="1", address="-")
+
+    def flagged(self):
+        return set(Inventory.objects.low_stock().values_list("product_id", flat=True))
+
+    def test_flag_follows_sales_and_deliveries(self):
+        for mode in inventory.MODES:
+            with self.subTest(mode=mode):
+                Inventory.objects.filter(product=self.pen).update(quantity=10, below_threshold=False)
+                place_order([(self.pen.pk, 4), (self.paper.pk, 1)], mode=mode)
+                self.assertEqual(self.flagged(), set())
+                place_order([(self.pen.pk, 1)], mode=mode)
+                self.assertEqual(self.flagged(), {self.pen.pk})
+        import_delivery(self.wholesaler, [{"product_id": str(self.pen.pk), "quantity": "10", "unit_price": "3"}])
+        self.assertEqual(self.flagged(), set())
+
+    def test_save_sets_flag(self):
+        row = Inventory.objects.get(product=self.paper)
+        row.quantity = 5
+        row.save(update_fields=["quantity"])
+        self.assertEqual(self.flagged(), {self.paper.pk})
+
+    def test_suggestions_grouped_by_last_wholesaler(self):
+        import_delivery(self.wholesaler, [{"product_id": str(self.pen.pk), "quantity": "1", "unit_price": "3"}])
+        Inventory.objects.filter(product=self.pen).update(quantity=2, below_threshold=True)
+        Inventory.objects.filter(product=self.paper).update(quantity=0, below_threshold=True)
+        with self.assertNumQueries(1):
+            groups = reorder.by_wholesaler(reorder.suggestions())
+        self.assertEqual([name for name, rows in groups], ["پخش البرز", reorder.NO_WHOLESALER])
+        self.assertEqual(groups[0][1][0]["suggested"], 8)
+        self.assertEqual(groups[1][1][0]["suggested"], 40)
+
+    def test_command_compares_every_row(self):
+        # The command does not trust the flag: a row edited behind the app's back is still reported.
+        Inventory.objects.filter(product=self.pen).update(quantity=1)
+        out = io.StringIO()
+        call_command("reorder_report", stdout=out)
+        self.assertIn("خودکار: 1", out.getvalue())
+        self.assertNotIn("کاغذ", out.getvalue())
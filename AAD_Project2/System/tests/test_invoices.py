@@ -0,0 +1,98 @@
+"""Tests for the purchase invoice and its cache."""
+
+import os
+import tempfile
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import invoices
+from ..cache import FileBackend, LocMemBackend, reset_caches
+from ..checkout import place_order
+from ..models import Credit, CustomUser, SpecialCustomer
+from .helpers import QueryCountMixin, make_product
+
+
+class PurchaseInvoiceTest(QueryCountMixin, TestCase):
+    """Tests for the prefetched invoice page."""
+
+    def setUp(self):
+        self.client.force_login(CustomUser.objects.create_user(username="till1", password="x"))
+
+    def invoice_url(self, lines):
+        products = [make_product(f"کالا {lines}-{i}", "2.50") for i in range(lines)]
+        purchase = place_order([(p.pk, 2) for p in products])
+        return reverse("system:purchase_invoice", args=[purchase.pk])
+
+    def test_query_count_does_not_grow_with_lines(self):
+        self.assertQueryCountFlat(self.invoice_url)
+
+    def test_totals_come_from_the_database(self):
+        response = self.client.get(self.invoice_url(3))
+        self.assertEqual(response.context["purchase"].items_total, Decimal("15.00"))
+        self.assertEqual([item.line_total for item in response.context["purchase"].items.all()], [Decimal("5.00")] * 3)
+
+
+class CacheBackendTest(SimpleTestCase):
+    """Tests for the LRU cache backends."""
+
+    def check_lru(self, cache):
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)  # "a" is now the most recent
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), (1, 3))
+        self.assertEqual(cache.evictions.value, 1)
+
+    def test_locmem_lru(self):
+        self.check_lru(LocMemBackend("test_locmem", max_entries=2))
+
+    def test_file_lru(self):
+        with tempfile.TemporaryDirectory() as location:
+            cache = FileBackend("test_file", location=location, max_entries=2)
+            cache.set("a", 1)
+            cache.set("b", 2)
+            os.utime(cache._path("a"), ns=(0, 0))
+            os.utime(cache._path("b"), ns=(1, 1))
+            cache.set("c", 3)
+            self.assertIsNone(cache.get("a"))
+            self.assertEqual((cache.get("b"), cache.get("c")), (2, 3))
+
+    def test_timeout(self):
+        cache = LocMemBackend("test_timeout", timeout=60)
+        cache.set("a", 1)
+        with mock.patch("System.cache.time.time", return_value=time.time() + 61):
+            self.assertIsNone(cache.get("a"))
+
+
+class InvoiceCacheTest(TestCase):
+    """Tests for the cached invoice fragment and its invalidation."""
+
+    def setUp(self):
+        reset_caches()
+        self.client.force_login(CustomUser.objects.create_user(username="till1", password="x"))
+        self.pen = make_product("خودکار", "5.00")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.purchase = place_order([(self.pen.pk, 2)])
+        self.url = reverse("system:purchase_invoice", args=[self.purchase.pk])
+
+    def test_second_view_is_served_from_cache(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertContains(response, "خودکار")
+        self.assertFalse(any("System_purchaseitem" in q["sql"] for q in ctx.captured_queries))
+
+    def test_paying_credit_invalidates(self):
+        self.client.get(self.url)
+        customer = SpecialCustomer.objects.create(
+            first_name="علی", last_name="رضایی", birth_date="1990-01-01", gender="M", phone_number=1, address="-")
+        with self.captureOnCommitCallbacks(execute=True):
+            Credit.objects.create(customer=customer, total_debt=10, purchase=self.purchase)
+        self.assertIsNone(invoices.cached_body(self.purchase.pk))
@@ -0,0 +1,77 @@
+"""Tests for the special customers' credit ledger."""
+
+import datetime
+import io
+import uuid
+from decimal import Decimal
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from .. import ledger
+from ..checkout import place_order
+from ..models import Credit, CreditEntry, CustomerPurchase, SpecialCustomer
+from .helpers import make_product
+
+
+class LedgerTest(TestCase):
+    """Tests for the credit ledger and running balances."""
+
+    def setUp(self):
+        self.pen = make_product("خودکار", "5.00", stock=20)
+        self.customer = SpecialCustomer.objects.create(
+            first_name="علی", last_name="رضایی", birth_date="1990-01-01", gender="M", phone_number=1, address="-")
+
+    def balance(self):
+        return SpecialCustomer.objects.get(pk=self.customer.pk).balance
+
+    def test_partial_payments_settle_oldest_credits(self):
+        first = ledger.charge(self.customer.pk, place_order([(self.pen.pk, 2)]))
+        second = ledger.charge(self.customer.pk, place_order([(self.pen.pk, 4)]))
+        ledger.pay(self.customer.pk, "6.00")
+        self.assertEqual(self.balance(), Decimal("24.00"))
+        self.assertEqual(Credit.objects.filter(is_paid=True).count(), 0)
+        ledger.pay(self.customer.pk, "4.00")
+        self.assertEqual(self.balance(), Decimal("20.00"))
+        self.assertEqual(list(Credit.objects.filter(is_paid=True).values_list("pk", flat=True)), [first.pk])
+        ledger.pay(self.customer.pk, "20.00")
+        self.assertTrue(Credit.objects.get(pk=second.pk).is_paid)
+        self.assertEqual(CreditEntry.objects.filter(customer=self.customer).count(), 5)
+        with self.assertRaises(ledger.LedgerError):
+            ledger.pay(self.customer.pk, 0)
+
+    def test_settles_by_purchase_date_not_key_order(self):
+        # Credits from before the ordered-key migration have random uuid4
+        # keys; here the older credit has the larger key.
+        older, newer = place_order([(self.pen.pk, 2)]), place_order([(self.pen.pk, 2)])
+        CustomerPurchase.objects.filter(pk=older.pk).update(purchase_date=timezone.now() - datetime.timedelta(days=3))
+        for purchase, key in ((older, "ffffffff-0000-4000-8000-000000000000"),
+                              (newer, "00000000-0000-4000-8000-000000000000")):
+            credit = Credit.objects.create(credit_id=uuid.UUID(key), customer=self.customer, total_debt=10,
+                                           purchase=purchase)
+            CreditEntry.objects.create(customer=self.customer, kind=CreditEntry.CHARGE, amount=10, credit=credit)
+        SpecialCustomer.objects.filter(pk=self.customer.pk).update(balance=20)
+        ledger.pay(self.customer.pk, 10)
+        self.assertEqual(list(Credit.objects.filter(is_paid=True).values_list("purchase_id", flat=True)), [older.pk])
+
+    def test_top_debtors_is_one_query(self):
+        other = SpecialCustomer.objects.create(
+            first_name="سارا", last_name="احمدی", birth_date="1990-01-01", gender="F", phone_number=2, address="-")
+        ledger.charge(self.customer.pk, place_order([(self.pen.pk, 1)]))
+        ledger.charge(other.pk, place_order([(self.pen.pk, 3)]))
+        with self.assertNumQueries(1):
+            debtors = ledger.top_debtors(5)
+        self.assertEqual([(d["person_id"], d["balance"]) for d in debtors],
+                         [(other.pk, Decimal("15.00")), (self.customer.pk, Decimal("5.00"))])
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        ledger.charge(self.customer.pk, place_order([(self.pen.pk, 2)]))
+        SpecialCustomer.objects.filter(pk=self.customer.pk).update(balance=Decimal("99.00"))
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command("reconcile_credit_balances", "--batch-size=1", stdout=out)
+        self.assertRegex(out.getvalue(), r"balance 99.00, ledger 10(\.00)?\n")
+        call_command("reconcile_credit_balances", "--fix", stdout=io.StringIO())
+        self.assertEqual(self.balance(), Decimal("10.00"))
+        self.assertEqual(list(ledger.reconcile()), [])
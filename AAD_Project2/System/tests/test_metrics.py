@@ -0,0 +1,63 @@
+"""Tests for the request metrics."""
+
+import asyncio
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import instrumentation, pool
+from ..checkout import place_order
+from ..models import CustomUser
+from .helpers import make_product
+
+
+class RequestMetricsTest(TestCase):
+    """Tests for the per-view request metrics and the metrics endpoint."""
+
+    histograms = ("request_seconds", "request_db_seconds", "request_queries", "request_template_seconds")
+
+    def setUp(self):
+        for name in self.histograms:
+            getattr(instrumentation, name).reset()
+        self.client.force_login(CustomUser.objects.create_user(username="till1", password="x"))
+        self.pen = make_product("خودکار", "5.00", stock=10)
+
+    def series(self, histogram, view):
+        return histogram.series()[(("view", view),)]
+
+    def test_queries_and_render_time_are_recorded_per_view(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            purchase = place_order([(self.pen.pk, 2)])
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("system:purchase_invoice", args=[purchase.pk]))
+        queries = len(ctx.captured_queries)
+        self.client.get("/system/no-such-page/")
+        counts, total = self.series(instrumentation.request_queries, "system:purchase_invoice")
+        self.assertEqual((counts[-1], total), (1, queries))
+        self.assertGreater(self.series(instrumentation.request_template_seconds, "system:purchase_invoice")[1], 0)
+        self.assertEqual(self.series(instrumentation.request_seconds, instrumentation.UNRESOLVED)[0][-1], 1)
+
+    def test_pool_threads_count_towards_the_request(self):
+        record = instrumentation._Record()
+        token = instrumentation._current.set(record)
+        try:
+            self.assertIs(asyncio.run(pool.run(instrumentation._current.get)), record)
+        finally:
+            instrumentation._current.reset(token)
+            pool.shutdown()
+
+    @override_settings(METRICS_SLOW_REQUEST_QUERIES=1, METRICS_SLOW_REQUEST_SECONDS=None)
+    def test_slow_requests_are_logged(self):
+        with self.assertLogs("System.instrumentation", "WARNING") as logs:
+            self.client.get(reverse("system:product_detail", args=[self.pen.pk]))
+        self.assertIn("(system:product_detail) -> 200", logs.output[0])
+
+    def test_endpoint_serves_prometheus_text_to_local_clients_only(self):
+        self.client.get(reverse("system:product_detail", args=[self.pen.pk]))
+        body = self.client.get(reverse("system:metrics")).content.decode()
+        self.assertIn('http_request_queries_bucket{view="system:product_detail",le="+Inf"} 1', body)
+        self.assertIn("# TYPE inventory_retries_total counter", body)
+        self.assertIn("cache_catalogue_hits_total", body)
+        self.assertEqual(self.client.get(reverse("system:metrics"), REMOTE_ADDR="10.0.0.7").status_code, 404)
@@ -0,0 +1,164 @@
+"""Tests for the sales summary, dashboard and payables aging."""
+
+import datetime
+import io
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import aging, dashboard, sales_summary
+from ..cache import reset_caches
+from ..checkout import place_order
+from ..models import Attendance, Creditor, CustomUser, DailySalesSummary, Debt, Employee, EmployeeProfile, Inventory
+from .helpers import make_product
+
+
+class DailySalesSummaryTest(TestCase):
+    """Tests for the incrementally maintained sales summary."""
+
+    def setUp(self):
+        self.pen = make_product("خودکار", "5.00", stock=50)
+        self.paper = make_product("کاغذ A4", "20.00", stock=50, product_type="PAPER")
+        self.today = timezone.localdate()
+
+    def sell(self, lines):
+        with self.captureOnCommitCallbacks(execute=True):
+            return place_order(lines)
+
+    def test_checkout_updates_summary_on_commit(self):
+        self.sell([(self.pen.pk, 2), (self.paper.pk, 1)])
+        self.sell([(self.pen.pk, 3)])
+        self.assertEqual(sales_summary.sales_by_day(self.today, self.today),
+                         [{"date": self.today, "quantity": 6, "revenue": Decimal("45.00")}])
+        by_type = {row["product_type"]: row["revenue"] for row in sales_summary.sales_by_type(self.today, self.today)}
+        self.assertEqual(by_type, {"WRITING": Decimal("25.00"), "PAPER": Decimal("20.00")})
+        self.assertEqual(sales_summary.sales_by_product(self.today, self.today, limit=1)[0]["product__name"], "خودکار")
+
+    def test_sale_adds_its_delta_without_reading_the_day(self):
+        first = self.sell([(self.pen.pk, 2)])
+        row = DailySalesSummary.objects.get()
+        for _ in range(5):
+            self.sell([(self.pen.pk, 1)])
+        with CaptureQueriesContext(connection) as ctx:
+            self.sell([(self.pen.pk, 3), (self.paper.pk, 1)])
+        self.assertEqual(DailySalesSummary.objects.get(pk=row.pk).quantity, 10)
+        self.assertEqual(DailySalesSummary.objects.get(product=self.paper).revenue, Decimal("20.00"))
+        summary = [q["sql"] for q in ctx.captured_queries if "System_dailysalessummary" in q["sql"]]
+        self.assertEqual([sql.split()[0] for sql in summary], ["SELECT", "INSERT", "UPDATE"])
+        self.assertFalse([sql for sql in summary if "FOR UPDATE" in sql])
+        self.assertIn('"quantity" + ', summary[-1])
+        # The full recomputation repairs the summary, e.g. after a purchase is deleted.
+        first.delete()
+        sales_summary.refresh(self.today, self.today)
+        self.assertEqual(DailySalesSummary.objects.get(product=self.pen).quantity, 8)
+
+    def test_rebuild_matches_incremental(self):
+        self.sell([(self.pen.pk, 2), (self.paper.pk, 1)])
+        incremental = sorted(DailySalesSummary.objects.values_list("product_id", "quantity", "revenue"))
+        DailySalesSummary.objects.all().delete()
+        call_command("rebuild_sales_summary", stdout=io.StringIO())
+        self.assertEqual(sorted(DailySalesSummary.objects.values_list("product_id", "quantity", "revenue")), incremental)
+
+
+class DashboardTest(TestCase):
+    """Tests for the cached dashboards."""
+
+    def setUp(self):
+        reset_caches()
+        self.manager = CustomUser.objects.create_user(username="boss", password="x", position="storemanager")
+        self.pen = make_product("خودکار", "5.00", stock=3)
+        Inventory.objects.filter(product=self.pen).update(reorder_threshold=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order([(self.pen.pk, 2)])
+        creditor = Creditor.objects.create(name="چاپخانه", creditor_type="SHOP", phone_number="1", address="-")
+        Debt.objects.create(creditor=creditor, amount=Decimal("70.00"), due_date=timezone.localdate() - datetime.timedelta(days=3))
+        Debt.objects.create(creditor=creditor, amount=Decimal("30.00"), due_date=timezone.localdate() + datetime.timedelta(days=3))
+
+    def test_login_redirects_to_dashboard(self):
+        response = self.client.post(reverse("system:login"), {"username": "boss", "password": "x"})
+        self.assertRedirects(response, reverse("system:storemanager_dashboard"))
+
+    def test_manager_dashboard_is_served_from_cache(self):
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse("system:storemanager_dashboard"))
+        self.assertEqual(response.context["floor"]["revenue"], Decimal("10.00"))
+        self.assertEqual(response.context["floor"]["low_stock"][0]["quantity"], 1)
+        self.assertEqual(response.context["office"]["overdue_debt"], Decimal("70.00"))
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("system:storemanager_dashboard"))
+        tables = ("dailysalessummary", "inventory", "credit", "debt", "attendance")
+        self.assertFalse([q for q in ctx.captured_queries if any(f"System_{t}" in q["sql"] for t in tables)])
+
+    def test_stale_snapshot_is_served_while_refreshing(self):
+        self.client.force_login(self.manager)
+        self.client.get(reverse("system:storemanager_dashboard"))
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order([(self.pen.pk, 1)])
+        with override_settings(DASHBOARD_CACHE_TTL=-1), \
+                mock.patch.object(dashboard, "run_in_background", side_effect=lambda func: func()) as background:
+            stale = self.client.get(reverse("system:storemanager_dashboard"))
+        background.assert_called()
+        self.assertEqual(stale.context["floor"]["revenue"], Decimal("10.00"))
+        self.assertEqual(dashboard.panels("floor")["revenue"], Decimal("15.00"))
+
+    def test_employee_dashboard_shows_own_attendance(self):
+        user = CustomUser.objects.create_user(username="till1", password="x")
+        employee = Employee.objects.create(first_name="سارا", last_name="احمدی", birth_date="1995-01-01", gender="F",
+                                           phone_number=1, job="SELLER")
+        EmployeeProfile.objects.create(user=user, employee=employee)
+        Attendance.objects.create(employee=employee, status="LATE")
+        self.client.force_login(user)
+        response = self.client.get(reverse("system:employee_dashboard"))
+        self.assertContains(response, "دیرکرد")
+        self.assertEqual(response.context["floor"]["items_sold"], 2)
+
+
+class AgingReportTest(TestCase):
+    """Tests for the payables aging report."""
+
+    def setUp(self):
+        reset_caches()
+        self.today = timezone.localdate()
+        self.printer = Creditor.objects.create(name="چاپخانه", creditor_type="SHOP", phone_number="1", address="-")
+        self.bank = Creditor.objects.create(name="بانک", creditor_type="COMPANY", phone_number="2", address="-")
+        for creditor, days, amount in ((self.printer, -5, "10.00"), (self.printer, 30, "20.00"),
+                                       (self.printer, 31, "30.00"), (self.printer, 91, "40.00"),
+                                       (self.bank, 75, "50.00")):
+            Debt.objects.create(creditor=creditor, amount=Decimal(amount),
+                                due_date=self.today - datetime.timedelta(days=days))
+        Debt.objects.create(creditor=self.bank, amount=Decimal("999.00"), due_date=self.today, is_paid=True)
+
+    def test_buckets_per_creditor_and_type_in_one_query(self):
+        with self.assertNumQueries(1):
+            data = aging.report()
+        printer, = [row for row in data["creditors"] if row["creditor_id"] == self.printer.pk]
+        self.assertEqual([printer[key] for key in aging.BUCKET_KEYS], [30, 30, 0, 40])
+        self.assertEqual(printer["total"], Decimal("100.00"))
+        self.assertEqual({row["creditor_type"]: row["days_61_90"] for row in data["by_type"]}, {"COMPANY": 50, "SHOP": 0})
+        self.assertEqual(data["totals"]["total"], Decimal("150.00"))
+        with self.assertNumQueries(0):
+            aging.report()
+
+    def test_paying_a_debt_drops_the_cached_report(self):
+        aging.report()
+        with self.captureOnCommitCallbacks(execute=True):
+            Debt.objects.filter(creditor=self.bank).update(is_paid=True)
+            Debt.objects.get(creditor=self.printer, amount=Decimal("40.00")).delete()
+        self.assertEqual(aging.report()["totals"]["total"], Decimal("60.00"))
+
+    def test_csv_and_json_output(self):
+        self.client.force_login(CustomUser.objects.create_user(username="boss", password="x", position="storemanager"))
+        url = reverse("system:aging_report")
+        response = self.client.get(url, {"format": "csv"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], ",".join(aging.CSV_HEADER))
+        self.assertEqual(len(lines), 3)
+        data = self.client.get(url, {"as_of": str(self.today + datetime.timedelta(days=30))}).json()
+        self.assertEqual(Decimal(data["totals"]["days_90_plus"]), Decimal("90.00"))
+        self.assertEqual(self.client.get(url, {"as_of": "yesterday"}).status_code, 400)
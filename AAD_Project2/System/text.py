@@ -0,0 +1,28 @@
+# System/text.py
+"""Normalisation of what cashiers type or scan."""
+
+import re
+
+# Persian and Arabic-Indic digits, as sent by a scanner on a Persian keyboard layout.
+_NATIVE_DIGITS, _ASCII_DIGITS = "۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789"
+DIGITS = str.maketrans(_NATIVE_DIGITS, _ASCII_DIGITS)
+
+# Arabic letter forms folded onto their Persian equivalents; ZWNJ, tatweel
+# and short-vowel marks are dropped.
+SEARCH_FOLD = str.maketrans({
+    **dict(zip(_NATIVE_DIGITS, _ASCII_DIGITS)),
+    "ي": "ی", "ى": "ی", "ئ": "ی", "ك": "ک", "ة": "ه", "أ": "ا", "إ": "ا", "ٱ": "ا", "ؤ": "و",
+    "\u200c": None, "\u200f": None, "\u0640": None,
+    **{chr(c): None for c in range(0x064B, 0x0653)},
+})
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_code(value):
+    """A SKU/barcode in its stored form: ASCII digits, no surrounding space, upper case."""
+    return (value or "").translate(DIGITS).strip().upper()
+
+
+def normalize_search(value):
+    """``value`` as stored in ``Product.search_name`` and as matched against it."""
+    return _SPACES.sub(" ", (value or "").translate(SEARCH_FOLD)).strip().lower()
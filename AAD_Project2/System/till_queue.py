@@ -0,0 +1,203 @@
+# System/till_queue.py
+"""
+Local, durable queue of sales taken while the main database is unreachable.
+
+Each till server keeps a small SQLite journal (``TILL_QUEUE_PATH``). When a
+checkout fails because the database cannot be reached, the basket is priced
+from the catalogue cache (``price``) and appended to the journal with its unit
+prices, total, idempotency key and sale time, and the cashier gets a "queued"
+receipt. ``replay`` (``manage.py sync_till_queue``) later feeds the journal,
+oldest first and in batches, through the same ``checkout.checkout`` the till
+uses, at the prices the customer paid. The key makes a replay that is
+interrupted and run again harmless. Sales whose stock ran out in the meantime,
+whose codes are unknown, or whose recorded total differs from the one charged
+are marked as conflicts for a manager to settle.
+
+The till reaches this module without the database only because its session
+and user do not need it either (see ``System.auth``).
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import catalogue, checkout
+from .inventory import StockError, error_codes
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+PENDING, SYNCED, CONFLICT = "pending", "synced", "conflict"
+
+# ODBC login and connection timeouts; every SQLSTATE of class 08 counts too.
+UNREACHABLE_SQLSTATES = frozenset({"HYT00", "HYT01"})
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sales (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    lines TEXT NOT NULL,
+    total TEXT,
+    sold_at TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    purchase_id TEXT,
+    error TEXT,
+    synced_at TEXT
+);
+CREATE INDEX IF NOT EXISTS sales_status_seq ON sales (status, seq);
+"""
+
+_lock = threading.Lock()
+
+
+class UnpricedCodes(Exception):
+    """Codes that cannot be priced without the main database; ``codes`` lists them."""
+
+    def __init__(self, codes):
+        super().__init__("قیمت این کالاها بدون اتصال به سرور در دسترس نیست: " + "، ".join(codes))
+        self.codes = codes
+
+
+def enabled():
+    return getattr(settings, "TILL_QUEUE_ENABLED", True)
+
+
+def database_unavailable(exc):
+    """
+    Whether ``exc`` means the main database could not be reached: SQLSTATE
+    class 08 (connection exception) or an ODBC timeout. Anything else, a
+    deadlock or a bad query included, is not an outage.
+    """
+    if not isinstance(exc, (OperationalError, InterfaceError)):
+        return False
+    sqlstate = error_codes(exc)[0]
+    return bool(sqlstate) and (sqlstate.startswith("08") or sqlstate in UNREACHABLE_SQLSTATES)
+
+
+def _connect():
+    db = sqlite3.connect(settings.TILL_QUEUE_PATH, timeout=10, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=FULL")
+    db.executescript(_SCHEMA)
+    if "total" not in {column[1] for column in db.execute("PRAGMA table_info(sales)")}:
+        # Journals written before sales were priced when queued.
+        db.execute("ALTER TABLE sales ADD COLUMN total TEXT")
+    return db
+
+
+def _total(lines):
+    return sum((Decimal(unit_price) * quantity for _, quantity, unit_price in lines), Decimal(0))
+
+
+def price(lines):
+    """
+    Price ``lines`` of ``(code, quantity)`` from the catalogue cache alone.
+    Returns ``(priced, total)``, ``priced`` being ``(code, quantity,
+    unit_price)`` triples; raises ``UnpricedCodes`` if a code is not cached.
+    """
+    lines = [(str(code), quantity) for code, quantity in lines]
+    products = catalogue.cached({code for code, _ in lines})
+    unpriced = list(dict.fromkeys(code for code, _ in lines if code not in products))
+    if unpriced:
+        raise UnpricedCodes(unpriced)
+    priced = [(code, quantity, products[code].price) for code, quantity in lines]
+    return priced, _total(priced)
+
+
+def enqueue(lines, key=None):
+    """
+    Append a sale of ``lines`` (``(code, quantity, unit_price)`` triples, see
+    ``price``) and its total to the journal and return its sequence number.
+    A key already in the journal is not added twice.
+    """
+    key = key or uuid.uuid4().hex
+    lines = [[str(code), quantity, str(unit_price)] for code, quantity, unit_price in lines]
+    with _lock:
+        db = _connect()
+        try:
+            db.execute(
+                "INSERT OR IGNORE INTO sales (key, lines, total, sold_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(lines), str(_total(lines)), timezone.now().isoformat()),
+            )
+            return db.execute("SELECT seq FROM sales WHERE key = ?", (key,)).fetchone()[0]
+        finally:
+            db.close()
+
+
+def replay(batch_size=50):
+    """
+    Sell up to ``batch_size`` pending sales, oldest first. Returns
+    ``{"synced": n, "conflicts": n, "left": n}``; stops early, leaving the rest
+    pending, if the main database is still unreachable. Each sale is recorded
+    at the unit prices it was queued with, and is a conflict if its lines do
+    not add up to the total charged or the recorded purchase's total differs.
+    """
+    with _lock:
+        db = _connect()
+        try:
+            pending = db.execute(
+                "SELECT seq, key, lines, total, sold_at FROM sales WHERE status = ? ORDER BY seq LIMIT ?",
+                (PENDING, batch_size),
+            ).fetchall()
+            results = []
+            for seq, key, lines, total, sold_at in pending:
+                lines, prices = json.loads(lines), None
+                if total is not None:
+                    total = Decimal(total)
+                    if _total(lines) != total:
+                        results.append((CONFLICT, None, f"جمع اقلام صف با مبلغ دریافت‌شده ({total}) نمی‌خواند.", seq))
+                        continue
+                    prices = {code: Decimal(unit_price) for code, _, unit_price in lines}
+                try:
+                    purchase = checkout.checkout(
+                        [(code, quantity) for code, quantity, *_ in lines], key=key,
+                        sold_at=parse_datetime(sold_at), prices=prices)
+                except (StockError, Product.DoesNotExist) as e:
+                    results.append((CONFLICT, None, str(e), seq))
+                except (OperationalError, InterfaceError) as e:
+                    if database_unavailable(e):
+                        logger.warning("Main database still unreachable; %d queued sales left", len(pending))
+                        break
+                    raise
+                else:
+                    if total is not None and purchase.total_amount != total:
+                        # e.g. the key was already sold online at other prices
+                        results.append((CONFLICT, str(purchase.pk),
+                                        f"مبلغ فروش ثبت‌شده ({purchase.total_amount}) با مبلغ دریافت‌شده ({total}) فرق دارد.",
+                                        seq))
+                    else:
+                        results.append((SYNCED, str(purchase.pk), None, seq))
+            now = timezone.now().isoformat()
+            db.execute("BEGIN")
+            db.executemany(
+                "UPDATE sales SET status = ?, purchase_id = ?, error = ?, synced_at = ? WHERE seq = ?",
+                [(status, purchase_id, error, now, seq) for status, purchase_id, error, seq in results],
+            )
+            db.execute("COMMIT")
+            left = db.execute("SELECT COUNT(*) FROM sales WHERE status = ?", (PENDING,)).fetchone()[0]
+        finally:
+            db.close()
+    return {
+        "synced": sum(1 for r in results if r[0] == SYNCED),
+        "conflicts": sum(1 for r in results if r[0] == CONFLICT),
+        "left": left,
+    }
+
+
+def conflicts():
+    """Queued sales that could not be sold on replay, as dicts, oldest first."""
+    db = _connect()
+    try:
+        db.row_factory = sqlite3.Row
+        return [dict(row) for row in db.execute(
+            "SELECT seq, key, lines, total, sold_at, purchase_id, error, synced_at FROM sales WHERE status = ? ORDER BY seq", (CONFLICT,))]
+    finally:
+        db.close()
@@ -1,11 +1,25 @@
 from django.urls import path , re_path
 from django.urls.resolvers import URLPattern 
-from .views import CustomLoginView , ProductDetailView , MultiPurchaseCreateView , PurchaseInvoiceView
+from .views import CustomLoginView , ProductDetailView , MultiPurchaseCreateView , PurchaseInvoiceView , InventoryListView , ExportView , WholesaleImportView , StoreManagerDashboardView , EmployeeDashboardView , ReorderListView , ProductLookupView , ProductSearchView , CheckoutAPIView , AgingReportView , AttendanceClockView , TimesheetView , AttendanceApprovalView , MetricsView
 app_name='system'
 
 urlpatterns = [
     path("login/", CustomLoginView.as_view(), name="login"),
+    path("dashboard/manager/", StoreManagerDashboardView.as_view(), name="storemanager_dashboard"),
+    path("dashboard/", EmployeeDashboardView.as_view(), name="employee_dashboard"),
+    path("product/lookup/", ProductLookupView.as_view(), name="product_lookup"),
+    path("product/search/", ProductSearchView.as_view(), name="product_search"),
     path("product/<uuid:pk>/", ProductDetailView.as_view(), name="product_detail"), 
+    path("inventory/", InventoryListView.as_view(), name="inventory_list"),
+    path("inventory/reorder/", ReorderListView.as_view(), name="reorder_list"),
     path("purchase/multi/", MultiPurchaseCreateView.as_view(), name="multi_purchase_create"), 
+    path("api/checkout/", CheckoutAPIView.as_view(), name="checkout_api"),
     path("purchase/invoice/<uuid:pk>/", PurchaseInvoiceView.as_view(), name="purchase_invoice"),
+    path("export/<slug:kind>/", ExportView.as_view(), name="export"),
+    path("wholesale/import/", WholesaleImportView.as_view(), name="wholesale_import"),
+    path("report/aging/", AgingReportView.as_view(), name="aging_report"),
+    path("attendance/approvals/", AttendanceApprovalView.as_view(), name="attendance_approvals"),
+    path("attendance/clock/", AttendanceClockView.as_view(), name="attendance_clock"),
+    path("attendance/timesheet/<int:year>/<int:month>/", TimesheetView.as_view(), name="timesheet"),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
     ]
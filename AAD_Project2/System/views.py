@@ -1,14 +1,35 @@
-﻿from django.shortcuts import render, redirect, get_object_or_404
+﻿import datetime
+import json
+import uuid
+from django.shortcuts import render, redirect
 from django.contrib.auth.views import LoginView
-from django.contrib.auth.mixins import LoginRequiredMixin 
+from django.contrib.auth.mixins import LoginRequiredMixin , UserPassesTestMixin
 from django.views.generic.detail import DetailView 
-from django.urls import reverse_lazy
-from .models import CustomUser , Product ,Inventory, CustomerPurchase, PurchaseItem
-from .forms import PurchaseItemFormSet 
+from django.views.generic.list import ListView
+from django.views.generic.base import TemplateView
+from django.urls import reverse, reverse_lazy
+from .models import CustomUser , Product ,Inventory, CustomerPurchase, PurchaseItem, Attendance
+from .forms import AttendanceReviewForm, PurchaseItemFormSet , WholesaleImportForm
+from .checkout import CheckoutError, UnknownProducts, checkout, valid_key
+from .inventory import InsufficientStock
+from . import aging, attendance, catalogue, dashboard, exports, invoices, metrics, pool, reorder, search, till_queue
+from .imports import ImportFailed, import_delivery, read_rows
+from .pagination import keyset_page
+from django.conf import settings
 from django.contrib import messages
-from django.db import transaction 
+from django.db import InterfaceError, OperationalError
+from django.db.models import DecimalField, ExpressionWrapper, F, Prefetch, Sum
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.views import View 
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 
+class StoreManagerRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
+    login_url = reverse_lazy("login")
+
+    def test_func(self):
+        user = self.request.user
+        return user.is_superuser or user.position == "storemanager"
 class CustomLoginView(LoginView):
     template_name = "login.html"   # قالب صفحه ورود
     redirect_authenticated_user = True
@@ -17,28 +38,121 @@ class CustomLoginView(LoginView):
         user = self.request.user
         # بررسی نقش کاربر
         if user.position == "storemanager":
-            return reverse_lazy("storemanager_dashboard")  # صفحه مدیر فروشگاه
+            return reverse_lazy("system:storemanager_dashboard")  # صفحه مدیر فروشگاه
         else:
-            return reverse_lazy("employee_dashboard")      # صفحه کارمند
+            return reverse_lazy("system:employee_dashboard")      # صفحه کارمند
+class StoreManagerDashboardView(StoreManagerRequiredMixin, TemplateView):
+    template_name = "storemanager_dashboard.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # همه اعداد از کش خوانده می‌شوند و در پس‌زمینه تازه می‌شوند
+        context["floor"] = dashboard.panels("floor")
+        context["office"] = dashboard.panels("office")
+        return context
+class EmployeeDashboardView(LoginRequiredMixin, TemplateView):
+    template_name = "employee_dashboard.html"
+    login_url = reverse_lazy("login")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["floor"] = dashboard.panels("floor")
+        # حضور امروز همین کارمند؛ یک کوئری روی ایندکس (employee, date)
+        context["attendance"] = (
+            Attendance.objects.filter(employee__profile__user=self.request.user, date=timezone.localdate())
+            .order_by().first()
+        )
+        return context
 class ProductDetailView(LoginRequiredMixin, DetailView):
     model = Product
     template_name = "product_detail.html"
     context_object_name = "product"
     login_url = reverse_lazy("login") # مسیر صفحه لاگین در صورت عدم ورود
+
+    def get_object(self, queryset=None):
+        # کالا از کش کاتالوگ خوانده می‌شود
+        try:
+            return catalogue.get(self.kwargs["pk"])
+        except Product.DoesNotExist:
+            raise Http404("کالا یافت نشد.")
+class ProductLookupView(LoginRequiredMixin, View):
+    login_url = reverse_lazy("login")
+    max_codes = 100
+
+    def get(self, request):
+        # ?code=...&code=... : چند بارکد اسکن‌شده با یک درخواست و یک کوئری
+        codes = request.GET.getlist("code")
+        if not codes or len(codes) > self.max_codes:
+            return HttpResponseBadRequest(f"Send 1 to {self.max_codes} 'code' parameters.")
+        products = catalogue.resolve_codes(codes)
+        return JsonResponse({
+            "products": {
+                code: {"product_id": p.pk, "sku": p.sku, "name": p.name, "price": p.price}
+                for code, p in products.items()
+            },
+            "unknown": [code for code in codes if code not in products],
+        })
+class ProductSearchView(LoginRequiredMixin, View):
+    login_url = reverse_lazy("login")
+
+    def get(self, request):
+        # ?q=پیشوند نام&type=نوع کالا&limit=تعداد
+        product_type = request.GET.get("type") or None
+        if product_type and product_type not in dict(Product.PRODUCT_TYPE_CHOICES):
+            return HttpResponseBadRequest(f"Unknown product type '{product_type}'.")
+        try:
+            limit = int(request.GET.get("limit", search.DEFAULT_LIMIT))
+        except ValueError:
+            return HttpResponseBadRequest("limit must be a number.")
+        return JsonResponse({"results": search.search(request.GET.get("q", ""), product_type, limit)})
+class InventoryListView(LoginRequiredMixin, ListView):
+    template_name = "inventory_list.html"
+    context_object_name = "inventories"
+    login_url = reverse_lazy("login")
+    ordering = ("-updated_at", "-inventory_id")
+
+    def get_queryset(self):
+        queryset = Inventory.objects.select_related("product").annotate(
+            stock_value=ExpressionWrapper(F("quantity") * F("product__price"), output_field=DecimalField(max_digits=14, decimal_places=2)),
+        )
+        rows, self.next_cursor = keyset_page(
+            queryset, self.ordering, self.request.GET.get("cursor"),
+            page_size=getattr(settings, "INVENTORY_PAGE_SIZE", 50),
+        )
+        return rows
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["next_cursor"] = self.next_cursor
+        return context
+class ReorderListView(StoreManagerRequiredMixin, TemplateView):
+    template_name = "reorder_list.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["groups"] = reorder.by_wholesaler(reorder.suggestions())
+        return context
 class MultiPurchaseCreateView(LoginRequiredMixin, View):
     template_name = "multi_purchase_create.html"
     login_url = reverse_lazy("login")
 
     def get(self, request):
         formset = PurchaseItemFormSet()
-        return render(request, self.template_name, {"formset": formset})
+        return self.render_form(formset, uuid.uuid4().hex)
+
+    def render_form(self, formset, key):
+        # کلید یکتای این فرم؛ ارسال دوباره همان فرم خرید دوم نمی‌سازد
+        return render(self.request, self.template_name, {"formset": formset, "idempotency_key": key})
 
     def post(self, request):
         formset = PurchaseItemFormSet(request.POST)
+        key = request.POST.get("idempotency_key")
+        if not valid_key(key):
+            key = uuid.uuid4().hex
 
         if not formset.is_valid():
             messages.error(request, "ورودی‌ها معتبر نیستند.")
-            return render(request, self.template_name, {"formset": formset})
+            return self.render_form(formset, key)
 
         # Filter out entirely empty forms (when user added extra rows but left them blank)
         cleaned_forms = [
@@ -47,52 +161,300 @@ class MultiPurchaseCreateView(LoginRequiredMixin, View):
         ]
         if not cleaned_forms:
             messages.error(request, "حداقل یک کالا باید وارد شود.")
-            return render(request, self.template_name, {"formset": formset})
+            return self.render_form(formset, key)
 
+        lines = [(f.cleaned_data["product_id"], f.cleaned_data["quantity"]) for f in cleaned_forms]
         try:
-            with transaction.atomic():
-                purchase = CustomerPurchase.objects.create(total_amount=0)
-                total = 0
-
-                # First pass: validate inventory for all items
-                for f in cleaned_forms:
-                    product = get_object_or_404(Product, product_id=f.cleaned_data["product_id"])
-                    quantity = f.cleaned_data["quantity"]
-
-                    inv = Inventory.objects.select_for_update().get(product=product)
-                    if inv.quantity < quantity:
-                        raise ValueError(f"موجودی کافی برای «{product.name}» وجود ندارد.")
-
-                # Second pass: create items and decrement inventory
-                for f in cleaned_forms:
-                    product = get_object_or_404(Product, product_id=f.cleaned_data["product_id"])
-                    quantity = f.cleaned_data["quantity"]
-                    inv = Inventory.objects.select_for_update().get(product=product)
-
-                    PurchaseItem.objects.create(
-                        purchase=purchase,
-                        product=product,
-                        quantity=quantity,
-                        price=product.price,
-                    )
-                    inv.quantity -= quantity
-                    inv.save()
-                    total += product.price * quantity
-
-                purchase.total_amount = total
-                purchase.save()
+            purchase = checkout(lines, key=key)
+        except UnknownProducts as e:
+            for form in cleaned_forms:
+                if form.cleaned_data["product_id"] in e.codes:
+                    form.add_error("product_id", "کالایی با این کد یافت نشد.")
+            return self.render_form(formset, key)
+        except Product.DoesNotExist:
+            raise Http404("کالا یافت نشد.")
+        except CheckoutError as e:
+            messages.error(request, str(e))
+            return self.render_form(formset, key)
+        except (OperationalError, InterfaceError) as e:
+            # دیتابیس در دسترس نیست: فروش با قیمت‌های حافظه نهان در صف محلی صندوق ثبت و بعداً همگام می‌شود
+            if not (till_queue.enabled() and till_queue.database_unavailable(e)):
+                raise
+            try:
+                priced, total = till_queue.price(lines)
+            except till_queue.UnpricedCodes as unpriced:
+                for form in cleaned_forms:
+                    if form.cleaned_data["product_id"] in unpriced.codes:
+                        form.add_error("product_id", "قیمت این کالا بدون اتصال به سرور در دسترس نیست.")
+                return self.render_form(formset, key)
+            seq = till_queue.enqueue(priced, key)
+            return render(request, "purchase_queued.html", {"seq": seq, "lines": priced, "total": total})
 
+        return redirect("system:purchase_invoice", pk=purchase.cp_id)
+class CheckoutAPIView(View):
+    """
+    POST {"lines": [{"code": "<بارکد یا آیدی>", "quantity": 2}, ...]} ->
+    201 {"purchase_id": ..., "total_amount": ..., "invoice_url": ...}
+
+    با سرآیند Idempotency-Key، ارسال دوباره همان کلید پاسخ 200 با همان فاکتور می‌گیرد.
+    اگر دیتابیس در دسترس نباشد فروش با قیمت‌های حافظه نهان در صف صندوق ثبت می‌شود:
+    202 {"queued": ..., "idempotency_key": ..., "total_amount": ...}؛ کالایی که قیمتش در حافظه نهان نیست 503 می‌گیرد.
+
+    نمای async روی ASGI؛ کار دیتابیس در استخر نخ محدود (System/pool.py) انجام
+    می‌شود تا کلاینت کند هیچ worker را اشغال نکند.
+    """
+    max_lines = 200
+
+    async def post(self, request):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({"error": "ابتدا وارد شوید."}, status=401)
+        key = request.headers.get("Idempotency-Key")
+        if key is not None and not valid_key(key):
+            return JsonResponse({"error": "Idempotency-Key must be 8-64 characters of [A-Za-z0-9_-]."}, status=400)
+        try:
+            lines = self.parse_lines(request.body)
         except ValueError as e:
-            messages.error(request, str(e))
-            return render(request, self.template_name, {"formset": formset})
-        except Inventory.DoesNotExist:
-            messages.error(request, "برای برخی کالاها رکورد موجودی یافت نشد.")
-            return render(request, self.template_name, {"formset": formset})
+            return JsonResponse({"error": str(e)}, status=400)
+        try:
+            purchase = await pool.run(checkout, lines, key=key)
+        except pool.Saturated:
+            response = JsonResponse({"error": "صندوق‌ها مشغول‌اند؛ دوباره تلاش کنید."}, status=503)
+            response["Retry-After"] = "1"
+            return response
+        except UnknownProducts as e:
+            return JsonResponse({"error": "کالایی با این کد یافت نشد.", "unknown": e.codes}, status=404)
+        except Product.DoesNotExist:
+            return JsonResponse({"error": "کالا یافت نشد."}, status=404)
+        except InsufficientStock as e:
+            return JsonResponse({"error": str(e), "product_id": e.product_id}, status=409)
+        except CheckoutError as e:
+            return JsonResponse({"error": str(e)}, status=409)
+        except (OperationalError, InterfaceError) as e:
+            if not (till_queue.enabled() and till_queue.database_unavailable(e)):
+                raise
+            try:
+                priced, total = till_queue.price(lines)
+            except till_queue.UnpricedCodes as unpriced:
+                return JsonResponse({"error": str(unpriced), "unpriced": unpriced.codes}, status=503)
+            key = key or uuid.uuid4().hex
+            seq = await pool.run(till_queue.enqueue, priced, key)
+            return JsonResponse({"queued": seq, "idempotency_key": key, "total_amount": total}, status=202)
+        return JsonResponse({
+            "purchase_id": purchase.cp_id,
+            "total_amount": purchase.total_amount,
+            "invoice_url": reverse("system:purchase_invoice", args=[purchase.cp_id]),
+        }, status=200 if getattr(purchase, "replayed", False) else 201)
 
-        return redirect("purchase_invoice", pk=purchase.cp_id)
+    def parse_lines(self, body):
+        try:
+            payload = json.loads(body)
+        except (TypeError, ValueError):
+            raise ValueError("Body must be JSON.")
+        lines = payload.get("lines") if isinstance(payload, dict) else None
+        if not isinstance(lines, list) or not 0 < len(lines) <= self.max_lines:
+            raise ValueError(f"'lines' must be a list of 1 to {self.max_lines} items.")
+        parsed = []
+        for number, line in enumerate(lines, start=1):
+            if not isinstance(line, dict):
+                raise ValueError(f"Line {number} must be an object.")
+            code, quantity = line.get("code") or line.get("product_id"), line.get("quantity")
+            if not isinstance(code, str) or not code.strip():
+                raise ValueError(f"Line {number}: 'code' is required.")
+            if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+                raise ValueError(f"Line {number}: 'quantity' must be a positive integer.")
+            parsed.append((code.strip(), quantity))
+        return parsed
 class PurchaseInvoiceView(LoginRequiredMixin, DetailView):
     model = CustomerPurchase
     template_name = "purchase_invoice.html"
     context_object_name = "purchase"
     login_url = reverse_lazy("login")
 
+    def get_queryset(self):
+        # دو کوئری ثابت: خرید با جمع کل، و ردیف‌ها با جمع هر ردیف
+        money = DecimalField(max_digits=12, decimal_places=2)
+        # کالای هر ردیف از کش کاتالوگ می‌آید (invoices.render_body)
+        items = (
+            PurchaseItem.objects
+            .annotate(line_total=ExpressionWrapper(F("quantity") * F("price"), output_field=money))
+            .order_by("pi_id")
+        )
+        return (
+            CustomerPurchase.objects
+            .annotate(items_total=Sum(ExpressionWrapper(F("items__quantity") * F("items__price"), output_field=money)))
+            .prefetch_related(Prefetch("items", queryset=items))
+        )
+
+    def get(self, request, *args, **kwargs):
+        # فاکتور ثبت‌شده تغییر نمی‌کند؛ اگر نسخه رندرشده در کش باشد سراغ دیتابیس نمی‌رویم
+        body = invoices.cached_body(kwargs["pk"])
+        context = {}
+        if body is None:
+            self.object = self.get_object()
+            body = invoices.render_body(self.object, request)
+            context[self.context_object_name] = self.object
+        context["invoice_body"] = body
+        return render(request, self.template_name, context)
+class ExportView(StoreManagerRequiredMixin, View):
+    content_types = {"csv": "text/csv; charset=utf-8", "json": "application/json"}
+
+    def get(self, request, kind):
+        if kind not in exports.EXPORTS:
+            raise Http404("خروجی نامعتبر است.")
+        fmt = request.GET.get("format", "csv")
+        if fmt not in exports.FORMATS:
+            return HttpResponseBadRequest("format must be csv or json.")
+        try:
+            filters = exports.parse_filters(request.GET)
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+        response = StreamingHttpResponse(exports.stream(kind, fmt, **filters), content_type=self.content_types[fmt])
+        response["Content-Disposition"] = f'attachment; filename="{kind}.{fmt}"'
+        return response
+class AgingReportView(StoreManagerRequiredMixin, View):
+    """Payables aging per creditor and creditor type, as JSON or a CSV download (?format=, ?as_of=YYYY-MM-DD)."""
+
+    def get(self, request):
+        fmt = request.GET.get("format", "json")
+        if fmt not in exports.FORMATS:
+            return HttpResponseBadRequest("format must be csv or json.")
+        as_of = None
+        if request.GET.get("as_of"):
+            as_of = parse_date(request.GET["as_of"])
+            if as_of is None:
+                return HttpResponseBadRequest("'as_of' must be a YYYY-MM-DD date.")
+        data = aging.report(as_of)
+        if fmt == "json":
+            return JsonResponse(data, json_dumps_params={"ensure_ascii": False})
+        response = StreamingHttpResponse(
+            exports.stream_csv(aging.CSV_HEADER, aging.csv_rows(data)), content_type=ExportView.content_types["csv"])
+        response["Content-Disposition"] = f'attachment; filename="aging-{data["as_of"]}.csv"'
+        return response
+class AttendanceClockView(StoreManagerRequiredMixin, View):
+    """
+    POST {"date": "YYYY-MM-DD" (اختیاری), "entries": [{"employee_id": ..., "check_in": "08:05"}, ...]}
+    -> 200 {"saved": n}
+
+    ورود و خروج چند کارمند برای یک روز در یک تراکنش ثبت می‌شود (یک UPDATE گروهی و یک INSERT گروهی)؛ هر ورودی
+    می‌تواند check_in، check_out، status و notes داشته باشد.
+    """
+    max_entries = 500
+
+    def post(self, request):
+        try:
+            day, entries = self.parse_entries(request.body)
+            saved = attendance.clock(entries, day)
+        except attendance.ClockError as e:
+            return JsonResponse({"error": str(e), "employee_ids": e.employee_ids}, status=400)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        return JsonResponse({"saved": saved})
+
+    def parse_entries(self, body):
+        try:
+            payload = json.loads(body)
+        except (TypeError, ValueError):
+            raise ValueError("Body must be JSON.")
+        if not isinstance(payload, dict):
+            raise ValueError("Body must be a JSON object.")
+        day = None
+        if payload.get("date"):
+            day = parse_date(str(payload["date"]))
+            if day is None:
+                raise ValueError("'date' must be a YYYY-MM-DD date.")
+        entries = payload.get("entries")
+        if not isinstance(entries, list) or not 0 < len(entries) <= self.max_entries:
+            raise ValueError(f"'entries' must be a list of 1 to {self.max_entries} items.")
+        statuses = dict(Attendance.STATUS_CHOICES)
+        parsed = []
+        for number, entry in enumerate(entries, start=1):
+            if not isinstance(entry, dict):
+                raise ValueError(f"Entry {number} must be an object.")
+            try:
+                row = {"employee_id": uuid.UUID(str(entry.get("employee_id")))}
+                for name in ("check_in", "check_out"):
+                    if entry.get(name):
+                        row[name] = datetime.time.fromisoformat(str(entry[name]))
+            except ValueError:
+                raise ValueError(f"Entry {number}: 'employee_id' must be a UUID and times HH:MM.")
+            if entry.get("status"):
+                if entry["status"] not in statuses:
+                    raise ValueError(f"Entry {number}: unknown status '{entry['status']}'.")
+                row["status"] = entry["status"]
+            if entry.get("notes"):
+                row["notes"] = str(entry["notes"])
+            parsed.append(row)
+        return day, parsed
+class TimesheetView(StoreManagerRequiredMixin, View):
+    """کارکرد ماهانه کارمندان به صورت JSON یا فایل CSV (?format=csv)."""
+
+    def get(self, request, year, month):
+        if not 1 <= month <= 12:
+            raise Http404("ماه نامعتبر است.")
+        fmt = request.GET.get("format", "json")
+        if fmt not in exports.FORMATS:
+            return HttpResponseBadRequest("format must be csv or json.")
+        rows = attendance.timesheet(year, month)
+        if fmt == "json":
+            return JsonResponse({"year": year, "month": month, "closed": attendance.is_closed(year, month),
+                                 "employees": rows}, json_dumps_params={"ensure_ascii": False})
+        header = tuple(rows[0]) if rows else ("employee_id",)
+        response = StreamingHttpResponse(
+            exports.stream_csv(header, ([row[column] for column in header] for row in rows)),
+            content_type=ExportView.content_types["csv"])
+        response["Content-Disposition"] = f'attachment; filename="timesheet-{year:04d}-{month:02d}.csv"'
+        return response
+class AttendanceApprovalView(StoreManagerRequiredMixin, View):
+    """صف تأیید حضور: ردیف‌های بررسی‌نشده با صفحه‌بندی keyset، تأیید یا رد گروهی با یک UPDATE."""
+    template_name = "attendance_approvals.html"
+
+    def get(self, request):
+        return self.render_queue(request, AttendanceReviewForm())
+
+    def post(self, request):
+        form = AttendanceReviewForm(request.POST)
+        if not form.is_valid():
+            return self.render_queue(request, form)
+        data = form.cleaned_data
+        approved = data["action"] == "approve"
+        reviewed = attendance.review(
+            request.user, approved, attendance_ids=data["attendance_id"] or None,
+            date_from=data["date_from"], date_to=data["date_to"],
+        )
+        messages.success(request, f"{reviewed} ردیف {'تأیید' if approved else 'رد'} شد.")
+        return redirect("system:attendance_approvals")
+
+    def render_queue(self, request, form):
+        rows, next_cursor = attendance.pending(
+            request.GET.get("cursor"), page_size=getattr(settings, "ATTENDANCE_QUEUE_PAGE_SIZE", 50))
+        return render(request, self.template_name, {"rows": rows, "next_cursor": next_cursor, "form": form})
+class WholesaleImportView(StoreManagerRequiredMixin, View):
+    template_name = "wholesale_import.html"
+
+    def get(self, request):
+        return render(request, self.template_name, {"form": WholesaleImportForm()})
+
+    def post(self, request):
+        form = WholesaleImportForm(request.POST, request.FILES)
+        if not form.is_valid():
+            return render(request, self.template_name, {"form": form})
+        upload = form.cleaned_data["file"]
+        try:
+            purchase, summary = import_delivery(form.cleaned_data["wholesaler"], read_rows(upload, upload.name))
+        except ImportFailed as e:
+            for error in e.errors:
+                messages.error(request, error)
+            return render(request, self.template_name, {"form": form})
+        messages.success(
+            request,
+            f"{summary['lines']} ردیف ثبت شد ({summary['created']} کالای جدید). مجموع خرید: {purchase.total_amount}",
+        )
+        return redirect("system:wholesale_import")
+class MetricsView(View):
+    """شمارنده‌ها و هیستوگرام‌های درون‌فرایندی با قالب متنی Prometheus؛ فقط برای آدرس‌های METRICS_ALLOWED_IPS."""
+
+    def get(self, request):
+        if request.META.get("REMOTE_ADDR") not in getattr(settings, "METRICS_ALLOWED_IPS", ("127.0.0.1", "::1")):
+            raise Http404()
+        return HttpResponse(metrics.exposition(), content_type="text/plain; version=0.0.4; charset=utf-8")